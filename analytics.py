@@ -1,13 +1,29 @@
-from typing import List
-from habit import Habit
+from bisect import bisect_right
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional
+import schedule
+from habit import Habit, RUN_PERIODICITIES, period_days
 
 def get_all_habits(habits: List[Habit]) -> List[Habit]:
     """Return all tracked habits."""
     return habits
 
+def _schedule(habit: Habit) -> Optional[schedule.Schedule]:
+    try:
+        return habit.schedule
+    except ValueError:
+        return None
+
 def filter_by_periodicity(habits: List[Habit], periodicity: str) -> List[Habit]:
-    """Filter habits by periodicity ('daily' or 'weekly')."""
-    return [h for h in habits if h.periodicity == periodicity]
+    """Filter habits by schedule, so e.g. 'weekly' also matches 'every:7'.
+
+    A periodicity that is not a known schedule only matches itself.
+    """
+    try:
+        target = schedule.parse(periodicity)
+    except ValueError:
+        return [h for h in habits if h.periodicity == periodicity]
+    return [h for h in habits if h.periodicity == periodicity or _schedule(h) == target]
 
 def longest_streak(habits: List[Habit]) -> int:
     """Return the longest streak among all habits."""
@@ -17,4 +33,122 @@ def longest_streak(habits: List[Habit]) -> int:
 
 def longest_streak_per_habit(habits: List[Habit]) -> dict:
     """Return the longest streak for each habit by name."""
-    return {h.name: h.current_streak() for h in habits} 
\ No newline at end of file
+    return {h.name: h.current_streak() for h in habits} 
+
+class StreakStats(NamedTuple):
+    """Longest historical run and current run of a habit, with their boundaries."""
+    longest: int
+    longest_start: Optional[date]
+    longest_end: Optional[date]
+    current: int
+    current_start: Optional[date]
+    current_end: Optional[date]
+
+def _schedule_streak_stats(habit: Habit, today: date) -> StreakStats:
+    """Streak statistics in met occurrences of the habit's schedule."""
+    base, bits = habit.bitset()
+    runs = habit.schedule.runs(base, bits, today)
+    if not runs:
+        return StreakStats(0, None, None, 0, None, None)
+    longest, first, last = max(runs, key=lambda run: run[0])  # The earliest of equally long runs
+    longest_range = (date.fromordinal(first), date.fromordinal(last))
+    current = habit.schedule.streak(base, bits, today)
+    if not current:
+        return StreakStats(longest, *longest_range, 0, None, None)
+    _, first, last = runs[-1]
+    return StreakStats(longest, *longest_range, current, date.fromordinal(first), date.fromordinal(last))
+
+def streak_stats(habit: Habit, today: Optional[date] = None) -> StreakStats:
+    """Compute a habit's streak statistics in a single pass over its completions.
+
+    Runs of a schedule other than daily or weekly are counted in met
+    occurrences, as in Habit.current_streak.
+    """
+    if habit.periodicity not in RUN_PERIODICITIES:
+        return _schedule_streak_stats(habit, today or date.today())
+    delta = period_days(habit.periodicity)
+    longest = length = 0
+    longest_start = longest_end = run_start = prev = None
+    for d in habit.ordinals:
+        if prev is not None and d - prev == delta:
+            length += 1
+        else:
+            length, run_start = 1, d
+        if length > longest:
+            longest, longest_start, longest_end = length, run_start, d
+        prev = d
+    if longest == 0:
+        return StreakStats(0, None, None, 0, None, None)
+    longest_range = (date.fromordinal(longest_start), date.fromordinal(longest_end))
+    if prev != (today or date.today()).toordinal():
+        return StreakStats(longest, *longest_range, 0, None, None)
+    return StreakStats(longest, *longest_range, length, date.fromordinal(run_start), date.fromordinal(prev))
+
+def streak_stats_per_habit(habits: List[Habit], today: Optional[date] = None) -> Dict[str, StreakStats]:
+    """Return streak statistics for each habit by name."""
+    today = today or date.today()
+    return {h.name: streak_stats(h, today) for h in habits}
+
+def longest_historical_streak(habits: List[Habit]) -> int:
+    """Return the longest run any habit has ever had."""
+    return max((streak_stats(h).longest for h in habits), default=0)
+
+def longest_historical_streak_per_habit(habits: List[Habit]) -> dict:
+    """Return the longest run each habit has ever had, by name."""
+    return {name: stats.longest for name, stats in streak_stats_per_habit(habits).items()}
+
+def completion_counts(habits: List[Habit], start: date, end: date) -> Dict[str, int]:
+    """Return the number of completions in [start, end] for each habit by name."""
+    return {h.name: h.count_between(start, end) for h in habits}
+
+def completion_rate(habit: Habit, start: date, end: date) -> float:
+    """Completions in [start, end] divided by the number of periods in that window."""
+    if habit.periodicity in RUN_PERIODICITIES:
+        periods = (end.toordinal() - start.toordinal()) // period_days(habit.periodicity) + 1
+    else:
+        _, periods = habit.adherence(start, end)
+    return habit.count_between(start, end) / periods if periods > 0 else 0.0
+
+def completion_rates(habits: List[Habit], start: date, end: date) -> Dict[str, float]:
+    """Return the completion rate over [start, end] for each habit by name."""
+    return {h.name: completion_rate(h, start, end) for h in habits}
+
+def streak_as_of(habit: Habit, day: date) -> int:
+    """Return the streak a habit had on a given day, ignoring later completions."""
+    if habit.periodicity not in RUN_PERIODICITIES:
+        return habit.schedule.streak(*habit.bitset(), day)
+    days = habit.ordinals
+    delta = period_days(habit.periodicity)
+    expected = day.toordinal()
+    i = bisect_right(days, expected) - 1
+    streak = 0
+    while i >= 0 and days[i] == expected:
+        streak += 1
+        expected -= delta
+        i -= 1
+    return streak
+
+def longest_streak_as_of(habits: List[Habit], day: date) -> int:
+    """Return the longest streak among all habits on a given day."""
+    return max((streak_as_of(h, day) for h in habits), default=0)
+
+def adherence_rate(habit: Habit, start: date, end: date) -> float:
+    """Share of the habit's scheduled occurrences in [start, end] that were met."""
+    met, due = habit.adherence(start, end)
+    return met / due if due else 0.0
+
+def adherence_rates(habits: List[Habit], start: date, end: date) -> Dict[str, float]:
+    """Return the schedule adherence over [start, end] for each habit by name."""
+    return {h.name: adherence_rate(h, start, end) for h in habits}
+
+def summary(habits: List[Habit], today: Optional[date] = None) -> Dict:
+    """Return the JSON-serializable statistics report shown by the CLI and the service."""
+    stats = streak_stats_per_habit(habits, today)
+    return {
+        'total_habits': len(habits),
+        'daily_habits': len(filter_by_periodicity(habits, 'daily')),
+        'weekly_habits': len(filter_by_periodicity(habits, 'weekly')),
+        'longest_streak': max((s.current for s in stats.values()), default=0),
+        'longest_streak_ever': max((s.longest for s in stats.values()), default=0),
+        'streaks': {name: {'current': s.current, 'longest': s.longest} for name, s in stats.items()},
+    }
@@ -0,0 +1,114 @@
+"""
+Cold storage for old completion history.
+
+With tiering enabled (JsonStorage(tier_days=...)), completions older than
+the hot window move out of memory and out of the main JSON file into one
+append-only segment file per habit. Each segment is a zlib-compressed run
+of delta-encoded ordinals:
+
+    <count: uint32> <compressed size: uint32> zlib(int32 first, int32 deltas...)
+
+A habit only keeps a ColdHistory: the byte range of its current segments
+plus their count and latest day, which is all that counting and most
+streak queries need. The segments are decompressed only for queries that
+reach back before the hot window.
+"""
+
+import os
+import struct
+import zlib
+from array import array
+from itertools import accumulate, chain
+from typing import Dict, Iterable, Optional
+from urllib.parse import quote
+
+SEGMENT_HEADER = struct.Struct('<II')
+
+
+def _encode(ordinals: Iterable[int]) -> bytes:
+    ordinals = list(ordinals)
+    deltas = array('i', [ordinals[0]] + [b - a for a, b in zip(ordinals, ordinals[1:])])
+    data = zlib.compress(deltas.tobytes())
+    return SEGMENT_HEADER.pack(len(ordinals), len(data)) + data
+
+
+class ColdHistory:
+    """Archived completions of one habit: a byte range of its segment file."""
+
+    __slots__ = ('path', 'offset', 'size', 'count', 'last')
+
+    def __init__(self, path: str, offset: int, size: int, count: int, last: int):
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.count = count
+        self.last = last
+
+    def ordinals(self) -> array:
+        """Decompress every segment in the range into one sorted array."""
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            buf = f.read(self.size - self.offset)
+        segments, pos = [], 0
+        while pos < len(buf):
+            count, length = SEGMENT_HEADER.unpack_from(buf, pos)
+            pos += SEGMENT_HEADER.size
+            deltas = array('i')
+            deltas.frombytes(zlib.decompress(buf[pos:pos + length]))
+            segments.append(accumulate(deltas))
+            pos += length
+        # Segments are sorted; later ones only precede earlier ones after a backfill
+        return array('i', sorted(chain.from_iterable(segments)))
+
+    def to_dict(self) -> Dict:
+        return {'offset': self.offset, 'size': self.size, 'count': self.count, 'last': self.last}
+
+
+class Archive:
+    """Append-only segment files, one per habit, in a single directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.bytes_written = 0
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.directory, quote(name, safe='') + '.seg')
+
+    def history(self, name: str, meta: Dict) -> ColdHistory:
+        return ColdHistory(self.path_for(name), meta['offset'], meta['size'], meta['count'], meta['last'])
+
+    def append(self, name: str, ordinals, cold: Optional[ColdHistory] = None) -> ColdHistory:
+        """Archive sorted ordinals (none of them already in `cold`) and return the new history.
+
+        Bytes are only ever added at the end of the file. If `cold` does not
+        end there (it belongs to another store, or an interrupted save left
+        bytes behind), its days are rewritten into a new range instead, so
+        the range a saved snapshot points to is never modified.
+        """
+        path = self.path_for(name)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'ab') as f:
+            end = f.tell()
+            if cold is not None and cold.path == path and cold.size == end:
+                offset, count, last = cold.offset, cold.count, cold.last
+            else:
+                if cold is not None:
+                    ordinals = sorted(chain(cold.ordinals(), ordinals))
+                offset, count, last = end, 0, None
+            segment = _encode(ordinals)
+            f.write(segment)
+            self.bytes_written += len(segment)
+            f.flush()
+            os.fsync(f.fileno())
+        count += len(ordinals)
+        last = ordinals[-1] if last is None else max(last, ordinals[-1])
+        return ColdHistory(path, offset, end + len(segment), count, last)
+
+    def prune(self, names: Iterable[str]):
+        """Remove the segment files of habits other than `names`."""
+        if not os.path.isdir(self.directory):
+            return
+        keep = {os.path.basename(self.path_for(name)) for name in names}
+        for entry in os.listdir(self.directory):
+            if entry.endswith('.seg') and entry not in keep:
+                os.remove(os.path.join(self.directory, entry))
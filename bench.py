@@ -0,0 +1,185 @@
+"""
+Reproducible benchmarks for the habit tracker hot paths.
+
+Generates a seeded synthetic store (N habits x Y years of completions at a
+given density) and times HabitTracker.load/save, Habit.check_off,
+Habit.current_streak and the analytics functions. Results are reported as
+JSON with throughput, latency percentiles and peak memory per operation, so
+runs with the same parameters can be compared across commits.
+
+Usage:
+    python bench.py --habits 1000 --years 2 --output results.json
+    python bench.py --habits 1000 --years 2 --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import analytics
+from habit import Habit, HabitTracker
+from metrics import percentile
+
+BENCH_FORMAT = 1
+
+
+def generate_habits(n_habits: int, years: float, density: float = 0.7, seed: int = 0,
+                    today: Optional[date] = None, weekly_share: float = 0.3) -> List[Habit]:
+    """Return n_habits habits with `years` of history, each period completed with probability `density`."""
+    rng = random.Random(seed)
+    today = today or date(2025, 1, 1)
+    first = today.toordinal() - int(years * 365)
+    habits = []
+    for i in range(n_habits):
+        periodicity = 'weekly' if rng.random() < weekly_share else 'daily'
+        step = 1 if periodicity == 'daily' else 7
+        completions = [d for d in range(first, today.toordinal() + 1, step) if rng.random() < density]
+        habits.append(Habit(f'Habit {i:06d}', periodicity, date.fromordinal(first).isoformat(), completions))
+    return habits
+
+
+def _summarize(latencies_ns: List[int], peak_bytes: int) -> Dict:
+    latencies = sorted(ns / 1e6 for ns in latencies_ns)
+    total = sum(latencies)
+    return {
+        'calls': len(latencies),
+        'total_ms': round(total, 3),
+        'ops_per_sec': round(len(latencies) / (total / 1000), 1) if total else None,
+        'p50_ms': round(percentile(latencies, 50), 4),
+        'p90_ms': round(percentile(latencies, 90), 4),
+        'p99_ms': round(percentile(latencies, 99), 4),
+        'max_ms': round(latencies[-1], 4) if latencies else 0.0,
+        'peak_memory_bytes': peak_bytes,
+    }
+
+
+def _measure(calls: List[Callable[[], object]]) -> Dict:
+    """Time each call individually, then replay the first one under tracemalloc for peak memory."""
+    latencies = []
+    for call in calls:
+        start = time.perf_counter_ns()
+        call()
+        latencies.append(time.perf_counter_ns() - start)
+    tracemalloc.start()
+    try:
+        calls[0]()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return _summarize(latencies, peak)
+
+
+def run_benchmarks(n_habits: int = 1000, years: float = 2, density: float = 0.7, seed: int = 0,
+                   repeat: int = 5, sample: int = 1000) -> Dict:
+    """Run every benchmark and return the JSON-serializable report."""
+    today = date(2025, 1, 1)
+    habits = generate_habits(n_habits, years, density, seed, today)
+    rng = random.Random(seed)
+    sampled = rng.sample(habits, min(sample, len(habits)))
+    results = {}
+
+    work_dir = tempfile.mkdtemp(prefix='habit-bench-')
+    try:
+        path = os.path.join(work_dir, 'habits.json')
+        tracker = HabitTracker(path)
+        tracker.habits = habits
+        results['tracker.save'] = _measure([tracker.save] * repeat)
+        results['tracker.load'] = _measure([lambda: HabitTracker(path)] * repeat)
+        results['tracker.save']['file_bytes'] = os.path.getsize(path)
+    finally:
+        shutil.rmtree(work_dir)
+
+    def cold_streak(habit):
+        habit.invalidate_streak()
+        return habit.current_streak(today)
+
+    results['habit.current_streak'] = _measure([lambda h=h: cold_streak(h) for h in sampled])
+    results['habit.current_streak.cached'] = _measure([lambda h=h: h.current_streak(today) for h in sampled])
+    tomorrow = today + timedelta(days=1)
+    results['habit.check_off'] = _measure([lambda h=h: h.check_off(tomorrow) for h in sampled])
+    for h in sampled:
+        h.remove_completion(tomorrow)
+
+    analytics_calls = {
+        'analytics.filter_by_periodicity': lambda: analytics.filter_by_periodicity(habits, 'daily'),
+        'analytics.longest_streak': lambda: analytics.longest_streak(habits),
+        'analytics.longest_streak_per_habit': lambda: analytics.longest_streak_per_habit(habits),
+        'analytics.streak_stats_per_habit': lambda: analytics.streak_stats_per_habit(habits, today),
+        'analytics.longest_historical_streak': lambda: analytics.longest_historical_streak(habits),
+    }
+    for name, call in analytics_calls.items():
+        results[name] = _measure([call] * repeat)
+
+    return {
+        'format': BENCH_FORMAT,
+        'params': {'habits': n_habits, 'years': years, 'density': density, 'seed': seed,
+                   'repeat': repeat, 'sample': len(sampled)},
+        'completions': sum(h.completion_count() for h in habits),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'commit': _git_commit()},
+        'results': results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.2) -> List[str]:
+    """Return a line per operation whose p50 latency regressed by more than `threshold`."""
+    if baseline.get('params') != current.get('params'):
+        return ["Benchmark parameters differ; results are not comparable"]
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before and before['p50_ms'] and result['p50_ms'] > before['p50_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p50 {before['p50_ms']}ms -> {result['p50_ms']}ms")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the habit tracker hot paths.")
+    parser.add_argument('--habits', type=int, default=1000)
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--density', type=float, default=0.7)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sample', type=int, default=1000, help="habits sampled for per-habit operations")
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    parser.add_argument('--baseline', help="compare against a previous JSON report")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.habits, args.years, args.density, args.seed, args.repeat, args.sample)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for line in regressions:
+            print(f"❌ {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+Streaming bulk import and export of completions.
+
+Both formats hold one completion per row:
+
+    name,date,periodicity,creation_date                      (CSV with a header)
+    Run,2024-01-01,daily,2023-12-01
+    {"name": "Run", "date": "2024-01-01", "periodicity": "daily"}     (JSON Lines)
+
+Only name and date are needed to import. periodicity and creation_date are
+used when a habit has to be created (default: daily, and the first imported
+day). A row with an empty date names a habit without adding a completion;
+export writes one for every habit that has no completions.
+
+Imports are a generator pipeline (parse rows -> chunks of chunk_rows), so
+memory does not grow with the input. The distinct dates of each chunk are
+validated together against a cache of already parsed ones, repeated
+completions are dropped, and each chunk is committed in one
+tracker.batch() with a single backfill change per habit.
+
+Usage:
+    python cli.py import history.csv
+    python cli.py export history.jsonl
+"""
+
+import csv
+import json
+import re
+import sys
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import schedule
+from habit import Habit
+
+FIELDS = ('name', 'date', 'periodicity', 'creation_date')
+FORMATS = ('csv', 'jsonl')
+CHUNK_ROWS = 100000
+MAX_CACHED_DAYS = 100000  # Parsed dates kept between chunks
+
+_ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_INVALID = ('', '', '', '')
+
+Row = Tuple[str, str, str, str]  # name, date, periodicity, creation_date
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """The explicit format, or the one named by the file extension."""
+    if fmt is None:
+        if path.endswith(('.jsonl', '.ndjson')):
+            fmt = 'jsonl'
+        elif path.endswith('.csv'):
+            fmt = 'csv'
+    if fmt not in FORMATS:
+        raise ValueError(f"Cannot tell the format of '{path}'; use a .csv or .jsonl file or name the format")
+    return fmt
+
+
+def _csv_rows(f) -> Iterator[Row]:
+    reader = csv.reader(f)
+    header = [column.strip() for column in next(reader, [])]
+    if 'name' not in header or 'date' not in header:
+        raise ValueError("The CSV header needs name and date columns")
+    # Missing optional columns read the '' appended to every row
+    pick = itemgetter(*(header.index(field) if field in header else -1 for field in FIELDS))
+    for row in reader:
+        if not row:
+            continue
+        row.append('')
+        try:
+            yield pick(row)
+        except IndexError:
+            yield _INVALID
+
+
+def _jsonl_rows(f) -> Iterator[Row]:
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            row = tuple(record.get(field) or '' for field in FIELDS)
+        except (ValueError, AttributeError):
+            yield _INVALID
+            continue
+        yield row if all(isinstance(value, str) for value in row) else _INVALID
+
+
+def read_rows(f, fmt: str) -> Iterator[Row]:
+    """Parse an open text file into (name, date, periodicity, creation_date) rows."""
+    return _csv_rows(f) if fmt == 'csv' else _jsonl_rows(f)
+
+
+def _chunks(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    rows = iter(rows)
+    chunk = list(islice(rows, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, size))
+
+
+def _parse_days(texts: Iterable[str], cache: Dict[str, int]) -> Dict[str, int]:
+    """Add the valid YYYY-MM-DD dates among `texts` to cache (date -> ordinal) and return it."""
+    for text in texts:
+        if text in cache or not _ISO_DATE.fullmatch(text):
+            continue
+        try:
+            cache[text] = date.fromisoformat(text).toordinal()
+        except ValueError:
+            pass
+    return cache
+
+
+def _valid_periodicity(periodicity: str) -> bool:
+    try:
+        schedule.parse(periodicity)
+    except ValueError:
+        return False
+    return True
+
+
+def import_rows(tracker, rows: Iterable[Row], chunk_rows: int = CHUNK_ROWS,
+                create: bool = True, strict: bool = False) -> Dict[str, int]:
+    """Import completion rows in chunks and return counts of what happened.
+
+    Missing habits are created unless create=False. Invalid rows are
+    counted and skipped, or raise ValueError (naming the row) with
+    strict=True; chunks committed before that are kept.
+    """
+    report = {'rows': 0, 'added': 0, 'duplicates': 0, 'invalid': 0, 'created': 0}
+    cache: Dict[str, int] = {}
+    for chunk in _chunks(rows, chunk_rows):
+        if len(cache) > MAX_CACHED_DAYS:
+            cache.clear()
+        ordinals = _parse_days({row[1] for row in chunk}, cache)
+        days: Dict[str, set] = {}
+        new_habits: Dict[str, Tuple[str, str]] = {}
+        completions = 0
+        for number, (name, day, periodicity, created) in enumerate(chunk, report['rows'] + 1):
+            ordinal = ordinals.get(day)
+            habit_days = days.get(name)
+            if habit_days is not None and ordinal is not None:
+                habit_days.add(ordinal)  # The common case: a known habit and a valid date
+                completions += 1
+                continue
+            problem = None
+            if not name:
+                problem = "missing habit name"
+            elif day and ordinal is None:
+                problem = f"invalid date {day!r}"
+            elif name not in days and tracker.get(name) is None:
+                if not create:
+                    problem = f"unknown habit {name!r}"
+                elif periodicity and not _valid_periodicity(periodicity):
+                    problem = f"unknown periodicity {periodicity!r}"
+                elif created and created not in _parse_days([created], cache):
+                    problem = f"invalid creation date {created!r}"
+                else:
+                    new_habits[name] = (periodicity or 'daily', created)
+            if problem is not None:
+                if strict:
+                    raise ValueError(f"Row {number}: {problem}")
+                report['invalid'] += 1
+                continue
+            if habit_days is None:
+                habit_days = days[name] = set()
+            if ordinal is not None:
+                habit_days.add(ordinal)
+                completions += 1
+        report['rows'] += len(chunk)
+
+        added = 0
+        with tracker.batch():
+            for name, (periodicity, created) in new_habits.items():
+                first = min(days[name], default=None)
+                if not created and first is not None:
+                    created = date.fromordinal(first).isoformat()
+                tracker.add_habit(Habit(name, periodicity, created or None))
+            for name, habit_days in days.items():
+                added += tracker.add_completions(name, habit_days)
+        report['created'] += len(new_habits)
+        report['added'] += added
+        report['duplicates'] += completions - added
+    return report
+
+
+@lru_cache(maxsize=1 << 16)
+def _iso(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+
+def export_rows(habits: Iterable[Habit]) -> Iterator[Row]:
+    """One row per completion, oldest first per habit, plus one for each habit without any."""
+    for h in habits:
+        ordinals = h.ordinals
+        if not len(ordinals):
+            yield h.name, '', h.periodicity, h.creation_date
+        for ordinal in ordinals:
+            yield h.name, _iso(ordinal), h.periodicity, h.creation_date
+
+
+def _jsonl_lines(habits: Iterable[Habit]) -> Iterator[str]:
+    for h in habits:
+        # Only the date changes between a habit's rows, so encode the rest once
+        head = '{"name": %s, "date": "' % json.dumps(h.name)
+        tail = '", "periodicity": %s, "creation_date": %s}\n' % (json.dumps(h.periodicity),
+                                                                json.dumps(h.creation_date))
+        ordinals = h.ordinals
+        if not len(ordinals):
+            yield head + tail
+        for ordinal in ordinals:
+            yield head + _iso(ordinal) + tail
+
+
+@contextmanager
+def _open(path: str, mode: str):
+    if path == '-':
+        yield sys.stdin if 'r' in mode else sys.stdout
+    else:
+        with open(path, mode, newline='', encoding='utf-8') as f:
+            yield f
+
+
+def import_file(tracker, path: str, fmt: Optional[str] = None, **options) -> Dict[str, int]:
+    """Import a CSV or JSON Lines file ('-' for stdin); options go to import_rows()."""
+    fmt = detect_format(path, fmt)
+    with _open(path, 'r') as f:
+        return import_rows(tracker, read_rows(f, fmt), **options)
+
+
+def export_file(tracker, path: str, fmt: Optional[str] = None) -> int:
+    """Write every completion to a CSV or JSON Lines file ('-' for stdout); return the row count."""
+    fmt = detect_format(path, fmt)
+    count = 0
+    with _open(path, 'w') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(FIELDS)
+            for row in export_rows(tracker.habits):
+                writer.writerow(row)
+                count += 1
+        else:
+            for line in _jsonl_lines(tracker.habits):
+                f.write(line)
+                count += 1
+    return count
@@ -0,0 +1,204 @@
+"""
+Versioned change feed for mirroring a habit store.
+
+With HabitTracker(changefeed=True), every mutation written to the store is
+also appended to <store>.changes as one JSON line carrying a monotonic
+version. Trackers opened later on the same store keep appending to an
+existing feed by default:
+
+    {"v": 41, "op": "check_off", "name": "Run", "day": "2024-01-01"}
+    {"v": 42, "op": "add", "habit": {...}}
+    {"v": 43, "op": "backfill", "name": "Read", "days": ["2023-05-01", ...]}
+    {"v": 44, "op": "delete", "name": "Run"}
+    {"v": 45, "op": "reset"}        # The store was replaced wholesale by save()
+
+Versions are assigned when pending mutations are flushed, under a lock on
+the feed file, so they stay unique when several processes share a store.
+changes_since() finds its starting point by bisecting the file, and
+IncrementalExporter writes only the records a mirror has not seen yet.
+
+Usage:
+    python changefeed.py export data/habits.json mirror/
+"""
+
+import json
+import os
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not coordinated between processes
+    fcntl = None
+
+TAIL_BYTES = 4096
+
+
+def _version(line: bytes) -> int:
+    return json.loads(line)['v']
+
+
+class ChangeFeed:
+    """Append-only JSON-lines log of versioned mutation records."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _last_version(f) -> int:
+        """Version of the last complete record, dropping a torn tail left by a crash."""
+        size = f.seek(0, os.SEEK_END)
+        start = size
+        while start > 0:
+            start = max(0, start - TAIL_BYTES)
+            f.seek(start)
+            tail = f.read(size - start)
+            end = tail.rfind(b'\n')
+            if end < 0:
+                continue
+            if end + 1 < len(tail):
+                f.truncate(start + end + 1)
+            lines = tail[:end].rsplit(b'\n', 1)
+            if start == 0 or len(lines) == 2:
+                return _version(lines[-1])
+        f.truncate(0)  # Not even one complete record
+        return 0
+
+    def last_version(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with self._locked() as f:
+            return self._last_version(f)
+
+    def append(self, changes: List[Dict]) -> int:
+        """Assign the next versions to `changes`, append them and return the last one."""
+        with self._locked() as f:
+            version = self._last_version(f)
+            lines = []
+            for change in changes:
+                version += 1
+                lines.append(json.dumps({'v': version, **change}, separators=(',', ':')) + '\n')
+            f.write(''.join(lines).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        return version
+
+    def since(self, version: int) -> Iterator[Dict]:
+        """Yield the records with a version greater than `version`, oldest first."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._offset_after(f, version))
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return  # A record still being written
+                yield json.loads(line)
+
+    @staticmethod
+    def _offset_after(f, version: int) -> int:
+        """Byte offset of the first record with a version greater than `version`."""
+        def line_from(pos: int):
+            # The first complete line starting at or after pos
+            f.seek(max(pos - 1, 0))
+            if pos:
+                f.readline()
+            return f.tell(), f.readline()
+
+        # Versions grow along the file, so bisect on byte offsets
+        lo, hi = 0, f.seek(0, os.SEEK_END)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _, line = line_from(mid)
+            if line.endswith(b'\n') and _version(line) <= version:
+                lo = mid + 1
+            else:
+                hi = mid
+        return line_from(lo)[0]
+
+
+class IncrementalExporter:
+    """Mirror a tracker into a directory of snapshot and delta files.
+
+    The first export (and the first after a reset record) writes
+    snapshot-<version>.json; later ones write changes-<from>-<to>.jsonl
+    with only the new records. The last exported version is kept in
+    <directory>/cursor.
+    """
+
+    def __init__(self, tracker, directory: str):
+        if tracker.changefeed is None:
+            raise ValueError("The tracker has no change feed; open it with changefeed=True")
+        self.tracker = tracker
+        self.directory = directory
+        self.cursor_path = os.path.join(directory, 'cursor')
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def cursor(self) -> int:
+        try:
+            with open(self.cursor_path) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write(self, name: str, chunks) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'w') as f:
+            f.writelines(chunks)
+        os.replace(path + '.tmp', path)
+        return path
+
+    def _set_cursor(self, version: int):
+        self._write('cursor', [str(version)])
+
+    def export(self) -> Optional[str]:
+        """Write what changed since the last export; return the new file, or None if nothing did."""
+        cursor = self.cursor
+        if cursor == 0:
+            return self.export_snapshot()
+        last, lines = cursor, []
+        for change in self.tracker.changes_since(cursor):
+            if change['op'] == 'reset':
+                return self.export_snapshot()
+            last = change['v']
+            lines.append(json.dumps(change, separators=(',', ':')) + '\n')
+        if last == cursor:
+            return None
+        path = self._write(f'changes-{cursor + 1:012d}-{last:012d}.jsonl', lines)
+        self._set_cursor(last)
+        return path
+
+    def export_snapshot(self) -> str:
+        """Write every habit as of the current version."""
+        version, habits = self.tracker.versioned_snapshot()
+        data = json.dumps({'version': version, 'habits': habits}, separators=(',', ':'))
+        path = self._write(f'snapshot-{version:012d}.json', [data])
+        self._set_cursor(version)
+        return path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'export':
+        print("Usage: python changefeed.py export STORE DIRECTORY")
+        sys.exit(1)
+    from habit import HabitTracker
+    tracker = HabitTracker(sys.argv[2], changefeed=True)
+    try:
+        written = IncrementalExporter(tracker, sys.argv[3]).export()
+    finally:
+        tracker.close()
+    print(f"✅ Wrote {written}" if written else "Nothing changed since the last export")
@@ -1,5 +1,13 @@
+import argparse
+import json
+import os
+import sys
+from datetime import date
+import schedule
 from habit import Habit, HabitTracker, load_predefined_habits
-import analytics
+
+# analytics, rollups and bench are imported inside the functions that use them,
+# so scripted commands like `check` start without loading them
 
 def display_menu():
     """Display the main menu options."""
@@ -22,18 +30,29 @@ def create_habit(tracker):
     if not name:
         print("Habit name cannot be empty!")
         return
+    if tracker.get(name) is not None:
+        print(f"A habit named '{name}' already exists!")
+        return
     
     print("Select periodicity:")
     print("1. Daily")
     print("2. Weekly")
-    choice = input("Enter choice (1 or 2): ").strip()
+    print("3. Custom schedule")
+    choice = input("Enter choice (1, 2 or 3): ").strip()
     
     if choice == "1":
         periodicity = "daily"
     elif choice == "2":
         periodicity = "weekly"
+    elif choice == "3":
+        periodicity = input("Schedule (e.g. every:3, weekdays:mon,wed,fri, calendar-weekly, monthly): ").strip()
+        try:
+            schedule.parse(periodicity)
+        except ValueError as e:
+            print(f"{e}!")
+            return
     else:
-        print("Invalid choice! Please enter 1 or 2.")
+        print("Invalid choice! Please enter 1, 2 or 3.")
         return
     
     habit = Habit(name=name, periodicity=periodicity)
@@ -99,11 +118,14 @@ def list_habits(tracker):
         print(f"   Periodicity: {habit.periodicity}")
         print(f"   Created: {habit.creation_date}")
         print(f"   Current streak: {streak}")
-        print(f"   Total completions: {len(habit.completions)}")
+        print(f"   Total completions: {habit.completion_count()}")
         print()
 
 def view_statistics(tracker):
     """Display habit statistics and analytics."""
+    import analytics
+    from rollups import month_key, week_key
+    
     if not tracker.habits:
         print("No habits to analyze!")
         return
@@ -120,9 +142,21 @@ def view_statistics(tracker):
     print(f"Weekly habits: {weekly_habits}")
     print()
     
+    # Precomputed rollups
+    rollups = tracker.rollups
+    today = date.today().toordinal()
+    print(f"Completions this week: {rollups.weeks[week_key(today)]}")
+    print(f"Completions this month: {rollups.months[month_key(today)]}")
+    for periodicity, total in sorted(rollups.periodicity_totals.items()):
+        print(f"Total {periodicity} completions: {total}")
+    print()
+    
     # Streak analysis
-    longest_streak = analytics.longest_streak(tracker.habits)
+    top = tracker.top_streaks(3)
+    longest_streak = top[0][1] if top else 0
     print(f"Longest current streak: {longest_streak}")
+    for rank, (habit_name, streak) in enumerate(top, 1):
+        print(f"  {rank}. {habit_name}: {streak}")
     print()
     
     # Per-habit streaks
@@ -130,6 +164,28 @@ def view_statistics(tracker):
     streaks = analytics.longest_streak_per_habit(tracker.habits)
     for habit_name, streak in streaks.items():
         print(f"  {habit_name}: {streak}")
+    print()
+    
+    # Historical runs
+    stats = analytics.streak_stats_per_habit(tracker.habits)
+    print(f"Longest streak ever: {max((s.longest for s in stats.values()), default=0)}")
+    print("Longest streaks by habit:")
+    for habit_name, habit_stats in stats.items():
+        if habit_stats.longest:
+            print(f"  {habit_name}: {habit_stats.longest} "
+                  f"({habit_stats.longest_start} to {habit_stats.longest_end})")
+        else:
+            print(f"  {habit_name}: 0")
+    
+    # Instrumentation, when enabled with HABIT_METRICS=1
+    snapshot = tracker.metrics()
+    if snapshot:
+        print()
+        print("Performance:")
+        print(f"  {'operation':<42} {'calls':>7} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>10}")
+        for name, metric in snapshot.items():
+            io_bytes = metric['bytes_read'] + metric['bytes_written']
+            print(f"  {name:<42} {metric['calls']:>7} {metric['p50_ms']:>8} {metric['p99_ms']:>8} {io_bytes:>10}")
 
 def load_predefined(tracker):
     """Load predefined habits for testing."""
@@ -138,7 +194,7 @@ def load_predefined(tracker):
     
     print("Loading 5 predefined habits with 4 weeks of example data:")
     for habit in predefined_habits:
-        print(f"  • {habit.name} ({habit.periodicity}) - {len(habit.completions)} completions")
+        print(f"  • {habit.name} ({habit.periodicity}) - {habit.completion_count()} completions")
     
     tracker.habits = predefined_habits
     tracker.save()
@@ -147,7 +203,11 @@ def load_predefined(tracker):
 
 def main():
     """Main interactive loop."""
-    tracker = HabitTracker()
+    if os.environ.get('HABIT_METRICS'):
+        import metrics
+        metrics.enable()
+    # Check-offs return immediately; a background thread writes them shortly after
+    tracker = HabitTracker(autosave=True)
     
     print("Welcome to Habit Tracker!")
     print("This app helps you build and track your daily and weekly habits.")
@@ -174,6 +234,7 @@ def main():
         elif choice == "6":
             load_predefined(tracker)
         elif choice == "7":
+            tracker.close()
             print("Thank you for using Habit Tracker!")
             break
         else:
@@ -181,5 +242,162 @@ def main():
         
         input("\nPress Enter to continue...")
 
+def _periodicity(spec):
+    try:
+        schedule.parse(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+def build_parser():
+    """Build the argument parser for non-interactive use."""
+    parser = argparse.ArgumentParser(
+        description="Habit Tracker. Run without arguments for the interactive menu.")
+    parser.add_argument('--store', default='data/habits.json', help="path to the habit store")
+    parser.add_argument('--shared', action='store_true', help="lock the store for concurrent processes")
+    parser.add_argument('--tier-days', type=int, metavar='N',
+                        help="archive completions older than N days when the store is rewritten")
+    parser.add_argument('--metrics', action='store_true', help="print timings and I/O of the command to stderr")
+    parser.add_argument('--profile', action='store_true', help="print a cProfile report of the command to stderr")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    add = commands.add_parser('add', help="create a habit")
+    add.add_argument('name')
+    add.add_argument('periodicity', type=_periodicity,
+                     help="daily, weekly, every:N[:YYYY-MM-DD], weekdays:mon,wed,..., calendar-weekly or monthly")
+    
+    check = commands.add_parser('check', help="check off a habit")
+    check.add_argument('name')
+    check.add_argument('--date', help="completion date as YYYY-MM-DD (default: today)")
+    
+    delete = commands.add_parser('delete', help="delete a habit")
+    delete.add_argument('name')
+    
+    commands.add_parser('list', help="list habits with their streaks")
+    commands.add_parser('stats', help="show habit statistics")
+    
+    changes = commands.add_parser('changes', help="print change records after a version, one JSON per line")
+    changes.add_argument('--since', type=int, default=0, metavar='VERSION')
+    
+    import_ = commands.add_parser('import', help="import completions from a CSV or JSON Lines file ('-' for stdin)")
+    import_.add_argument('file')
+    import_.add_argument('--format', choices=('csv', 'jsonl'), help="default: from the file extension")
+    import_.add_argument('--chunk-rows', type=int, default=100000, help="rows committed together")
+    import_.add_argument('--no-create', action='store_true', help="reject rows for habits that don't exist")
+    import_.add_argument('--strict', action='store_true', help="stop at the first invalid row")
+    
+    export = commands.add_parser('export', help="export completions to a CSV or JSON Lines file ('-' for stdout)")
+    export.add_argument('file')
+    export.add_argument('--format', choices=('csv', 'jsonl'), help="default: from the file extension")
+    
+    bench = commands.add_parser('bench', help="run the benchmark suite (see bench.py --help)")
+    bench.add_argument('bench_args', nargs=argparse.REMAINDER)
+    return parser
+
+def _open_tracker(args, mutating):
+    # Mutations are journaled so a single check-off never rewrites the whole store,
+    # and completions are only parsed for the habits a command touches
+    options = {}
+    if args.command == 'import':
+        # Each chunk is appended to the journal; the snapshot is rewritten once at the end
+        options = {'compact_records': float('inf'), 'compact_bytes': float('inf')}
+    return HabitTracker(args.store, journal=mutating, lazy=True, shared=args.shared, tier_days=args.tier_days,
+                        **options)
+
+def _output(data):
+    print(json.dumps(data))
+
+def run(argv):
+    """Run one scripted command, printing JSON; return the process exit code."""
+    args = build_parser().parse_args(argv)
+    if args.command == 'bench':
+        import bench
+        return bench.main(args.bench_args)
+    if not (args.metrics or args.profile):
+        return _run_command(args)
+    
+    import metrics
+    metrics.enable()
+    try:
+        if args.profile:
+            with metrics.profile(args.command):
+                code = _run_command(args)
+            print(metrics.profiles[args.command], file=sys.stderr)
+        else:
+            code = _run_command(args)
+    finally:
+        metrics.disable()
+    if args.metrics:
+        print(json.dumps(metrics.snapshot(), indent=2), file=sys.stderr)
+    return code
+
+def _run_command(args):
+    tracker = _open_tracker(args, mutating=args.command in ('add', 'check', 'delete', 'import'))
+    try:
+        if args.command == 'add':
+            try:
+                tracker.add_habit(Habit(name=args.name, periodicity=args.periodicity))
+            except ValueError as e:
+                _output({'error': str(e)})
+                return 1
+            _output({'added': args.name, 'periodicity': args.periodicity})
+        elif args.command == 'check':
+            try:
+                day = date.fromisoformat(args.date) if args.date else date.today()
+            except ValueError:
+                _output({'error': f"Invalid date '{args.date}', expected YYYY-MM-DD"})
+                return 1
+            if not tracker.check_off(args.name, day):
+                _output({'error': f"Habit '{args.name}' not found"})
+                return 1
+            _output({'checked_off': args.name, 'date': day.isoformat()})
+        elif args.command == 'delete':
+            if not tracker.delete_habit(args.name):
+                _output({'error': f"Habit '{args.name}' not found"})
+                return 1
+            _output({'deleted': args.name})
+        elif args.command == 'list':
+            _output([{
+                'name': habit.name,
+                'periodicity': habit.periodicity,
+                'creation_date': habit.creation_date,
+                'current_streak': habit.current_streak(),
+                'completions': habit.completion_count(),
+            } for habit in tracker.habits])
+        elif args.command == 'stats':
+            import analytics
+            _output(analytics.summary(tracker.habits))
+        elif args.command == 'changes':
+            if tracker.changefeed is None:
+                _output({'error': "This store has no change feed"})
+                return 1
+            for change in tracker.changes_since(args.since):
+                _output(change)
+        elif args.command == 'import':
+            import bulkio
+            try:
+                report = bulkio.import_file(tracker, args.file, args.format, chunk_rows=args.chunk_rows,
+                                            create=not args.no_create, strict=args.strict)
+            except (OSError, ValueError) as e:
+                _output({'error': str(e)})
+                return 1
+            finally:
+                tracker.compact()
+            _output(report)
+        elif args.command == 'export':
+            import bulkio
+            try:
+                count = bulkio.export_file(tracker, args.file, args.format)
+            except (OSError, ValueError) as e:
+                _output({'error': str(e)})
+                return 1
+            if args.file != '-':
+                _output({'exported': count, 'file': args.file})
+        return 0
+    finally:
+        tracker.close()
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    if len(sys.argv) > 1:
+        sys.exit(run(sys.argv[1:]))
+    main()
@@ -0,0 +1,139 @@
+"""
+Columnar analytics engine for large habit populations.
+
+Optional: requires NumPy. Habits are flattened into arrays (one entry per
+completion, grouped by habit with per-habit offsets) so streaks, completion
+rates and periodicity filters are computed with vectorized operations
+instead of Python loops. Results match the functions in analytics.py;
+habits with a schedule other than daily or weekly are computed one by one
+with those functions.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only this module needs it
+    np = None
+
+import analytics
+import schedule
+from habit import Habit, RUN_PERIODICITIES, period_days
+
+
+class ColumnarHabits:
+    """Column arrays built from a list of habits.
+
+    - periodicity_codes[i]: index into `periodicities` for habit i
+    - ordinals[offsets[i]:offsets[i + 1]]: sorted completion ordinals of habit i
+    - habit_ids[j]: habit index of completion j
+    """
+
+    def __init__(self, habits: List[Habit]):
+        if np is None:
+            raise ImportError("The columnar engine requires NumPy (pip install numpy)")
+        self.habits = list(habits)
+        self.names = [h.name for h in self.habits]
+        self.periodicities: List[str] = []
+        codes = {}
+        for h in self.habits:
+            if h.periodicity not in codes:
+                codes[h.periodicity] = len(self.periodicities)
+                self.periodicities.append(h.periodicity)
+        # Every anchor or weekday set is its own periodicity string, so there can be many
+        self.periodicity_codes = np.array([codes[h.periodicity] for h in self.habits], dtype=np.int32)
+        # Schedule habits get a delta no gap can equal and are overwritten by the analytics results
+        self.deltas = np.array([period_days(p) if p in RUN_PERIODICITIES else 0 for p in self.periodicities],
+                               dtype=np.int64)[self.periodicity_codes]
+        self.scheduled = [i for i, h in enumerate(self.habits) if h.periodicity not in RUN_PERIODICITIES]
+
+        counts = np.array([h.completion_count() for h in self.habits], dtype=np.int64)
+        self.offsets = np.zeros(len(self.habits) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        # Habit.ordinals are array('i') buffers, so one join copies everything at C speed
+        self.ordinals = np.frombuffer(b''.join(h.ordinals.tobytes() for h in self.habits), dtype=np.intc)
+        self.habit_ids = np.repeat(np.arange(len(self.habits)), counts)
+        self._runs = None
+
+    @classmethod
+    def from_tracker(cls, tracker) -> 'ColumnarHabits':
+        return cls(tracker.habits)
+
+    def _run_table(self):
+        """Split completions into runs: (run id per completion, run lengths)."""
+        if self._runs is None:
+            ordinals = self.ordinals.astype(np.int64)
+            starts = np.ones(len(ordinals), dtype=bool)
+            # A run breaks at a habit boundary or when the gap is not exactly one period
+            starts[1:] = ((np.diff(ordinals) != self.deltas[self.habit_ids[1:]])
+                          | (self.habit_ids[1:] != self.habit_ids[:-1]))
+            run_ids = np.cumsum(starts) - 1
+            self._runs = (run_ids, np.bincount(run_ids, minlength=int(starts.sum())))
+        return self._runs
+
+    def filter_by_periodicity(self, periodicity: str) -> List[Habit]:
+        """Habits whose schedule equals the one named, as in analytics.filter_by_periodicity."""
+        try:
+            target = schedule.parse(periodicity)
+        except ValueError:
+            target = None  # Not a known schedule: only matches itself
+        codes = []
+        for code, p in enumerate(self.periodicities):
+            try:
+                if p == periodicity or (target is not None and schedule.parse(p) == target):
+                    codes.append(code)
+            except ValueError:
+                pass
+        return [self.habits[i] for i in np.flatnonzero(np.isin(self.periodicity_codes, codes))]
+
+    def current_streaks(self, today: Optional[date] = None) -> 'np.ndarray':
+        """Current streak of every habit, in habit order."""
+        today = today or date.today()
+        streaks = np.zeros(len(self.habits), dtype=np.int64)
+        has = self.offsets[1:] > self.offsets[:-1]
+        if not has.any():
+            return streaks
+        run_ids, run_lengths = self._run_table()
+        last = self.offsets[1:][has] - 1
+        streaks[has] = np.where(self.ordinals[last] == today.toordinal(), run_lengths[run_ids[last]], 0)
+        for i in self.scheduled:
+            streaks[i] = self.habits[i].current_streak(today)
+        return streaks
+
+    def historical_streaks(self) -> 'np.ndarray':
+        """Longest run each habit ever had, in habit order."""
+        streaks = np.zeros(len(self.habits), dtype=np.int64)
+        has = self.offsets[1:] > self.offsets[:-1]
+        if not has.any():
+            return streaks
+        run_ids, run_lengths = self._run_table()
+        # Runs are grouped by habit, so reduceat over each habit's first run gives its maximum
+        streaks[has] = np.maximum.reduceat(run_lengths, run_ids[self.offsets[:-1][has]])
+        for i in self.scheduled:
+            streaks[i] = analytics.streak_stats(self.habits[i]).longest
+        return streaks
+
+    def completion_rates(self, start: date, end: date) -> 'np.ndarray':
+        """Completions in [start, end] divided by the number of periods in that window."""
+        lo, hi = start.toordinal(), end.toordinal()
+        in_window = (self.ordinals >= lo) & (self.ordinals <= hi)
+        counts = np.bincount(self.habit_ids[in_window], minlength=len(self.habits))
+        periods = (hi - lo) // np.maximum(self.deltas, 1) + 1
+        # An empty window has no periods; its rate is 0, as in analytics.completion_rate
+        rates = np.divide(counts, periods, out=np.zeros(len(self.habits)), where=periods > 0)
+        for i in self.scheduled:
+            rates[i] = analytics.completion_rate(self.habits[i], start, end)
+        return rates
+
+    def longest_streak(self, today: Optional[date] = None) -> int:
+        return int(self.current_streaks(today).max(initial=0))
+
+    def longest_streak_per_habit(self, today: Optional[date] = None) -> Dict[str, int]:
+        return dict(zip(self.names, self.current_streaks(today).tolist()))
+
+    def longest_historical_streak(self) -> int:
+        return int(self.historical_streaks().max(initial=0))
+
+    def longest_historical_streak_per_habit(self) -> Dict[str, int]:
+        return dict(zip(self.names, self.historical_streaks().tolist()))
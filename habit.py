@@ -15,25 +15,319 @@ Components:
 - HabitTracker: Manages habits, handles persistence, delegates analytics
 - analytics: Pure functions for analytics (to be implemented)
 - cli.py: Command-line interface (to be implemented)
+- storage.py: Pluggable storage backends (JSON snapshot + journal, SQLite)
+- columnar.py: Optional NumPy-backed analytics for large habit populations
+- bench.py: Reproducible benchmarks over seeded synthetic stores
+- rollups.py: Incrementally maintained weekly/monthly completion counts
+- leaderboard.py: Incremental top-K current/historical streak rankings
+- pool.py: Per-user tracker shards with an LRU of loaded trackers
+- service.py: Local asyncio HTTP service with coalesced check-offs (loadtest.py drives it)
+- archive.py: Compressed, append-only cold storage for completions outside the hot window
+- schedule.py: Periodicity schedules (every N days, weekdays, calendar weeks/months) on bitsets
+- metrics.py: Opt-in latency/byte instrumentation of hot paths and cProfile capture
+- changefeed.py: Versioned log of mutations and incremental export for mirrors
+- bulkio.py: Streaming CSV/JSON Lines import and export of completions
 - data/habits.json: JSON storage for all habits
 """
 
-import json
-from datetime import datetime, date, timedelta
-from typing import List, Optional, Dict
+import atexit
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from datetime import date, timedelta
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Tuple, Union
 import os
 
+import schedule
+
+DayLike = Union[str, date, int]
+
+def to_ordinal(day: DayLike) -> int:
+    """Convert an ISO date string, date or ordinal to a date ordinal."""
+    if isinstance(day, str):
+        return date.fromisoformat(day).toordinal()
+    if isinstance(day, date):
+        return day.toordinal()
+    return day
+
+# Periodicities whose streaks are runs of completions a fixed number of days apart;
+# every other periodicity string is a schedule (see schedule.py)
+RUN_PERIODICITIES = ('daily', 'weekly')
+
+def _iso(day: DayLike) -> str:
+    return date.fromordinal(to_ordinal(day)).isoformat()
+
+def period_days(periodicity: str) -> int:
+    """Number of days between consecutive completions in an unbroken streak.
+
+    Only run periodicities have one; other schedules raise ValueError.
+    """
+    if periodicity == 'daily':
+        return 1
+    if periodicity == 'weekly':
+        return 7
+    raise ValueError(f"'{periodicity}' is a schedule, not a run of fixed-period completions")
+
+def rename_duplicates(habits: Iterable['Habit']) -> List['Habit']:
+    """Give every habit that repeats an earlier habit's name a unique one, e.g. 'Run (2)'.
+
+    Older stores could hold several habits with the same name; renaming them
+    keeps every one instead of letting the last silently replace the others.
+    """
+    habits = list(habits)
+    taken = {h.name for h in habits}
+    seen = set()
+    for h in habits:
+        if h.name in seen:
+            n = 2
+            while f"{h.name} ({n})" in taken:
+                n += 1
+            h.name = f"{h.name} ({n})"
+            taken.add(h.name)
+        seen.add(h.name)
+    return habits
+
+def _trailing_run(days, delta: int) -> Tuple[int, Optional[int], Optional[int]]:
+    """(length, first, last) of the run of completions ending at the latest one."""
+    if not days:
+        return 0, None, None
+    end = days[-1]
+    length = 0
+    for d in reversed(days):
+        if d != end - length * delta:
+            break
+        length += 1
+    return length, end - (length - 1) * delta, end
+
 class Habit:
+    # Completions are kept as a sorted array of date ordinals (4 bytes each);
+    # ISO strings are only produced when they are read or serialized.
+    # The trailing run of completions is cached and extended on in-order check-offs.
+    # With tiering, older completions live in an archive (_cold) and _days only
+    # holds the recent ones plus any backfills made since the last save.
+    # Habits loaded from a binary snapshot start with _days as a read-only
+    # memoryview of the mapped file, copied into an array on the first change.
+    # Lazy habits of a store that can query them (_source) answer range counts
+    # and streaks from the store until their completions are loaded.
+    __slots__ = ('name', 'periodicity', 'creation_date', '_days', '_loader', '_source', '_cold', '_bits',
+                 '_run_length', '_run_start', '_run_end', '_run_delta')
+
     def __init__(self, name: str, periodicity: str, creation_date: Optional[str] = None, completions: Optional[List[str]] = None):
         self.name = name
         self.periodicity = periodicity  # 'daily' or 'weekly'
         self.creation_date = creation_date or date.today().isoformat()
-        self.completions = completions or []  # List of ISO-format date strings
+        self._source = None
+        self.completions = completions or []
+
+    @classmethod
+    def lazy(cls, name: str, periodicity: str, creation_date: Optional[str], loader: Callable[[], Iterable[DayLike]],
+             source=None):
+        """Create a habit whose completions are only loaded when first accessed.
+
+        `source` may be a storage with completions(name, start, end),
+        count_completions(name, start, end) and current_streak(name, today),
+        which then answer those queries until the completions are loaded.
+        """
+        habit = cls.__new__(cls)
+        habit.name = name
+        habit.periodicity = periodicity
+        habit.creation_date = creation_date or date.today().isoformat()
+        habit._loader = loader
+        habit._source = source
+        habit._cold = None
+        habit.invalidate_streak()
+        return habit
+
+    def __getattr__(self, name):
+        # Only reached while the _days slot is unset, i.e. for a lazy habit
+        if name == '_days' and self._loader is not None:
+            loader, self._loader = self._loader, None
+            self._days = array('i', sorted({to_ordinal(d) for d in loader()}))
+            return self._days
+        raise AttributeError(name)
+
+    @classmethod
+    def from_ordinals(cls, name: str, periodicity: str, creation_date: Optional[str], days, cold=None):
+        """Create a habit around sorted, unique ordinals without copying them.
+
+        `days` may be an array('i') or a read-only memoryview cast to 'i'.
+        """
+        habit = cls.__new__(cls)
+        habit.name = name
+        habit.periodicity = periodicity
+        habit.creation_date = creation_date or date.today().isoformat()
+        habit._days = days
+        habit._loader = None
+        habit._source = None
+        habit._cold = cold
+        habit.invalidate_streak()
+        return habit
+
+    def is_loaded(self) -> bool:
+        return self._loader is None
+
+    @property
+    def completions(self) -> List[str]:
+        """Completion dates as ISO-format strings, oldest first."""
+        return [date.fromordinal(d).isoformat() for d in self.ordinals]
+
+    @completions.setter
+    def completions(self, days):
+        self._days = array('i', sorted({to_ordinal(d) for d in days}))
+        self._loader = None
+        self._cold = None
+        self.invalidate_streak()
+
+    @property
+    def ordinals(self) -> array:
+        """The sorted completion ordinals themselves; treat as read-only.
+
+        For a tiered habit this reads its archive and returns a merged copy.
+        """
+        if self._cold is None:
+            return self._days
+        return array('i', sorted(chain(self._cold.ordinals(), self._days)))
+
+    @property
+    def recent_ordinals(self) -> array:
+        """The completions held in memory: all of them unless the habit is tiered."""
+        return self._days
+
+    @property
+    def archive(self):
+        """The archived part of the history (an archive.ColdHistory), or None."""
+        return self._cold
+
+    def set_tiers(self, cold, recent: Optional[Iterable[int]] = None):
+        """Point the habit at its archived days and, if given, the sorted days to keep in memory.
+
+        The two must together hold the same history as before.
+        """
+        if recent is not None:
+            self._days = array('i', recent)
+            self._loader = None
+        self._cold = cold
+
+    def _in_archive(self, ordinal: int) -> bool:
+        if self._cold is None or ordinal > self._cold.last:
+            return False
+        days = self._cold.ordinals()
+        i = bisect_left(days, ordinal)
+        return i < len(days) and days[i] == ordinal
+
+    def _writable(self) -> array:
+        """_days as a mutable array, copying a read-only view on first use."""
+        days = self._days
+        if type(days) is not array:
+            self._days = array('i')
+            self._days.frombytes(days.cast('B'))
+            days = self._days
+        return days
+
+    def completion_count(self) -> int:
+        return len(self._days) + (self._cold.count if self._cold is not None else 0)
+
+    def is_completed(self, day: DayLike) -> bool:
+        ordinal = to_ordinal(day)
+        i = bisect_left(self._days, ordinal)
+        return (i < len(self._days) and self._days[i] == ordinal) or self._in_archive(ordinal)
+
+    def _span(self, start: DayLike, end: DayLike) -> Tuple[array, int, int]:
+        """The ordinals to search and the indices of the completions in [start, end] in them."""
+        first = to_ordinal(start)
+        # Recent days hold every completion after the archive's last one
+        days = self.ordinals if self._cold is not None and first <= self._cold.last else self._days
+        return days, bisect_left(days, first), bisect_right(days, to_ordinal(end))
+
+    def _queried(self) -> bool:
+        """Whether queries should go to the store: the completions aren't loaded and it can answer them."""
+        return self._loader is not None and self._source is not None
+
+    def completions_between(self, start: DayLike, end: DayLike) -> List[str]:
+        """Completion dates in [start, end] as ISO-format strings, oldest first."""
+        if self._queried():
+            return self._source.completions(self.name, _iso(start), _iso(end))
+        days, i, j = self._span(start, end)
+        return [date.fromordinal(d).isoformat() for d in days[i:j]]
+
+    def count_between(self, start: DayLike, end: DayLike) -> int:
+        if self._queried():
+            return self._source.count_completions(self.name, _iso(start), _iso(end))
+        _, i, j = self._span(start, end)
+        return max(0, j - i)
+
+    def completed_in_week(self, year: int, week: int) -> bool:
+        """Whether the habit was done at least once in the given ISO week."""
+        jan4 = date(year, 1, 4)  # Always in ISO week 1
+        monday = jan4 - timedelta(days=jan4.isoweekday() - 1) + timedelta(weeks=week - 1)
+        return self.count_between(monday, monday + timedelta(days=6)) > 0
+
+    def add_completion(self, day: DayLike) -> bool:
+        """Record a completion, returning False if it was already recorded."""
+        ordinal = to_ordinal(day)
+        days = self._days
+        cold = self._cold
+        if (not days or ordinal > days[-1]) and (cold is None or ordinal > cold.last):
+            self._writable().append(ordinal)  # Fast path: check-offs usually arrive in order
+            self._set_bits((ordinal,))
+            if self._run_delta is not None:
+                if self._run_end is not None and ordinal - self._run_end == self._run_delta:
+                    self._run_length += 1
+                else:
+                    self._run_length, self._run_start = 1, ordinal
+                self._run_end = ordinal
+            return True
+        i = bisect_left(days, ordinal)
+        if (i < len(days) and days[i] == ordinal) or self._in_archive(ordinal):
+            return False
+        # Backfills older than the archive stay in memory until the next tiering save
+        self._writable().insert(i, ordinal)
+        self.invalidate_streak()
+        return True
 
-    def check_off(self):
-        today = date.today().isoformat()
-        if today not in self.completions:
-            self.completions.append(today)
+    def add_completions(self, days: Iterable[DayLike]) -> List[int]:
+        """Record many completions with one merge; return the sorted ordinals that were new."""
+        fresh = {d if type(d) is int else to_ordinal(d) for d in days}
+        if not fresh:
+            return []
+        current = self._days
+        cold = self._cold
+        if current and min(fresh) <= current[-1]:
+            fresh.difference_update(current)
+        if cold is not None and fresh and min(fresh) <= cold.last:
+            fresh.difference_update(cold.ordinals())
+        new = sorted(fresh)
+        if not new:
+            return new
+        if not current or new[0] > current[-1]:
+            self._writable().extend(new)
+            self._run_delta = None
+            self._set_bits(new)
+        else:
+            # Both runs are sorted, so this is a linear merge
+            self._days = array('i', sorted(chain(current, new)))
+            self.invalidate_streak()
+        return new
+
+    def remove_completion(self, day: DayLike) -> bool:
+        """Remove a completion, returning False if there was none."""
+        ordinal = to_ordinal(day)
+        if self._in_archive(ordinal):
+            # Archives are append-only: take the history back into memory, and
+            # the next tiering save archives it again without this day
+            self.set_tiers(None, self.ordinals)
+        i = bisect_left(self._days, ordinal)
+        if i == len(self._days) or self._days[i] != ordinal:
+            return False
+        del self._writable()[i]
+        self.invalidate_streak()
+        return True
+
+    def check_off(self, day: Optional[DayLike] = None) -> bool:
+        return self.add_completion(date.today() if day is None else day)
 
     def to_dict(self) -> Dict:
         return {
@@ -52,63 +346,411 @@ class Habit:
             completions=data.get('completions', [])
         )
 
-    def current_streak(self) -> int:
-        # Calculate current streak based on completions and periodicity
-        if not self.completions:
-            return 0
-        dates = sorted([datetime.strptime(d, '%Y-%m-%d').date() for d in self.completions], reverse=True)
-        streak = 0
-        today = date.today()
-        delta = 1 if self.periodicity == 'daily' else 7
-        for i, d in enumerate(dates):
-            expected = today if i == 0 else dates[i-1] - timedelta(days=delta)
-            if d == expected:
-                streak += 1
-                today = d
-            else:
-                break
-        return streak
+    def invalidate_streak(self):
+        """Drop the cached streak state; it is recomputed on the next query."""
+        self._run_delta = None
+        self._bits = None
+
+    @property
+    def schedule(self) -> 'schedule.Schedule':
+        """The parsed periodicity; raises ValueError for an unknown one."""
+        return schedule.parse(self.periodicity)
+
+    def _set_bits(self, ordinals: Iterable[int]):
+        """Add completions to the cached bitset instead of rebuilding it on the next query."""
+        if self._bits is None:
+            return
+        base, bits = self._bits
+        for ordinal in ordinals:
+            if ordinal < base:  # Only before the first completion of a habit that had none
+                self._bits = None
+                return
+            bits |= 1 << (ordinal - base)
+        self._bits = base, bits
+
+    def bitset(self) -> Tuple[int, int]:
+        """Completions as (base ordinal, int with bit i set if day base + i was completed)."""
+        if self._bits is None:
+            self._bits = schedule.to_bitset(self.ordinals)
+        return self._bits
+
+    def adherence(self, start: DayLike, end: DayLike) -> Tuple[int, int]:
+        """(met, due) occurrences of the habit's schedule in the periods overlapping [start, end]."""
+        base, bits = self.bitset()
+        return self.schedule.adherence(base, bits, date.fromordinal(to_ordinal(start)),
+                                       date.fromordinal(to_ordinal(end)))
+
+    def current_run(self) -> Tuple[int, Optional[int], Optional[int]]:
+        """Return (length, first ordinal, last ordinal) of the most recent run of completions.
+
+        Only defined for RUN_PERIODICITIES; other schedules raise ValueError.
+        """
+        delta = period_days(self.periodicity)
+        if self._run_delta != delta:
+            self._recompute_run(delta)
+        return self._run_length, self._run_start, self._run_end
+
+    def _recompute_run(self, delta: int):
+        length, start, end = _trailing_run(self._days, delta)
+        cold = self._cold
+        if cold is not None and (end is None or start - delta <= cold.last):
+            # The run may continue into (or lie entirely in) the archive
+            length, start, end = _trailing_run(self.ordinals, delta)
+        self._run_length = length
+        self._run_start = start
+        self._run_end = end
+        self._run_delta = delta
+
+    def current_streak(self, today: Optional[date] = None) -> int:
+        today = today or date.today()
+        if self.periodicity not in RUN_PERIODICITIES:
+            return self.schedule.streak(*self.bitset(), today)
+        if self._queried():
+            return self._source.current_streak(self.name, today)
+        # The streak only counts if the most recent completion is today
+        length, _, end = self.current_run()
+        return length if end == today.toordinal() else 0
 
 class HabitTracker:
-    def __init__(self, storage_path: str = 'data/habits.json'):
-        self.storage_path = storage_path
-        self.habits: List[Habit] = []
+    def __init__(self, storage_path: str = 'data/habits.json', journal: bool = False,
+                 compact_records: int = 1000, compact_bytes: int = 1024 * 1024, storage=None,
+                 lazy: bool = False, shared: bool = False,
+                 autosave: bool = False, debounce: float = 0.5, max_delay: float = 5.0,
+                 tier_days: Optional[int] = None, changefeed: Optional[bool] = None):
+        from storage import open_storage  # storage imports this module
+        self.storage_path = storage.path if storage is not None else storage_path
+        self._index: Dict[str, Habit] = {}  # Insertion-ordered name -> Habit
+        self._habit_list: Optional[List[Habit]] = None
+        self._pending: List[Dict] = []  # Mutations not yet handed to storage
+        self._undo: List[Tuple[Habit, int]] = []  # Check-offs made inside a batch
+        self._batch_depth = 0
+        self._rollups = None  # Built or loaded on first use, then kept up to date
+        self._leaderboard = None  # Same, for top_streaks()
+        self._reset_pending = False  # Habits were replaced wholesale since the last save
+        self._lock = threading.RLock()
         self._ensure_data_dir()
+        self.storage = storage or open_storage(
+            storage_path, journal=journal, compact_records=compact_records, compact_bytes=compact_bytes,
+            lazy=lazy, shared=shared, tier_days=tier_days)
+        # Once a store has a change feed, every tracker keeps it up to date unless told not to
+        feed_path = self.storage_path + '.changes'
+        self.changefeed = None
+        if changefeed or (changefeed is None and os.path.exists(feed_path)):
+            from changefeed import ChangeFeed
+            self.changefeed = ChangeFeed(feed_path)
         self.load()
 
+        # Autosave: mutations return immediately and a background thread writes
+        # once no change arrived for `debounce` seconds, or `max_delay` after the first
+        self.autosave = autosave
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.last_autosave_error: Optional[BaseException] = None
+        self._first_change: Optional[float] = None
+        self._last_change: Optional[float] = None
+        self._closed = False
+        self._wakeup = threading.Condition(self._lock)
+        self._autosaver: Optional[threading.Thread] = None
+        if autosave:
+            self._autosaver = threading.Thread(target=self._autosave_loop, name='habit-autosave', daemon=True)
+            self._autosaver.start()
+            atexit.register(self.close)
+
+    @property
+    def habits(self) -> List[Habit]:
+        """All habits in insertion order; treat the list as read-only."""
+        if self._habit_list is None:
+            self._habit_list = list(self._index.values())
+        return self._habit_list
+
+    @habits.setter
+    def habits(self, habits: List[Habit]):
+        with self._lock:
+            self._check_open()
+            self._replace_habits(habits)
+            self._reset_pending = True  # The change feed can't describe this as mutations
+            try:
+                os.remove(self.rollups_path)  # Describes the old habits
+            except FileNotFoundError:
+                pass
+
+    def _replace_habits(self, habits: List[Habit]):
+        with self._lock:
+            self._index = {h.name: h for h in rename_duplicates(habits)}
+            self._habit_list = None
+            self._rollups = None
+            self._leaderboard = None
+
+    @property
+    def rollups_path(self) -> str:
+        return self.storage_path + '.rollups.json'
+
+    @property
+    def rollups(self):
+        """Week/month completion rollups, maintained incrementally after first use."""
+        with self._lock:
+            if self._rollups is None:
+                from rollups import Rollups  # rollups imports this module
+                self._rollups = Rollups.load(self.rollups_path, self.habits)
+            return self._rollups
+
+    def top_streaks(self, k: int, periodicity: Optional[str] = None, historical: bool = False,
+                    today: Optional[date] = None) -> List[Tuple[str, int]]:
+        """Return up to k (name, streak) pairs ranked by current or historical streak."""
+        with self._lock:
+            if self._leaderboard is None:
+                from leaderboard import StreakLeaderboard  # leaderboard imports this module
+                self._leaderboard = StreakLeaderboard.build(self.habits, today)
+            return self._leaderboard.top(k, periodicity, historical, today)
+
+    @property
+    def dirty(self) -> bool:
+        """Whether there are mutations that have not been written yet."""
+        with self._lock:
+            return bool(self._pending)
+
     def _ensure_data_dir(self):
         directory = os.path.dirname(self.storage_path)
         if directory:  # Only create directory if there is one
             os.makedirs(directory, exist_ok=True)
 
+    def get(self, name: str) -> Optional[Habit]:
+        return self._index.get(name)
+
     def add_habit(self, habit: Habit):
-        self.habits.append(habit)
-        self.save()
+        with self._lock:
+            self._check_open()
+            if habit.name in self._index:
+                raise ValueError(f"Habit '{habit.name}' already exists")
+            self._index[habit.name] = habit
+            if self._habit_list is not None:
+                self._habit_list.append(habit)
+            if self._rollups is not None:
+                self._rollups.add_habit(habit)
+            if self._leaderboard is not None:
+                self._leaderboard.update(habit)
+            self._record({'op': 'add', 'habit': habit.to_dict()})
 
-    def delete_habit(self, name: str):
-        self.habits = [h for h in self.habits if h.name != name]
-        self.save()
+    def delete_habit(self, name: str) -> bool:
+        with self._lock:
+            self._check_open()
+            if self._index.pop(name, None) is None:
+                return False
+            self._habit_list = None
+            if self._rollups is not None:
+                self._rollups.remove_habit(name)
+            if self._leaderboard is not None:
+                self._leaderboard.remove(name)
+            self._record({'op': 'delete', 'name': name})
+            return True
 
-    def check_off(self, name: str):
-        for habit in self.habits:
-            if habit.name == name:
-                habit.check_off()
+    def check_off(self, name: str, day: Optional[DayLike] = None) -> bool:
+        with self._lock:
+            self._check_open()
+            habit = self._index.get(name)
+            if habit is None:
+                return False
+            ordinal = to_ordinal(date.today() if day is None else day)
+            if habit.check_off(ordinal):
+                if self._batch_depth:
+                    self._undo.append((habit, ordinal))
+                if self._rollups is not None:
+                    self._rollups.record(name, ordinal)
+                if self._leaderboard is not None:
+                    self._leaderboard.update(habit, ordinal)
+                self._record({'op': 'check_off', 'name': name, 'day': date.fromordinal(ordinal).isoformat()})
+            return True
+
+    def add_completions(self, name: str, days: Iterable[DayLike]) -> int:
+        """Backfill many completions of one habit as a single change; return how many were new."""
+        with self._lock:
+            self._check_open()
+            habit = self._index.get(name)
+            if habit is None:
+                raise ValueError(f"Habit '{name}' does not exist")
+            new = habit.add_completions(days)
+            if not new:
+                return 0
+            if self._batch_depth:
+                self._undo.extend((habit, ordinal) for ordinal in new)
+            if self._rollups is not None:
+                for ordinal in new:
+                    self._rollups.record(name, ordinal)
+            if self._leaderboard is not None:
+                self._leaderboard.update(habit)
+            self._record({'op': 'backfill', 'name': name,
+                          'days': [date.fromordinal(d).isoformat() for d in new]})
+            return len(new)
+
+    def check_off_many(self, names: Iterable[str], day: Optional[DayLike] = None) -> int:
+        """Check off several habits with a single write; return how many were found."""
+        with self.batch():
+            return sum(self.check_off(name, day) for name in names)
+
+    @contextmanager
+    def batch(self):
+        """Defer persistence until the block exits, rolling back if it raises."""
+        with self._lock:
+            index = dict(self._index)
+            pending_start = len(self._pending)
+            undo_start = len(self._undo)
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                for habit, ordinal in reversed(self._undo[undo_start:]):
+                    habit.remove_completion(ordinal)
+                del self._undo[undo_start:]
+                del self._pending[pending_start:]
+                self._index = index
+                self._habit_list = None
+                # Rollbacks are rare; rebuild derived state lazily
+                self._rollups = None
+                self._leaderboard = None
+                raise
+            finally:
+                self._batch_depth -= 1
+            if not self._batch_depth:
+                self._undo.clear()
+                self._persist()
+
+    def _check_open(self):
+        # A closed tracker has no writer left, so changes would never reach the store
+        if self._closed:
+            raise ValueError(f"The tracker for {self.storage_path} is closed")
+
+    def _record(self, change: Dict):
+        self._pending.append(change)
+        if not self._batch_depth:
+            self._persist()
+
+    def _persist(self):
+        if not self.autosave:
+            self.flush()
+            return
+        now = time.monotonic()
+        if self._first_change is None:
+            self._first_change = now
+        self._last_change = now
+        self._wakeup.notify()
+
+    def _autosave_loop(self):
+        with self._wakeup:
+            while not self._closed:
+                if self._first_change is None:
+                    self._wakeup.wait()
+                    continue
+                deadline = min(self._last_change + self.debounce, self._first_change + self.max_delay)
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                try:
+                    self.flush()
+                except Exception as e:
+                    # Keep the changes pending and try again after another debounce window
+                    self.last_autosave_error = e
+                    self._first_change = self._last_change = time.monotonic()
+
+    def flush(self):
+        """Hand pending mutations to storage in a single write."""
+        with self._lock:
+            if self._reset_pending:
+                # Replaced habits can't be described as mutations; save() also records the reset
                 self.save()
-                return True
-        return False
+                return
+            self._first_change = self._last_change = None
+            if not self._pending:
+                return
+            changes, self._pending = self._pending, []
+            # The feed is appended under the store's lock so both see writers in the same order
+            with self.storage.locked():
+                try:
+                    merged = self.storage.apply(changes, self.habits)
+                except BaseException:
+                    self._pending = changes + self._pending
+                    raise
+                if self.changefeed is not None:
+                    self.changefeed.append(changes)
+            if merged is not None:
+                # Another process wrote first; adopt the store with our changes replayed on top
+                self._replace_habits(merged)
 
     def save(self):
-        data = [habit.to_dict() for habit in self.habits]
-        with open(self.storage_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        with self._lock:
+            with self.storage.locked():
+                self.storage.save(self.habits)
+                if self.changefeed is not None:
+                    self.changefeed.append([{'op': 'reset'}] if self._reset_pending else self._pending)
+            self._reset_pending = False
+            self._pending.clear()
+            self._first_change = self._last_change = None
+            self._save_rollups()
+
+    def _save_rollups(self):
+        if self._rollups is not None:
+            self._rollups.save(self.rollups_path, self.habits)
+
+    def compact(self):
+        """Fold any journaled mutations into a new snapshot.
+
+        Unlike save(), a shared tracker that has fallen behind picks up what
+        other processes wrote instead of overwriting it.
+        """
+        with self._lock:
+            if self._reset_pending:
+                self.save()
+                return
+            self.flush()
+            merged = self.storage.compact(self.habits)
+            if merged is not None:
+                self._replace_habits(merged)
+            self._save_rollups()
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Snapshot of the process-wide instrumentation; empty unless metrics.enable() was called."""
+        import metrics
+        return metrics.snapshot()
 
     def load(self):
-        try:
-            with open(self.storage_path, 'r') as f:
-                data = json.load(f)
-            self.habits = [Habit.from_dict(h) for h in data]
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.habits = []
+        with self._lock:
+            self._replace_habits(self.storage.load())
+
+    @property
+    def version(self) -> int:
+        """Version of the last mutation in the change feed (0 without one).
+
+        Versions are assigned when mutations are written, so flush() first
+        to include pending ones.
+        """
+        return self.changefeed.last_version() if self.changefeed is not None else 0
+
+    def changes_since(self, version: int) -> Iterator[Dict]:
+        """Flush, then stream the change records after `version`, oldest first."""
+        if self.changefeed is None:
+            raise ValueError("No change feed; open the tracker with changefeed=True")
+        self.flush()
+        return self.changefeed.since(version)
+
+    def versioned_snapshot(self) -> Tuple[int, List[Dict]]:
+        """Flush, then return the current version with every habit as a dict."""
+        with self._lock:
+            self.flush()
+            return self.version, [h.to_dict() for h in self.habits]
+
+    def close(self):
+        """Write pending mutations, stop the autosave thread and release the store."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+            self.flush()
+            self._save_rollups()
+        if self._autosaver is not None:
+            self._autosaver.join()
+            atexit.unregister(self.close)
+        self.storage.close()
 
 def load_predefined_habits() -> list:
     """Return a list of predefined Habit objects with 4 weeks of example data."""
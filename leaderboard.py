@@ -0,0 +1,138 @@
+"""
+Incremental top-K streak leaderboard.
+
+Keeps heaps of habits ranked by current and by historical streak, updated on
+each check-off and delete instead of recomputing every habit's streak. Heap
+entries are invalidated lazily: an entry only counts while it still matches
+the habit's latest score, and stale ones are discarded as queries meet them.
+Habits with a schedule other than daily or weekly keep their streak through
+a whole period, so theirs are recomputed when the day rolls over.
+"""
+
+import heapq
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import analytics
+from habit import Habit, RUN_PERIODICITIES
+
+CURRENT = 'current'
+HISTORICAL = 'historical'
+
+
+class StreakLeaderboard:
+    """Top habits by current and historical streak."""
+
+    def __init__(self, today: Optional[date] = None):
+        self.today = (today or date.today()).toordinal()
+        self._periodicity: Dict[str, str] = {}
+        self._runs: Dict[str, Tuple[int, Optional[int]]] = {}  # name -> (run length, run end)
+        self._longest: Dict[str, int] = {}
+        self._by_end: Dict[int, Set[str]] = {}  # run end ordinal -> names
+        self._heaps: Dict[Tuple[str, Optional[str]], List[Tuple[int, str]]] = {}
+        self._scheduled: Dict[str, Habit] = {}  # Habits whose streak is not a run of completions
+
+    @classmethod
+    def build(cls, habits: Iterable[Habit], today: Optional[date] = None) -> 'StreakLeaderboard':
+        board = cls(today)
+        for habit in habits:
+            board.update(habit)
+        return board
+
+    def _score(self, kind: str, name: str) -> int:
+        if kind == HISTORICAL:
+            return self._longest[name]
+        length, end = self._runs[name]
+        return length if end == self.today else 0
+
+    def _push(self, kind: str, name: str):
+        score = self._score(kind, name)
+        if score <= 0:
+            return
+        for periodicity in (None, self._periodicity[name]):
+            heap = self._heaps.setdefault((kind, periodicity), [])
+            heapq.heappush(heap, (-score, name))
+            if len(heap) > 2 * len(self._runs) + 32:
+                self._rebuild_heap(kind, periodicity)
+
+    def _rebuild_heap(self, kind: str, periodicity: Optional[str]):
+        names = self._by_end.get(self.today, ()) if kind == CURRENT else self._longest
+        heap = [(-self._score(kind, n), n) for n in names
+                if periodicity in (None, self._periodicity[n]) and self._score(kind, n) > 0]
+        heapq.heapify(heap)
+        self._heaps[(kind, periodicity)] = heap
+
+    def update(self, habit: Habit, ordinal: Optional[int] = None):
+        """Refresh a habit's scores after it was added or checked off on `ordinal`."""
+        name = habit.name
+        today = date.fromordinal(self.today)
+        if habit.periodicity in RUN_PERIODICITIES:
+            length, _, end = habit.current_run()
+            fast = name in self._runs and ordinal is not None and ordinal == end
+        else:
+            # Recorded as a run ending today while the streak lasts, so scoring works alike.
+            # A schedule's latest run may lie in a past period, so its longest is always recomputed.
+            length = habit.current_streak(today)
+            end = self.today if length else None
+            fast = False
+        if fast:
+            # In-order check-off: the current run can only have grown
+            longest = max(self._longest[name], length)
+        else:
+            longest = analytics.streak_stats(habit, today).longest
+        self.remove(name)
+        if habit.periodicity not in RUN_PERIODICITIES:
+            self._scheduled[name] = habit
+        self._periodicity[name] = habit.periodicity
+        self._runs[name] = (length, end)
+        self._longest[name] = longest
+        if end is not None:
+            self._by_end.setdefault(end, set()).add(name)
+        self._push(CURRENT, name)
+        self._push(HISTORICAL, name)
+
+    def remove(self, name: str):
+        """Forget a habit; its heap entries become stale."""
+        if name not in self._runs:
+            return
+        _, end = self._runs.pop(name)
+        del self._longest[name]
+        del self._periodicity[name]
+        self._scheduled.pop(name, None)
+        names = self._by_end.get(end)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._by_end[end]
+
+    def roll_over(self, today: date):
+        """Move to a new day; only habits whose run ends today keep a current streak."""
+        self.today = today.toordinal()
+        for habit in list(self._scheduled.values()):
+            self.update(habit)
+        for kind, periodicity in list(self._heaps):
+            if kind == CURRENT:
+                self._rebuild_heap(kind, periodicity)
+
+    def top(self, k: int, periodicity: Optional[str] = None, historical: bool = False,
+            today: Optional[date] = None) -> List[Tuple[str, int]]:
+        """Return up to k (name, streak) pairs with a positive streak, best first."""
+        today = today or date.today()
+        if today.toordinal() != self.today:
+            self.roll_over(today)
+        kind = HISTORICAL if historical else CURRENT
+        key = (kind, periodicity)
+        if key not in self._heaps:
+            self._rebuild_heap(kind, periodicity)
+        heap = self._heaps[key]
+        result, seen = [], set()
+        while heap and len(result) < k:
+            score, name = heapq.heappop(heap)
+            valid = (name in self._runs and name not in seen and -score == self._score(kind, name)
+                     and periodicity in (None, self._periodicity[name]))
+            if valid:
+                seen.add(name)
+                result.append((name, -score))
+        for name, score in result:
+            heapq.heappush(heap, (-score, name))
+        return result
@@ -0,0 +1,170 @@
+"""
+Load test for the local habit service.
+
+Opens `concurrency` keep-alive connections and sends a seeded mix of
+check-offs (on random past dates, so most of them are real writes) and
+stats/list reads. Reports requests per second and latency percentiles as
+JSON. With --spawn it starts its own service on a temporary store filled
+with synthetic habits.
+
+Usage:
+    python loadtest.py --port 8080 --concurrency 50 --requests 200
+    python loadtest.py --spawn --habits 1000 --years 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from bench import generate_habits
+from metrics import percentile
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str,
+                  payload: Optional[Dict] = None) -> Tuple[int, object]:
+    """Send one request on a keep-alive connection and return (status, JSON body)."""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n"
+                 .encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def _plan(names: List[str], count: int, read_share: float, rng: random.Random) -> List[Tuple]:
+    """Return (kind, method, path, payload) tuples."""
+    plan = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < read_share / 2:
+            plan.append(('stats', 'GET', '/stats', None))
+        elif roll < read_share:
+            plan.append(('list', 'GET', '/habits', None))
+        else:
+            day = date.today() - timedelta(days=rng.randrange(3650))
+            path = '/habits/%s/check' % quote(rng.choice(names), safe='')
+            plan.append(('check', 'POST', path, {'date': day.isoformat()}))
+    return plan
+
+
+async def run_load(host: str, port: int, names: List[str], concurrency: int = 50, requests: int = 200,
+                   read_share: float = 0.1, seed: int = 0) -> Dict:
+    """Run the load and return the report; `requests` is per connection."""
+    rng = random.Random(seed)
+    latencies: Dict[str, List[float]] = {'check': [], 'stats': [], 'list': []}
+    errors = 0
+
+    async def client(plan):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for kind, method, path, payload in plan:
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, method, path, payload)
+                latencies[kind].append((time.perf_counter() - start) * 1000)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    plans = [_plan(names, requests, read_share, rng) for _ in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(plan) for plan in plans))
+    elapsed = time.perf_counter() - start
+
+    every = sorted(ms for values in latencies.values() for ms in values)
+    report = {
+        'requests': len(every),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(len(every) / elapsed, 1),
+        'p50_ms': round(percentile(every, 50), 3),
+        'p99_ms': round(percentile(every, 99), 3),
+        'endpoints': {},
+    }
+    for kind, values in latencies.items():
+        values.sort()
+        if values:
+            report['endpoints'][kind] = {'requests': len(values), 'p50_ms': round(percentile(values, 50), 3),
+                                         'p99_ms': round(percentile(values, 99), 3)}
+    return report
+
+
+async def _habit_names(host: str, port: int) -> List[str]:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, habits = await request(reader, writer, 'GET', '/habits')
+    finally:
+        writer.close()
+    return [h['name'] for h in habits]
+
+
+def _spawn(args, work_dir: str) -> Tuple[subprocess.Popen, int]:
+    # Runs in its own process so client and server don't share a GIL
+    from habit import HabitTracker
+    store = os.path.join(work_dir, 'habits.json')
+    tracker = HabitTracker(store)
+    tracker.habits = generate_habits(args.habits, args.years, seed=args.seed)
+    tracker.save()
+    service = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service.py')
+    process = subprocess.Popen([sys.executable, service, '--store', store, '--port', '0'],
+                               stdout=subprocess.PIPE, text=True)
+    port = int(process.stdout.readline().rsplit(':', 1)[1])
+    return process, port
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the local habit service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--concurrency', type=int, default=50, help="parallel keep-alive connections")
+    parser.add_argument('--requests', type=int, default=200, help="requests per connection")
+    parser.add_argument('--read-share', type=float, default=0.1, help="fraction of stats/list requests")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spawn', action='store_true', help="start a service on a synthetic temporary store")
+    parser.add_argument('--habits', type=int, default=100, help="habits in the spawned store")
+    parser.add_argument('--years', type=float, default=1, help="history in the spawned store")
+    args = parser.parse_args(argv)
+
+    process = work_dir = None
+    port = args.port
+    try:
+        if args.spawn:
+            work_dir = tempfile.mkdtemp(prefix='habit-load-')
+            process, port = _spawn(args, work_dir)
+        names = asyncio.run(_habit_names(args.host, port))
+        if not names:
+            print("The service has no habits to check off", file=sys.stderr)
+            return 1
+        report = asyncio.run(run_load(args.host, port, names, args.concurrency, args.requests,
+                                      args.read_share, args.seed))
+        print(json.dumps(report, indent=2))
+        return 1 if report['errors'] else 0
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGINT)  # The service closes its tracker on Ctrl-C
+            process.wait()
+        if work_dir is not None:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
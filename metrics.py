@@ -0,0 +1,179 @@
+"""
+Opt-in instrumentation for the tracker's hot paths.
+
+enable() wraps HabitTracker.load/save/flush, Habit.check_off,
+Habit.current_streak and every public analytics function so each call
+records its latency and, for tracker operations, the bytes its storage read
+and wrote. disable() puts the original functions back, so instrumentation
+costs nothing while it is off. Metrics are process-wide.
+
+    metrics.enable()
+    ...
+    print(metrics.snapshot())        # or tracker.metrics()
+    with metrics.profile('stats'):   # cProfile report kept in metrics.profiles['stats']
+        analytics.summary(tracker.habits)
+"""
+
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+MAX_SAMPLES = 10000  # Latencies kept per operation for percentiles (the most recent ones)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Metric:
+    """Counters and recent latencies for one operation."""
+
+    __slots__ = ('calls', 'total_ns', 'max_ns', 'bytes_read', 'bytes_written', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def to_dict(self) -> Dict:
+        latencies = sorted(ns / 1e6 for ns in self.samples)
+        return {
+            'calls': self.calls,
+            'total_ms': round(self.total_ns / 1e6, 3),
+            'mean_ms': round(self.total_ns / 1e6 / self.calls, 4) if self.calls else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 4),
+            'p90_ms': round(percentile(latencies, 90), 4),
+            'p99_ms': round(percentile(latencies, 99), 4),
+            'max_ms': round(self.max_ns / 1e6, 4),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+        }
+
+
+_metrics: Dict[str, Metric] = {}
+_lock = threading.Lock()
+_originals: List[Tuple[object, str, object]] = []  # (owner, attribute, original) while enabled
+profiles: Dict[str, str] = {}  # Name -> cProfile report text
+
+
+def record(name: str, elapsed_ns: int, bytes_read: int = 0, bytes_written: int = 0):
+    """Add one call to an operation's metrics."""
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = Metric()
+        metric.calls += 1
+        metric.total_ns += elapsed_ns
+        metric.max_ns = max(metric.max_ns, elapsed_ns)
+        metric.bytes_read += bytes_read
+        metric.bytes_written += bytes_written
+        metric.samples.append(elapsed_ns)
+
+
+def _io(storage) -> Tuple[int, int]:
+    return getattr(storage, 'bytes_read', 0), getattr(storage, 'bytes_written', 0)
+
+
+def _timed(func, name: str, counts_io: bool):
+    if counts_io:
+        @functools.wraps(func)
+        def wrapper(tracker, *args, **kwargs):
+            read, written = _io(tracker.storage)
+            start = time.perf_counter_ns()
+            try:
+                return func(tracker, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                now_read, now_written = _io(tracker.storage)
+                record(name, elapsed, now_read - read, now_written - written)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter_ns() - start)
+    return wrapper
+
+
+def _targets():
+    """(owner, attribute, metric name, counts bytes) for every instrumented function."""
+    import analytics
+    from habit import Habit, HabitTracker
+    targets = [
+        (HabitTracker, 'load', 'tracker.load', True),
+        (HabitTracker, 'save', 'tracker.save', True),
+        (HabitTracker, 'flush', 'tracker.flush', True),
+        (Habit, 'check_off', 'habit.check_off', False),
+        (Habit, 'current_streak', 'habit.current_streak', False),
+    ]
+    for attr, func in sorted(vars(analytics).items()):
+        if inspect.isfunction(func) and func.__module__ == analytics.__name__ and not attr.startswith('_'):
+            targets.append((analytics, attr, f'analytics.{attr}', False))
+    return targets
+
+
+def enable():
+    """Start recording; a no-op if already enabled."""
+    with _lock:
+        if _originals:
+            return
+        for owner, attr, name, counts_io in _targets():
+            original = vars(owner)[attr]
+            _originals.append((owner, attr, original))
+            setattr(owner, attr, _timed(original, name, counts_io))
+
+
+def disable():
+    """Stop recording and restore the uninstrumented functions; recorded metrics are kept."""
+    with _lock:
+        while _originals:
+            owner, attr, original = _originals.pop()
+            setattr(owner, attr, original)
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+        profiles.clear()
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Metrics per operation name, as JSON-serializable dicts."""
+    with _lock:
+        return {name: metric.to_dict() for name, metric in sorted(_metrics.items())}
+
+
+@contextmanager
+def profile(name: str, sort: str = 'cumulative', limit: int = 25):
+    """Run the block under cProfile and keep the top of its report in profiles[name]."""
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    start = time.perf_counter_ns()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        record(f'profile.{name}', time.perf_counter_ns() - start)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats(sort).print_stats(limit)
+        profiles[name] = report.getvalue()
@@ -0,0 +1,141 @@
+"""
+Multi-tenant habit stores.
+
+TrackerPool keeps each user's habits in a separate shard under one
+directory (a JSON file, or a SQLite database with extension='.db') and
+holds at most `capacity` trackers in memory, evicting the least recently
+used one. Trackers are opened with autosave, so an evicted tracker with
+unwritten changes is flushed before it is dropped. An evicted tracker is
+closed and refuses further changes, so code that holds on to one across
+other pool calls should borrow it with `with pool.use(user_id)`, which
+keeps it from being evicted until the block exits. Cross-shard analytics
+run in a process pool, one shard per task.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+from urllib.parse import quote, unquote
+
+from habit import Habit, HabitTracker
+
+T = TypeVar('T')
+
+
+def shard_name(user_id: str) -> str:
+    """Map a user id to a file-system safe, reversible shard name without dots."""
+    # Dots are escaped too, so shard names never clash with sidecar files such as .journal
+    return quote(user_id, safe='').replace('.', '%2E').replace('~', '%7E')
+
+
+def _run_on_shard(path: str, func: Callable[[List[Habit]], T]) -> T:
+    # Runs in a worker process: load the shard read-only and apply func to its habits
+    tracker = HabitTracker(path)
+    try:
+        return func(tracker.habits)
+    finally:
+        tracker.close()
+
+
+class TrackerPool:
+    """Per-user trackers loaded on demand, with an LRU of hot shards."""
+
+    def __init__(self, root: str = 'data/users', capacity: int = 64, extension: str = '.json',
+                 **tracker_options):
+        self.root = root
+        self.capacity = capacity
+        self.extension = extension
+        self.tracker_options = {'autosave': True, **tracker_options}
+        self._trackers: 'OrderedDict[str, HabitTracker]' = OrderedDict()
+        self._pins: Dict[str, int] = {}  # user id -> number of open use() blocks
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def shard_path(self, user_id: str) -> str:
+        return os.path.join(self.root, shard_name(user_id) + self.extension)
+
+    def get(self, user_id: str) -> HabitTracker:
+        """Return the user's tracker, loading its shard if it is not in memory.
+
+        The tracker is only good until a later call evicts it; use() pins it.
+        """
+        with self._lock:
+            return self._get(user_id)
+
+    @contextmanager
+    def use(self, user_id: str) -> Iterator[HabitTracker]:
+        """The user's tracker, kept in memory until the block exits."""
+        with self._lock:
+            tracker = self._get(user_id)
+            self._pins[user_id] = self._pins.get(user_id, 0) + 1
+        try:
+            yield tracker
+        finally:
+            with self._lock:
+                self._pins[user_id] -= 1
+                if not self._pins[user_id]:
+                    del self._pins[user_id]
+                self._evict()
+
+    def _get(self, user_id: str) -> HabitTracker:
+        tracker = self._trackers.get(user_id)
+        if tracker is not None:
+            self._trackers.move_to_end(user_id)
+            return tracker
+        tracker = HabitTracker(self.shard_path(user_id), **self.tracker_options)
+        self._trackers[user_id] = tracker
+        self._evict()
+        return tracker
+
+    def _evict(self):
+        # Pinned trackers are skipped, so the pool can run over capacity while they are in use
+        excess = len(self._trackers) - self.capacity
+        for user_id in [u for u in self._trackers if u not in self._pins][:max(excess, 0)]:
+            self._trackers.pop(user_id).close()  # Flushes anything still pending
+
+    def __len__(self) -> int:
+        return len(self._trackers)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._trackers
+
+    def users(self) -> List[str]:
+        """All user ids with a shard on disk (a shard's file name is its encoded id)."""
+        users = []
+        for entry in sorted(os.listdir(self.root)):
+            name = entry[:-len(self.extension)]
+            if entry.endswith(self.extension) and name and '.' not in name:
+                users.append(unquote(name))
+        return users
+
+    def flush(self):
+        """Write every loaded tracker's pending changes."""
+        with self._lock:
+            for tracker in self._trackers.values():
+                tracker.flush()
+
+    def close(self):
+        """Flush and release every loaded tracker."""
+        with self._lock:
+            while self._trackers:
+                _, tracker = self._trackers.popitem(last=False)
+                tracker.close()
+
+    def map_shards(self, func: Callable[[List[Habit]], T], users: Optional[Iterable[str]] = None,
+                   processes: Optional[int] = None) -> Dict[str, T]:
+        """Apply func to each user's habits in parallel worker processes.
+
+        func must be picklable (a module-level function, such as those in
+        analytics). Loaded trackers are flushed first so workers see every change.
+        """
+        self.flush()
+        users = list(self.users() if users is None else users)
+        # Spawned workers don't inherit the autosave threads' locks the way forked ones would
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            futures = {u: executor.submit(_run_on_shard, self.shard_path(u), func) for u in users}
+            return {u: future.result() for u, future in futures.items()}
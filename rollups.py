@@ -0,0 +1,141 @@
+"""
+Incrementally maintained completion rollups.
+
+Rollups hold completion counts per ISO week and per month for every habit,
+plus global week/month counts and totals per periodicity. Each check-off
+updates them in O(1), so dashboards and the statistics screen can read the
+aggregates instead of scanning completion history.
+"""
+
+import json
+import os
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from habit import Habit
+
+ROLLUP_FORMAT = 2
+
+
+def week_key(ordinal: int) -> str:
+    year, week, _ = date.fromordinal(ordinal).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(ordinal: int) -> str:
+    day = date.fromordinal(ordinal)
+    return f"{day.year}-{day.month:02d}"
+
+
+def fingerprint(habit: Habit) -> List[int]:
+    """Completion count plus first and last completion, to spot a changed history."""
+    days, cold = habit.recent_ordinals, habit.archive
+    if cold is not None:
+        # Reading the archive for its first day would defeat tiering; its byte range pins it instead
+        return [habit.completion_count(), cold.offset, cold.size, days[-1] if len(days) else cold.last]
+    return [len(days), days[0], days[-1]] if len(days) else [0]
+
+
+class HabitRollup:
+    """Week and month completion counts for one habit."""
+
+    __slots__ = ('periodicity', 'total', 'weeks', 'months')
+
+    def __init__(self, periodicity: str, total: int = 0,
+                 weeks: Optional[Dict[str, int]] = None, months: Optional[Dict[str, int]] = None):
+        self.periodicity = periodicity
+        self.total = total
+        self.weeks = Counter(weeks or {})
+        self.months = Counter(months or {})
+
+    @classmethod
+    def from_habit(cls, habit: Habit) -> 'HabitRollup':
+        rollup = cls(habit.periodicity, habit.completion_count())
+        rollup.weeks.update(week_key(d) for d in habit.ordinals)
+        rollup.months.update(month_key(d) for d in habit.ordinals)
+        return rollup
+
+    def to_dict(self) -> Dict:
+        return {'periodicity': self.periodicity, 'total': self.total,
+                'weeks': dict(self.weeks), 'months': dict(self.months)}
+
+
+class Rollups:
+    """Per-habit and global completion rollups."""
+
+    def __init__(self):
+        self.habits: Dict[str, HabitRollup] = {}
+        self.weeks: Counter = Counter()
+        self.months: Counter = Counter()
+        self.periodicity_totals: Counter = Counter()
+
+    @classmethod
+    def build(cls, habits: Iterable[Habit]) -> 'Rollups':
+        rollups = cls()
+        for habit in habits:
+            rollups.add_habit(habit)
+        return rollups
+
+    def add_habit(self, habit: Habit, rollup: Optional[HabitRollup] = None):
+        rollup = rollup or HabitRollup.from_habit(habit)
+        self.remove_habit(habit.name)
+        self.habits[habit.name] = rollup
+        self.weeks.update(rollup.weeks)
+        self.months.update(rollup.months)
+        self.periodicity_totals[rollup.periodicity] += rollup.total
+
+    def remove_habit(self, name: str):
+        rollup = self.habits.pop(name, None)
+        if rollup is None:
+            return
+        self.weeks.subtract(rollup.weeks)
+        self.months.subtract(rollup.months)
+        self.periodicity_totals[rollup.periodicity] -= rollup.total
+        # Drop keys that fell to zero so the counters don't grow without bound
+        self.weeks = +self.weeks
+        self.months = +self.months
+
+    def record(self, name: str, ordinal: int, count: int = 1):
+        """Add (or with count=-1, remove) one completion of a habit."""
+        rollup = self.habits[name]
+        week, month = week_key(ordinal), month_key(ordinal)
+        rollup.total += count
+        rollup.weeks[week] += count
+        rollup.months[month] += count
+        self.weeks[week] += count
+        self.months[month] += count
+        self.periodicity_totals[rollup.periodicity] += count
+
+    def save(self, path: str, habits: Iterable[Habit]):
+        """Write the per-habit rollups, each with the fingerprint of its habit."""
+        stored = {}
+        for habit in habits:
+            rollup = self.habits.get(habit.name)
+            if rollup is not None:
+                stored[habit.name] = dict(rollup.to_dict(), fingerprint=fingerprint(habit))
+        data = {'format': ROLLUP_FORMAT, 'habits': stored}
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, habits: Iterable[Habit]) -> 'Rollups':
+        """Load persisted rollups, rebuilding any habit whose rollup is missing or stale."""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            stored = data['habits'] if data.get('format') == ROLLUP_FORMAT else {}
+        except (FileNotFoundError, ValueError, KeyError):
+            stored = {}
+        rollups = cls()
+        for habit in habits:
+            rollup = stored.get(habit.name)
+            if rollup is not None:
+                if rollup.pop('fingerprint', None) == fingerprint(habit) and rollup['periodicity'] == habit.periodicity:
+                    rollup = HabitRollup(**rollup)
+                else:
+                    rollup = None
+            rollups.add_habit(habit, rollup)
+        return rollups
@@ -0,0 +1,231 @@
+"""
+Habit schedules evaluated on completion bitsets.
+
+A habit's periodicity string names its schedule:
+
+    daily                  every day
+    weekly                 every 7 days (a run of completions exactly a week apart)
+    every:N[:YYYY-MM-DD]   every N days, counted from the given date; without one,
+                           counted back from the last day of the window
+    weekdays:mon,wed,fri   on the listed weekdays
+    calendar-weekly        at least once in each Monday-to-Sunday week
+    monthly                at least once in each calendar month
+
+Completions are a Python int used as a bitset, bit i meaning day base + i.
+Each schedule builds a mask of due days (for calendar schedules, the first
+day of each period) and a mask of the occurrences that were met, so
+streaks and adherence reduce to a few shifts, ANDs and popcounts per machine
+word of history.
+"""
+
+from datetime import date
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(x: int) -> int:
+        return bin(x).count('1')
+
+
+def _repeat(pattern: int, period: int, length: int) -> int:
+    """Tile a period-bit pattern over `length` bits with one multiplication."""
+    copies = length // period + 1
+    # 1 + 2**period + 2**(2*period) + ... places a copy of the pattern every `period` bits
+    return (pattern * (((1 << (period * copies)) - 1) // ((1 << period) - 1))) & ((1 << length) - 1)
+
+
+def align(ordinal: int) -> int:
+    """A bitset base at or before `ordinal` that starts both a calendar week and month."""
+    first = date.fromordinal(ordinal).replace(day=1).toordinal()
+    return first - date.fromordinal(first).weekday()
+
+
+def to_bitset(ordinals) -> Tuple[int, int]:
+    """Build (base, bits) from sorted completion ordinals."""
+    if not len(ordinals):
+        return date.today().toordinal(), 0
+    base = align(ordinals[0])
+    buf = bytearray((ordinals[-1] - base) // 8 + 1)
+    for d in ordinals:
+        i = d - base
+        buf[i >> 3] |= 1 << (i & 7)
+    return base, int.from_bytes(buf, 'little')
+
+
+class Schedule:
+    """Base class: subclasses say which days are due and which occurrences were met."""
+
+    def period_start(self, ordinal: int) -> int:
+        """First day of the period containing `ordinal` (the day itself for day schedules)."""
+        return ordinal
+
+    def occurrences(self, base: int, length: int) -> int:
+        """Mask of due days (or period starts) among the `length` days from base."""
+        raise NotImplementedError
+
+    def met(self, base: int, bits: int, due: int) -> int:
+        """Mask of the occurrences in `due` that have a completion."""
+        return bits & due
+
+    def streak(self, base: int, bits: int, today: date) -> int:
+        """Consecutive met occurrences up to and including the current one."""
+        length = today.toordinal() - base + 1
+        if length <= 0 or not bits:
+            return 0
+        bits &= (1 << length) - 1  # Completions after today don't count yet
+        due = self.occurrences(base, length)
+        missed = due & ~self.met(base, bits, due)
+        if missed:
+            due >>= missed.bit_length()  # Only occurrences after the latest miss
+        return _popcount(due)
+
+    def runs(self, base: int, bits: int, today: date) -> List[Tuple[int, int, int]]:
+        """(length, first, last) of each run of consecutive met occurrences up to today, oldest first.
+
+        first and last are the ordinals of the occurrences (period starts for
+        calendar schedules). The streak is the last run if it reaches the
+        current occurrence.
+        """
+        length = today.toordinal() - base + 1
+        if length <= 0 or not bits:
+            return []
+        bits &= (1 << length) - 1
+        due = self.occurrences(base, length)
+        met = self.met(base, bits, due)
+        # bin() reads most significant bit first; reversed, character i is day base + i
+        met_flags = bin(met)[:1:-1]
+        runs, run = [], None
+        for i, flag in enumerate(bin(due)[:1:-1]):
+            if flag != '1':
+                continue
+            if i < len(met_flags) and met_flags[i] == '1':
+                run = [1, base + i, base + i] if run is None else [run[0] + 1, run[1], base + i]
+            elif run is not None:
+                runs.append(tuple(run))
+                run = None
+        if run is not None:
+            runs.append(tuple(run))
+        return runs
+
+    def adherence(self, base: int, bits: int, start: date, end: date) -> Tuple[int, int]:
+        """(met, due) occurrences in the periods overlapping [start, end]."""
+        first = self.period_start(start.toordinal())
+        if first < base:
+            bits <<= base - first
+            base = first
+        length = end.toordinal() - base + 1
+        if length <= 0:
+            return 0, 0
+        bits &= (1 << length) - 1
+        due = self.occurrences(base, length) >> (first - base) << (first - base)
+        return _popcount(self.met(base, bits, due)), _popcount(due)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __hash__(self):
+        return hash((type(self), tuple(sorted(vars(self).items()))))
+
+
+class Daily(Schedule):
+    def occurrences(self, base: int, length: int) -> int:
+        return (1 << length) - 1
+
+
+class EveryNDays(Schedule):
+    def __init__(self, n: int, anchor: Optional[int] = None):
+        if n < 1:
+            raise ValueError("A schedule needs at least one day between occurrences")
+        self.n = n
+        self.anchor = anchor  # Ordinal of a due day; None counts back from the window's last day
+
+    def occurrences(self, base: int, length: int) -> int:
+        anchor = base + length - 1 if self.anchor is None else self.anchor
+        return _repeat(1 << ((anchor - base) % self.n), self.n, length)
+
+
+class Weekdays(Schedule):
+    def __init__(self, days: FrozenSet[int]):
+        if not days or not days <= set(range(7)):
+            raise ValueError("Weekdays must be a non-empty set of 0 (Monday) to 6 (Sunday)")
+        self.days = frozenset(days)
+
+    def occurrences(self, base: int, length: int) -> int:
+        first = date.fromordinal(base).weekday()
+        pattern = sum(1 << i for i in range(7) if (first + i) % 7 in self.days)
+        return _repeat(pattern, 7, length)
+
+
+class CalendarWeekly(Schedule):
+    def period_start(self, ordinal: int) -> int:
+        return ordinal - date.fromordinal(ordinal).weekday()
+
+    def occurrences(self, base: int, length: int) -> int:
+        return _repeat(1 << (-date.fromordinal(base).weekday() % 7), 7, length)
+
+    def met(self, base: int, bits: int, due: int) -> int:
+        # Fold each week's seven days onto its Monday: shifts by 1, 2 and 3 cover offsets 0-6
+        bits |= bits >> 1
+        bits |= bits >> 2
+        bits |= bits >> 3
+        return bits & due
+
+
+@lru_cache(maxsize=1024)
+def _month_starts(base: int, length: int) -> int:
+    # Cached: walking the calendar costs more than all the bit operations that use it
+    buf = bytearray(length // 8 + 1)
+    day = date.fromordinal(base).replace(day=1)
+    while day.toordinal() - base < length:
+        offset = day.toordinal() - base
+        if offset >= 0:
+            buf[offset >> 3] |= 1 << (offset & 7)
+        day = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return int.from_bytes(buf, 'little')
+
+
+class Monthly(Schedule):
+    def period_start(self, ordinal: int) -> int:
+        return date.fromordinal(ordinal).replace(day=1).toordinal()
+
+    def occurrences(self, base: int, length: int) -> int:
+        return _month_starts(base, length)
+
+    def met(self, base: int, bits: int, due: int) -> int:
+        # Segmented OR-scan: fold each month's days onto its first day in five doubling
+        # steps, never carrying a bit across the start of the next month
+        length = max(bits.bit_length(), due.bit_length())
+        same = (((1 << length) - 1) & ~self.occurrences(base, length)) >> 1  # Day i + 1 isn't a 1st
+        for shift in (1, 2, 4, 8, 16):
+            bits |= (bits >> shift) & same
+            same &= same >> shift
+        return bits & due
+
+
+@lru_cache(maxsize=256)
+def parse(spec: str) -> Schedule:
+    """Return the schedule named by a periodicity string; raise ValueError if it is unknown."""
+    kind, _, args = spec.strip().lower().partition(':')
+    if kind == 'daily' and not args:
+        return Daily()
+    if kind == 'weekly' and not args:
+        return EveryNDays(7)
+    if kind == 'calendar-weekly' and not args:
+        return CalendarWeekly()
+    if kind == 'monthly' and not args:
+        return Monthly()
+    if kind == 'every' and args:
+        n, _, anchor = args.partition(':')
+        try:
+            return EveryNDays(int(n), date.fromisoformat(anchor).toordinal() if anchor else None)
+        except ValueError:
+            pass
+    if kind == 'weekdays' and args:
+        names = [name.strip()[:3] for name in args.split(',')]
+        if all(name in WEEKDAYS for name in names):
+            return Weekdays(frozenset(WEEKDAYS.index(name) for name in names))
+    raise ValueError(f"Unknown schedule '{spec}'")
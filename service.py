@@ -0,0 +1,194 @@
+"""
+Local HTTP service around HabitTracker.
+
+A small asyncio server (standard library only, over TCP or a Unix socket)
+that answers JSON requests:
+
+    GET  /habits              habits with their current streaks
+    GET  /stats               analytics.summary() of all habits
+    POST /habits/NAME/check   check off a habit; optional body {"date": "YYYY-MM-DD"}
+
+The tracker is only touched from one worker thread, so the event loop never
+blocks on disk writes or analytics. Check-offs that arrive while a write is
+in progress are queued and committed together in one tracker.batch(), so a
+burst of requests costs one journal append instead of one per request.
+
+Usage:
+    python service.py --store data/habits.json --port 8080
+    python service.py --unix /tmp/habits.sock
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import analytics
+from habit import HabitTracker
+
+MAX_BODY = 64 * 1024
+
+
+class HabitService:
+    """Serve one tracker over HTTP, coalescing concurrent check-offs."""
+
+    def __init__(self, tracker: HabitTracker):
+        self.tracker = tracker
+        self.batches = 0  # Committed check-off batches, for monitoring
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='habit-service')
+        self._queue: List[Tuple[str, date, asyncio.Future]] = []
+        self._committer: Optional[asyncio.Task] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080,
+                    unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        if unix_path:
+            return await asyncio.start_unix_server(self._handle, unix_path)
+        return await asyncio.start_server(self._handle, host, port)
+
+    def close(self):
+        """Write anything pending and release the tracker."""
+        self._worker.submit(self.tracker.close).result()
+        self._worker.shutdown()
+
+    async def _in_worker(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._worker, func, *args)
+
+    async def check_off(self, name: str, day: date) -> bool:
+        """Queue a check-off and wait until the batch containing it is persisted."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((name, day, future))
+        if self._committer is None or self._committer.done():
+            self._committer = asyncio.ensure_future(self._commit_queued())
+        return await future
+
+    async def _commit_queued(self):
+        await asyncio.sleep(0)  # Let requests already read in this loop iteration join the batch
+        while self._queue:
+            queued, self._queue = self._queue, []
+            try:
+                results = await self._in_worker(self._commit, [(name, day) for name, day, _ in queued])
+            except Exception as e:
+                for _, _, future in queued:
+                    future.set_exception(e)
+            else:
+                for (_, _, future), found in zip(queued, results):
+                    future.set_result(found)
+            self.batches += 1
+
+    def _commit(self, check_offs: List[Tuple[str, date]]) -> List[bool]:
+        with self.tracker.batch():
+            return [self.tracker.check_off(name, day) for name, day in check_offs]
+
+    def _list(self) -> List[Dict]:
+        return [{
+            'name': habit.name,
+            'periodicity': habit.periodicity,
+            'creation_date': habit.creation_date,
+            'current_streak': habit.current_streak(),
+            'completions': habit.completion_count(),
+        } for habit in self.tracker.habits]
+
+    def _stats(self) -> Dict:
+        return analytics.summary(self.tracker.habits)
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, object]:
+        """Route one request; return (status, JSON payload)."""
+        parts = [unquote(p) for p in urlsplit(target).path.strip('/').split('/')]
+        if parts == ['habits'] and method == 'GET':
+            return HTTPStatus.OK, await self._in_worker(self._list)
+        if parts == ['stats'] and method == 'GET':
+            return HTTPStatus.OK, await self._in_worker(self._stats)
+        if len(parts) == 3 and parts[0] == 'habits' and parts[2] == 'check':
+            if method != 'POST':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Use POST to check off a habit"}
+            try:
+                options = json.loads(body) if body else {}
+                day = date.fromisoformat(options['date']) if options.get('date') else date.today()
+            except (ValueError, TypeError, AttributeError):
+                return HTTPStatus.BAD_REQUEST, {'error': "Expected a JSON body like {\"date\": \"YYYY-MM-DD\"}"}
+            if not await self.check_off(parts[1], day):
+                return HTTPStatus.NOT_FOUND, {'error': f"Habit '{parts[1]}' not found"}
+            return HTTPStatus.OK, {'checked_off': parts[1], 'date': day.isoformat()}
+        return HTTPStatus.NOT_FOUND, {'error': f"No route for {method} {target}"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Minimal HTTP/1.1 with keep-alive: one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                    if not 0 <= length <= MAX_BODY:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': "Malformed request"}, False)
+                    break
+                body = await reader.readexactly(length)
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        data = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+
+async def serve(service: HabitService, host: str, port: int, unix_path: Optional[str] = None):
+    server = await service.start(host, port, unix_path)
+    address = unix_path or '%s:%d' % server.sockets[0].getsockname()[:2]
+    print(f"Listening on {address}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve a habit store over local HTTP.")
+    parser.add_argument('--store', default='data/habits.json', help="path to the habit store")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help="TCP port (0 picks a free one)")
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    args = parser.parse_args(argv)
+
+    # Journaled, so each coalesced batch appends to the journal instead of rewriting the store
+    service = HabitService(HabitTracker(args.store, journal=True))
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
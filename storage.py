@@ -0,0 +1,679 @@
+"""
+Storage backends for HabitTracker.
+
+Every backend exposes the same small interface:
+- load() -> List[Habit]: read all habits
+- save(habits): write a full snapshot
+- compact(habits): fold the journal into a snapshot, merging other writers' changes
+- locked(): context manager holding the store's lock across several calls
+- apply(changes, habits): persist a list of mutation records
+  ({'op': 'add' | 'delete' | 'check_off' | 'backfill', ...})
+
+JsonStorage is the default and keeps the original data/habits.json format.
+BinaryStorage (.htsnap files) uses the same journal but a compact binary
+snapshot that is memory-mapped, so opening a large store costs about as
+much as reading its habit table. SqliteStorage keeps habits and
+completions in indexed tables so single mutations and per-habit queries
+only touch the rows they need.
+
+With tier_days set, JsonStorage keeps only the last tier_days days of each
+habit in the snapshot; older completions are moved to compressed per-habit
+archive segments (see archive.py) whenever a snapshot is written. Without
+tier_days, existing archives are kept as they are; migrating to a new
+path brings their completions back into the snapshot.
+"""
+
+import json
+import mmap
+import os
+import re
+import sys
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, but writes are still atomic renames
+    fcntl = None
+
+import habit
+import schedule
+from archive import Archive
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+BINARY_EXTENSIONS = ('.htsnap',)
+
+# One JSON token: a string, a structural character or a bare literal/number
+_TOKEN = re.compile(rb'\s*(?:("(?:[^"\\]|\\.)*")|([][{},:])|([^][{},:"\s]+))')
+
+
+class StorageError(Exception):
+    """Raised when a store cannot be read or written safely."""
+
+
+class SnapshotFormatError(ValueError):
+    """Raised when a snapshot file is empty, truncated or not in the expected format."""
+
+
+def replay(habits: List['habit.Habit'], changes) -> List['habit.Habit']:
+    """Apply mutation records to a list of habits and return the result.
+
+    Replaying is idempotent so a journal left behind by a crash during
+    compaction can safely be applied on top of the new snapshot.
+    """
+    by_name = {h.name: h for h in habits}
+    for change in changes:
+        op = change['op']
+        if op == 'add':
+            new = habit.Habit.from_dict(change['habit'])
+            by_name.pop(new.name, None)
+            by_name[new.name] = new
+        elif op == 'delete':
+            by_name.pop(change['name'], None)
+        elif op == 'check_off':
+            target = by_name.get(change['name'])
+            if target is not None:
+                target.check_off(change['day'])
+        elif op == 'backfill':
+            target = by_name.get(change['name'])
+            if target is not None:
+                target.add_completions(change['days'])
+    return list(by_name.values())
+
+
+def _scan_habits(buf):
+    """Yield (header, completions span) for each habit object in a JSON array.
+
+    Header fields are decoded; the completions array is skipped with a single
+    find() so its byte range can be parsed later, when it is first needed.
+    """
+    pos = 0
+
+    def token() -> bytes:
+        nonlocal pos
+        match = _TOKEN.match(buf, pos)
+        if match is None:
+            raise SnapshotFormatError(f"Invalid JSON at byte {pos}")
+        pos = match.end()
+        return match.group(match.lastindex)
+
+    def value(first: bytes):
+        # Nested values are re-joined from their tokens and decoded in one go
+        tokens, depth = [first], 0
+        while True:
+            if tokens[-1] in (b'{', b'['):
+                depth += 1
+            elif tokens[-1] in (b'}', b']'):
+                depth -= 1
+            if depth == 0:
+                return json.loads(b''.join(tokens))
+            tokens.append(token())
+
+    if token() != b'[':
+        raise SnapshotFormatError("Expected a JSON array of habits")
+    while True:
+        tok = token()
+        if tok == b']':
+            return
+        if tok == b',':
+            continue
+        if tok != b'{':
+            raise SnapshotFormatError(f"Expected a habit object at byte {pos}")
+        header, span = {}, None
+        while True:
+            tok = token()
+            if tok == b'}':
+                break
+            if tok == b',':
+                continue
+            key = json.loads(tok)
+            if token() != b':':
+                raise SnapshotFormatError(f"Expected ':' at byte {pos}")
+            if key == 'completions':
+                tok = token()
+                if tok == b'null':
+                    continue  # No completions, as the eager loader reads it
+                if tok != b'[':
+                    raise SnapshotFormatError(f"Expected a completions array at byte {pos}")
+                start = pos - 1
+                end = buf.find(b']', pos) + 1  # ISO dates never contain ']'
+                if end == 0:
+                    raise SnapshotFormatError(f"Unterminated completions at byte {pos}")
+                span, pos = (start, end), end
+            else:
+                header[key] = value(token())
+        yield header, span
+
+
+def _lazy_habit(buf, header: Dict, span) -> 'habit.Habit':
+    loader = (lambda: json.loads(buf[span[0]:span[1]])) if span else list
+    return habit.Habit.lazy(header['name'], header['periodicity'], header.get('creation_date'), loader)
+
+
+def _file_mode(path: str) -> int:
+    """Permissions for a new snapshot: those of the file it replaces, else the umask default."""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _iso_days(ordinals) -> List[str]:
+    return [date.fromordinal(d).isoformat() for d in ordinals]
+
+
+class JsonStorage:
+    """Stores habits as a JSON snapshot, optionally with an append-only journal.
+
+    In shared mode several processes may use the same file: every read and
+    write happens under an advisory lock, and the lock file holds a version
+    counter that is bumped on each write. A writer whose version is stale
+    re-reads the store and replays its own mutations on top instead of
+    overwriting what the others wrote.
+    """
+
+    SNAPSHOT_MODE = 'w'
+
+    def __init__(self, path: str, journal: bool = False,
+                 compact_records: int = 1000, compact_bytes: int = 1024 * 1024, lazy: bool = False,
+                 shared: bool = False, tier_days: Optional[int] = None):
+        self.path = path
+        self.journal = journal  # Append mutations to a log instead of rewriting the snapshot
+        self.lazy = lazy  # Only parse habit headers up front; completions on first access
+        self.shared = shared  # Safe for concurrent use by several processes
+        self.tier_days = tier_days  # Archive completions older than this many days on save
+        self.archive = Archive(path + '.archive')
+        self.journal_path = path + '.journal'
+        self.lock_path = path + '.lock'
+        self.compact_records = compact_records
+        self.compact_bytes = compact_bytes
+        self._journal_records = 0
+        self._journal_bytes = 0
+        self._version = 0
+        self._lock_file = None
+        self.bytes_read = 0  # I/O totals, reported by metrics.py
+        self.bytes_written = 0
+
+    @contextmanager
+    def _lock(self):
+        """Hold the store's exclusive lock; re-entrant within this object."""
+        if not self.shared or self._lock_file is not None:
+            yield
+            return
+        with open(self.lock_path, 'a+') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            self._lock_file = f
+            try:
+                yield
+            finally:
+                self._lock_file = None
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def locked(self):
+        """Hold the store's lock across several calls, such as a write and its change feed append."""
+        return self._lock()
+
+    def _disk_version(self) -> int:
+        self._lock_file.seek(0)
+        return int(self._lock_file.read() or 0)
+
+    def _bump_version(self):
+        if self._lock_file is None:
+            return
+        self._version = self._disk_version() + 1
+        self._lock_file.seek(0)
+        self._lock_file.truncate()
+        self._lock_file.write(str(self._version))
+        self._lock_file.flush()
+
+    def load(self) -> List['habit.Habit']:
+        with self._lock():
+            habits = self._read()
+            if self.shared:
+                self._version = self._disk_version()
+        return habits
+
+    def _read(self) -> List['habit.Habit']:
+        try:
+            habits = self._load_snapshot()
+        except FileNotFoundError:
+            habits = []
+        except (json.JSONDecodeError, SnapshotFormatError) as e:
+            if self.shared:
+                # Writers never leave partial files, so this is real corruption
+                raise StorageError(f"Cannot read {self.path}: {e}") from e
+            habits = []
+        except (ValueError, KeyError, TypeError) as e:
+            # A readable file with a bad record: reading it as empty would let the next write drop it
+            raise StorageError(f"Invalid habit record in {self.path}: {e}") from e
+        # Journal records name habits the way the tracker saw them: after renaming
+        return self._replay_journal(habit.rename_duplicates(habits))
+
+    def _load_snapshot(self) -> List['habit.Habit']:
+        return self._load_lazy() if self.lazy else self._load_eager()
+
+    def _load_eager(self) -> List['habit.Habit']:
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+            self.bytes_read += f.tell()
+        return [self._attach_archive(habit.Habit.from_dict(h), h) for h in data]
+
+    def _load_lazy(self) -> List['habit.Habit']:
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                raise SnapshotFormatError("Empty habits file")
+            self.bytes_read += size
+            # The map outlives the file handle and keeps the old snapshot readable
+            # after save() atomically replaces it
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return [self._attach_archive(_lazy_habit(buf, header, span), header)
+                for header, span in _scan_habits(buf)]
+
+    def _attach_archive(self, h: 'habit.Habit', record: Dict) -> 'habit.Habit':
+        # Archives are read whether or not this storage tiers, so no history is lost
+        meta = record.get('archived')
+        if meta is not None:
+            h.set_tiers(self.archive.history(h.name, meta))
+        return h
+
+    def _tier(self, h: 'habit.Habit', cutoff: int):
+        """Move a habit's completions before cutoff into its archive."""
+        cold = h.archive
+        if cold is not None and cold.path != self.archive.path_for(h.name):
+            h.set_tiers(None, h.ordinals)  # Archived by another store: start over here
+            cold = None
+        recent = h.recent_ordinals
+        split = bisect_left(recent, cutoff)
+        if split:
+            h.set_tiers(self.archive.append(h.name, recent[:split], cold), recent[split:])
+
+    def _write_snapshot(self, f, habits: List['habit.Habit']):
+        data = []
+        for h in habits:
+            record = {'name': h.name, 'periodicity': h.periodicity, 'creation_date': h.creation_date,
+                      'completions': _iso_days(h.recent_ordinals)}
+            if h.archive is not None:
+                record['archived'] = h.archive.to_dict()
+            data.append(record)
+        json.dump(data, f, indent=2)
+
+    def save(self, habits: List['habit.Habit']):
+        """Write a full snapshot of `habits`.
+
+        In shared mode this raises StorageError if another process wrote
+        since this one last read or wrote the store, instead of silently
+        replacing that process's changes.
+        """
+        with self._lock():
+            if self.shared and self._disk_version() != self._version:
+                raise StorageError(f"{self.path} was changed by another process; reload before saving")
+            self._write(habits)
+
+    def compact(self, habits: List['habit.Habit']) -> Optional[List['habit.Habit']]:
+        """Fold the journal into a new snapshot.
+
+        Returns the store's habits if another process wrote in the meantime;
+        those are what gets written then, so nothing of theirs is lost.
+        """
+        with self._lock():
+            if self.shared and self._disk_version() != self._version:
+                merged = self._read()
+                self._write(merged)
+                return merged
+            self._write(habits)
+        return None
+
+    def _write(self, habits: List['habit.Habit']):
+        archived = self.archive.bytes_written
+        if self.tier_days is None:
+            # Not tiering leaves this store's archives as they are; only foreign ones are read back in
+            for h in habits:
+                if h.archive is not None and h.archive.path != self.archive.path_for(h.name):
+                    h.set_tiers(None, h.ordinals)
+        else:
+            cutoff = date.today().toordinal() - self.tier_days + 1  # Today is the last of tier_days hot days
+            for h in habits:
+                self._tier(h, cutoff)
+        directory = os.path.dirname(self.path) or '.'
+        with self._lock():
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.habits-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, self.SNAPSHOT_MODE) as f:
+                    self._write_snapshot(f, habits)
+                    self.bytes_written += f.tell() + self.archive.bytes_written - archived
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp creates owner-only files; keep the store readable by whoever could read it before
+                os.chmod(tmp_path, _file_mode(self.path))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            # Only now that the snapshot no longer points at them
+            self.archive.prune(h.name for h in habits if h.archive is not None)
+            # The snapshot now contains every journaled mutation
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_records = 0
+            self._journal_bytes = 0
+            self._bump_version()
+
+    def apply(self, changes: List[Dict], habits: List['habit.Habit']) -> Optional[List['habit.Habit']]:
+        """Persist mutations, either as journal records or a full save.
+
+        Returns the merged habit list if another process wrote in the meantime.
+        """
+        with self._lock():
+            if self.shared and self._disk_version() != self._version:
+                merged = replay(self._read(), changes)
+                self._write(merged)
+                return merged
+            if not self.journal:
+                self._write(habits)
+                return None
+            lines = ''.join(json.dumps(c, separators=(',', ':')) + '\n' for c in changes)
+            with open(self.journal_path, 'a') as f:
+                f.write(lines)
+            self.bytes_written += len(lines)
+            self._journal_records += len(changes)
+            self._journal_bytes += len(lines)
+            if self._journal_records >= self.compact_records or self._journal_bytes >= self.compact_bytes:
+                self._write(habits)
+            else:
+                self._bump_version()
+        return None
+
+    def close(self):
+        pass
+
+    def _replay_journal(self, habits: List['habit.Habit']) -> List['habit.Habit']:
+        self._journal_records = 0
+        self._journal_bytes = 0
+        changes = []
+        torn = False
+        try:
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        changes.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        torn = True  # Torn write at the tail of the log
+                        break
+                    self._journal_records += 1
+                    self._journal_bytes += len(line)
+        except FileNotFoundError:
+            return habits
+        self.bytes_read += self._journal_bytes
+        habits = replay(habits, changes)
+        if torn:
+            # Fold the intact records into a snapshot so new appends don't follow garbage
+            self._write(habits)
+        return habits
+
+
+class BinaryStorage(JsonStorage):
+    """Stores habits as a binary snapshot that is memory-mapped on load.
+
+    The journal, shared mode and tiering work as in JsonStorage; only the
+    snapshot format differs (all integers little-endian):
+
+        header    magic 'HTSNAP', version uint16, habit count uint32,
+                  strings offset uint64, ordinals offset uint64, ordinal count uint64
+        table     one ENTRY per habit: first ordinal index, ordinal count, name
+                  and periodicity position in the strings, creation ordinal, and
+                  the archive range (size 0 if none)
+        strings   UTF-8 names and periodicities
+        ordinals  every habit's sorted completions as one int32 array, 8-byte aligned
+
+    Loading reads the header, table and strings; each habit's completions are
+    a read-only view of the mapped ordinals, paged in by the OS when first
+    touched and copied only when the habit changes.
+    """
+
+    SNAPSHOT_MODE = 'wb'
+    MAGIC = b'HTSNAP'
+    VERSION = 1
+    HEADER = struct.Struct('<6sHIQQQ')
+    ENTRY = struct.Struct('<QIQHHiQQIi')
+
+    def _write_snapshot(self, f, habits: List['habit.Habit']):
+        entries, strings, start = [], bytearray(), 0
+        for h in habits:
+            name, periodicity = h.name.encode(), h.periodicity.encode()
+            cold = h.archive
+            archived = (cold.offset, cold.size, cold.count, cold.last) if cold is not None else (0, 0, 0, 0)
+            count = len(h.recent_ordinals)
+            entries.append(self.ENTRY.pack(start, count, len(strings), len(name), len(periodicity),
+                                           habit.to_ordinal(h.creation_date), *archived))
+            strings += name + periodicity
+            start += count
+        strings_offset = self.HEADER.size + self.ENTRY.size * len(entries)
+        ordinals_offset = -(-(strings_offset + len(strings)) // 8) * 8
+        f.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(entries), strings_offset, ordinals_offset, start))
+        f.write(b''.join(entries))
+        f.write(strings)
+        f.write(bytes(ordinals_offset - strings_offset - len(strings)))
+        for h in habits:
+            days = h.recent_ordinals
+            if sys.byteorder != 'little':
+                days = array('i', days)
+                days.byteswap()
+            f.write(days)
+
+    def _load_snapshot(self) -> List['habit.Habit']:
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < self.HEADER.size:
+                raise SnapshotFormatError("Truncated snapshot header")
+            # As in JsonStorage._load_lazy, the map outlives the file and a save() replacing it
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, strings_offset, ordinals_offset, total = self.HEADER.unpack_from(buf)
+        # Another file type or a newer release's snapshot: never read as empty and overwrite it
+        if magic != self.MAGIC:
+            raise StorageError(f"{self.path} is not a binary habit snapshot")
+        if version != self.VERSION:
+            raise StorageError(f"{self.path} has unsupported snapshot version {version}")
+        if strings_offset != self.HEADER.size + self.ENTRY.size * count or ordinals_offset + 4 * total != len(buf):
+            raise SnapshotFormatError("Truncated or inconsistent snapshot")
+        self.bytes_read += ordinals_offset  # Completions are only read as they are touched
+        strings = buf[strings_offset:ordinals_offset]
+        ordinals = memoryview(buf)[ordinals_offset:].cast('i')
+        if sys.byteorder != 'little':
+            ordinals = array('i', ordinals)
+            ordinals.byteswap()
+        habits = []
+        for start, n, at, name_len, periodicity_len, created, offset, size, archived, last in \
+                self.ENTRY.iter_unpack(buf[self.HEADER.size:strings_offset]):
+            if start + n > total:
+                raise SnapshotFormatError("Snapshot entry points past the completions")
+            name = strings[at:at + name_len].decode()
+            periodicity = strings[at + name_len:at + name_len + periodicity_len].decode()
+            cold = None
+            if size:
+                cold = self.archive.history(name, {'offset': offset, 'size': size, 'count': archived, 'last': last})
+            habits.append(habit.Habit.from_ordinals(name, periodicity, date.fromordinal(created).isoformat(),
+                                                    ordinals[start:start + n], cold))
+        return habits
+
+
+class SqliteStorage:
+    """Stores habits in SQLite with completions indexed on (habit_id, day).
+
+    Mutations are always written as single rows and each habit's
+    completions are only queried when first accessed, so the JSON
+    backend's journal and lazy options are built in here.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS habits (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            periodicity TEXT NOT NULL,
+            creation_date TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS completions (
+            habit_id INTEGER NOT NULL REFERENCES habits(id),
+            day TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS completions_habit_day ON completions (habit_id, day);
+    """
+
+    def __init__(self, path: str):
+        import sqlite3  # Only SQLite stores pay for importing it
+        self.path = path
+        # Lazy habits may be loaded from the tracker's autosave or service threads;
+        # the tracker's lock serializes them
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+
+    def load(self) -> List['habit.Habit']:
+        return [
+            habit.Habit.lazy(name, periodicity, creation_date, lambda name=name: self.completions(name), self)
+            for name, periodicity, creation_date in self._conn.execute(
+                'SELECT name, periodicity, creation_date FROM habits ORDER BY id')
+        ]
+
+    def save(self, habits: List['habit.Habit']):
+        # Read every habit's rows before they are deleted below
+        data = [h.to_dict() for h in habits]
+        with self._conn:
+            self._conn.execute('DELETE FROM completions')
+            self._conn.execute('DELETE FROM habits')
+            for record in data:
+                self._insert_habit(record)
+
+    def compact(self, habits: List['habit.Habit']):
+        """Nothing to fold: every mutation is already in its table."""
+        return None
+
+    def apply(self, changes: List[Dict], habits: List['habit.Habit']):
+        """Persist mutations as row-level inserts and deletes in one transaction."""
+        with self._conn:
+            for change in changes:
+                op = change['op']
+                if op == 'add':
+                    self._delete_habit(change['habit']['name'])
+                    self._insert_habit(change['habit'])
+                elif op == 'delete':
+                    self._delete_habit(change['name'])
+                elif op == 'check_off':
+                    self._conn.execute(
+                        'INSERT OR IGNORE INTO completions (habit_id, day) '
+                        'SELECT id, ? FROM habits WHERE name = ?',
+                        (change['day'], change['name']))
+                elif op == 'backfill':
+                    row = self._conn.execute('SELECT id FROM habits WHERE name = ?', (change['name'],)).fetchone()
+                    if row is not None:
+                        self._conn.executemany(
+                            'INSERT OR IGNORE INTO completions (habit_id, day) VALUES (?, ?)',
+                            [(row[0], day) for day in change['days']])
+
+    def close(self):
+        self._conn.close()
+
+    def locked(self):
+        """Nothing to hold: SQLite stores are not shared between processes."""
+        return nullcontext()
+
+    def _range(self, select: str, name: str, start: Optional[str], end: Optional[str]):
+        query = (f'SELECT {select} FROM completions JOIN habits ON habits.id = completions.habit_id '
+                 'WHERE habits.name = ?')
+        params = [name]
+        if start is not None:
+            query += ' AND day >= ?'
+            params.append(start)
+        if end is not None:
+            query += ' AND day <= ?'
+            params.append(end)
+        return query, params
+
+    def completions(self, name: str, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Return a habit's completion dates, optionally limited to [start, end]."""
+        query, params = self._range('day', name, start, end)
+        return [day for (day,) in self._conn.execute(query + ' ORDER BY day', params)]
+
+    def count_completions(self, name: str, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """Count a habit's completions, optionally limited to [start, end], without reading them."""
+        query, params = self._range('COUNT(*)', name, start, end)
+        return self._conn.execute(query, params).fetchone()[0]
+
+    def current_streak(self, name: str, today: Optional[date] = None) -> int:
+        """Compute a habit's current streak; a daily or weekly one reads only the rows in the streak."""
+        row = self._conn.execute('SELECT id, periodicity FROM habits WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return 0
+        habit_id, periodicity = row
+        expected = today or date.today()
+        if periodicity not in habit.RUN_PERIODICITIES:
+            # A schedule's streak depends on its due days, not just the latest rows
+            days = [date.fromisoformat(day).toordinal() for day in self.completions(name)]
+            return schedule.parse(periodicity).streak(*schedule.to_bitset(days), expected)
+        delta = timedelta(days=habit.period_days(periodicity))
+        streak = 0
+        # The cursor is consumed lazily, so only streak + 1 rows are read
+        for (day,) in self._conn.execute(
+                'SELECT day FROM completions WHERE habit_id = ? ORDER BY day DESC', (habit_id,)):
+            if day != expected.isoformat():
+                break
+            streak += 1
+            expected -= delta
+        return streak
+
+    def _insert_habit(self, data: Dict):
+        cursor = self._conn.execute(
+            'INSERT INTO habits (name, periodicity, creation_date) VALUES (?, ?, ?)',
+            (data['name'], data['periodicity'], data['creation_date']))
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO completions (habit_id, day) VALUES (?, ?)',
+            [(cursor.lastrowid, day) for day in data['completions']])
+
+    def _delete_habit(self, name: str):
+        self._conn.execute(
+            'DELETE FROM completions WHERE habit_id IN (SELECT id FROM habits WHERE name = ?)', (name,))
+        self._conn.execute('DELETE FROM habits WHERE name = ?', (name,))
+
+
+def open_storage(path: str, **options):
+    """Pick a backend from the file extension; JSON is the default."""
+    if path.endswith(SQLITE_EXTENSIONS):
+        unsupported = sorted(key for key in ('shared', 'tier_days') if options.get(key))
+        if unsupported:
+            raise ValueError(f"SQLite stores do not support {', '.join(unsupported)}")
+        return SqliteStorage(path)
+    if path.endswith(BINARY_EXTENSIONS):
+        return BinaryStorage(path, **options)
+    return JsonStorage(path, **options)
+
+
+def migrate(source: str, target: str) -> int:
+    """Copy every habit from one store to another and return how many were copied."""
+    directory = os.path.dirname(target)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    src = open_storage(source)
+    dst = open_storage(target)
+    try:
+        habits = src.load()
+        dst.save(habits)
+    finally:
+        src.close()
+        dst.close()
+    return len(habits)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'migrate':
+        print("Usage: python storage.py migrate SOURCE TARGET")
+        sys.exit(1)
+    count = migrate(sys.argv[2], sys.argv[3])
+    print(f"✅ Migrated {count} habits from {sys.argv[2]} to {sys.argv[3]}")
@@ -1,10 +1,30 @@
 import unittest
+import asyncio
+import json
+import multiprocessing
 import os
+import random
 import tempfile
 import shutil
+import subprocess
+import sys
+import time
 from datetime import date, timedelta
 from habit import Habit, HabitTracker, load_predefined_habits
 import analytics
+import archive
+import bench
+import bulkio
+import changefeed
+import columnar
+import leaderboard
+import loadtest
+import metrics
+import pool
+import rollups
+import schedule
+import service
+import storage
 
 class TestHabit(unittest.TestCase):
     """Test the Habit class functionality."""
@@ -89,6 +109,64 @@ class TestHabit(unittest.TestCase):
         ]
         self.assertEqual(habit.current_streak(), 2)
 
+    def test_completions_stored_as_ordinals(self):
+        """Test that completions are kept as a sorted array of date ordinals."""
+        habit = Habit('Test', 'daily', completions=['2024-01-03', '2024-01-01', '2024-01-03'])
+        self.assertFalse(hasattr(habit, '__dict__'))
+        self.assertEqual(habit._days.typecode, 'i')
+        self.assertEqual(list(habit._days), [date(2024, 1, 1).toordinal(), date(2024, 1, 3).toordinal()])
+        self.assertEqual(habit.completions, ['2024-01-01', '2024-01-03'])
+    
+    def test_out_of_order_check_off(self):
+        """Test that backfilled check-offs are inserted in order without duplicates."""
+        habit = Habit('Test', 'daily', completions=['2024-01-01', '2024-01-05'])
+        self.assertTrue(habit.check_off('2024-01-03'))
+        self.assertFalse(habit.check_off(date(2024, 1, 3)))
+        self.assertEqual(habit.completions, ['2024-01-01', '2024-01-03', '2024-01-05'])
+        self.assertTrue(habit.is_completed('2024-01-05'))
+        self.assertFalse(habit.is_completed('2024-01-04'))
+    
+    def test_to_dict_keeps_iso_format(self):
+        """Test that serialization still writes ISO date strings."""
+        habit = Habit('Test', 'weekly', creation_date='2024-01-01', completions=['2024-01-08'])
+        self.assertEqual(habit.to_dict()['completions'], ['2024-01-08'])
+
+    def test_streak_state_updated_incrementally(self):
+        """Test that in-order check-offs extend the cached run."""
+        habit = Habit('Test', 'daily', completions=['2024-01-01', '2024-01-02'])
+        self.assertEqual(habit.current_run(), (2, date(2024, 1, 1).toordinal(), date(2024, 1, 2).toordinal()))
+        
+        habit.check_off('2024-01-03')
+        self.assertEqual(habit.current_run()[0], 3)
+        self.assertEqual(habit.current_streak(date(2024, 1, 3)), 3)
+        self.assertEqual(habit.current_streak(date(2024, 1, 4)), 0)
+        
+        habit.check_off('2024-01-05')
+        self.assertEqual(habit.current_run(), (1, date(2024, 1, 5).toordinal(), date(2024, 1, 5).toordinal()))
+    
+    def test_streak_state_recomputed_after_backfill(self):
+        """Test that an out-of-order check-off invalidates the cached run."""
+        habit = Habit('Test', 'daily', completions=['2024-01-01', '2024-01-03'])
+        self.assertEqual(habit.current_run()[0], 1)
+        habit.check_off('2024-01-02')
+        self.assertEqual(habit.current_run()[0], 3)
+        
+        habit.periodicity = 'weekly'
+        self.assertEqual(habit.current_run()[0], 1)
+        habit.invalidate_streak()
+        self.assertEqual(habit.current_streak(date(2024, 1, 3)), 1)
+
+    def test_range_queries(self):
+        """Test completions, counts and ISO-week lookups over a date range."""
+        habit = Habit('Test', 'daily', completions=['2024-01-01', '2024-01-03', '2024-01-08', '2024-02-01'])
+        self.assertEqual(habit.completions_between('2024-01-02', '2024-01-08'), ['2024-01-03', '2024-01-08'])
+        self.assertEqual(habit.count_between(date(2024, 1, 1), date(2024, 1, 31)), 3)
+        self.assertEqual(habit.count_between('2024-03-01', '2024-03-31'), 0)
+        self.assertEqual(habit.count_between('2024-01-31', '2024-01-01'), 0)
+        self.assertTrue(habit.completed_in_week(2024, 1))
+        self.assertTrue(habit.completed_in_week(2024, 2))
+        self.assertFalse(habit.completed_in_week(2024, 3))
+
 class TestHabitTracker(unittest.TestCase):
     """Test the HabitTracker class functionality."""
     
@@ -137,6 +215,97 @@ class TestHabitTracker(unittest.TestCase):
         result = self.tracker.check_off('Nonexistent')
         self.assertFalse(result)
     
+    def test_add_duplicate_habit(self):
+        """Test that adding a habit with an existing name is rejected."""
+        self.tracker.add_habit(Habit('Test', 'daily'))
+        with self.assertRaises(ValueError):
+            self.tracker.add_habit(Habit('Test', 'weekly'))
+        self.assertEqual(len(self.tracker.habits), 1)
+    
+    def test_get_habit(self):
+        """Test looking up habits by name."""
+        habit = Habit('Test', 'daily')
+        self.tracker.add_habit(habit)
+        self.assertIs(self.tracker.get('Test'), habit)
+        self.assertIsNone(self.tracker.get('Nonexistent'))
+        
+        self.assertTrue(self.tracker.delete_habit('Test'))
+        self.assertIsNone(self.tracker.get('Test'))
+        self.assertFalse(self.tracker.delete_habit('Test'))
+    
+    def test_habit_order_preserved(self):
+        """Test that habits keep insertion order across deletes."""
+        for name in ['A', 'B', 'C']:
+            self.tracker.add_habit(Habit(name, 'daily'))
+        self.tracker.delete_habit('B')
+        self.tracker.add_habit(Habit('D', 'daily'))
+        self.assertEqual([h.name for h in self.tracker.habits], ['A', 'C', 'D'])
+    
+    def test_check_off_with_date(self):
+        """Test backfilling a check-off for an explicit date."""
+        self.tracker.add_habit(Habit('Test', 'daily'))
+        self.assertTrue(self.tracker.check_off('Test', '2024-01-01'))
+        self.assertTrue(self.tracker.check_off('Test', date(2024, 1, 2)))
+        
+        tracker2 = HabitTracker(self.test_file)
+        self.assertEqual(tracker2.get('Test').completions, ['2024-01-01', '2024-01-02'])
+    
+    def test_batch_writes_once(self):
+        """Test that a batch hands all its mutations to storage in one write."""
+        writes = []
+        apply = self.tracker.storage.apply
+        self.tracker.storage.apply = lambda changes, habits: writes.append(changes) or apply(changes, habits)
+        
+        with self.tracker.batch():
+            self.tracker.add_habit(Habit('Test1', 'daily'))
+            self.tracker.add_habit(Habit('Test2', 'daily'))
+            self.assertEqual(self.tracker.check_off_many(['Test1', 'Test2', 'Missing'], '2024-01-01'), 2)
+            self.assertEqual(writes, [])
+        
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(len(writes[0]), 4)
+        self.assertEqual(len(HabitTracker(self.test_file).habits), 2)
+    
+    def test_add_completions(self):
+        """Test backfilling many completions as a single deduplicated change."""
+        self.tracker.add_habit(Habit('Test', 'daily', completions=['2024-01-02', '2024-01-05']))
+        writes = []
+        apply = self.tracker.storage.apply
+        self.tracker.storage.apply = lambda changes, habits: writes.append(changes) or apply(changes, habits)
+        
+        days = ['2024-01-05', '2024-01-01', date(2024, 1, 3), date(2024, 1, 9).toordinal(), '2024-01-01']
+        self.assertEqual(self.tracker.add_completions('Test', days), 3)
+        self.assertEqual(self.tracker.add_completions('Test', ['2024-01-02']), 0)
+        self.assertEqual(writes, [[{'op': 'backfill', 'name': 'Test',
+                                    'days': ['2024-01-01', '2024-01-03', '2024-01-09']}]])
+        expected = ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-05', '2024-01-09']
+        self.assertEqual(HabitTracker(self.test_file).get('Test').completions, expected)
+        with self.assertRaises(ValueError):
+            self.tracker.add_completions('Missing', ['2024-01-01'])
+        
+        with self.assertRaises(RuntimeError):
+            with self.tracker.batch():
+                self.tracker.add_completions('Test', ['2023-12-31', '2024-01-04'])
+                raise RuntimeError('boom')
+        self.assertEqual(self.tracker.get('Test').completions, expected)
+    
+    def test_batch_rollback(self):
+        """Test that a failing batch restores the in-memory state and writes nothing."""
+        habit = Habit('Test1', 'daily', completions=['2024-01-01'])
+        self.tracker.add_habit(habit)
+        
+        with self.assertRaises(RuntimeError):
+            with self.tracker.batch():
+                self.tracker.check_off('Test1', '2024-01-02')
+                self.tracker.add_habit(Habit('Test2', 'daily'))
+                self.tracker.delete_habit('Test1')
+                raise RuntimeError('boom')
+        
+        self.assertEqual([h.name for h in self.tracker.habits], ['Test1'])
+        self.assertIs(self.tracker.get('Test1'), habit)
+        self.assertEqual(habit.completions, ['2024-01-01'])
+        self.assertEqual(len(HabitTracker(self.test_file).habits), 1)
+    
     def test_persistence(self):
         """Test saving and loading habits from file."""
         habit = Habit('Test', 'daily')
@@ -147,11 +316,1026 @@ class TestHabitTracker(unittest.TestCase):
         self.assertEqual(len(tracker2.habits), 1)
         self.assertEqual(tracker2.habits[0].name, 'Test')
     
+    def test_duplicate_names_are_kept(self):
+        """Test that a legacy store with repeated names loses none of the habits."""
+        with open(self.test_file, 'w') as f:
+            json.dump([Habit('Run', 'daily', '2024-01-01', ['2024-01-01']).to_dict(),
+                       Habit('Run', 'weekly', '2024-01-01', ['2024-01-02']).to_dict(),
+                       Habit('Run (2)', 'daily', '2024-01-01').to_dict()], f)
+        for lazy in (False, True):
+            tracker = HabitTracker(self.test_file, journal=True, lazy=lazy)
+            self.assertEqual([h.name for h in tracker.habits], ['Run', 'Run (3)', 'Run (2)'])
+            self.assertEqual(tracker.get('Run (3)').completions, ['2024-01-02'])
+        
+        tracker.check_off('Run (3)', '2024-01-09')
+        tracker.compact()
+        reloaded = HabitTracker(self.test_file)
+        self.assertEqual(reloaded.get('Run').periodicity, 'daily')
+        self.assertEqual(reloaded.get('Run (3)').completions, ['2024-01-02', '2024-01-09'])
+    
+    @unittest.skipIf(os.name == 'nt', "POSIX permissions")
+    def test_save_keeps_file_mode(self):
+        """Test that snapshots get the umask default and then keep the file's permissions."""
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        self.tracker.add_habit(Habit('Test', 'daily'))
+        self.assertEqual(os.stat(self.test_file).st_mode & 0o777, 0o644)
+        
+        os.chmod(self.test_file, 0o664)
+        self.tracker.check_off('Test', '2024-01-01')
+        self.assertEqual(os.stat(self.test_file).st_mode & 0o777, 0o664)
+    
+    def test_bad_record_is_not_read_as_empty(self):
+        """Test that a malformed completion is reported instead of dropping the store on the next write."""
+        records = [Habit('Keep', 'daily').to_dict(),
+                   dict(Habit('Odd', 'daily').to_dict(), completions=['2024-1-5'])]
+        with open(self.test_file, 'w') as f:
+            json.dump(records, f)
+        with self.assertRaises(storage.StorageError):
+            HabitTracker(self.test_file)
+        with open(self.test_file) as f:
+            self.assertEqual(json.load(f), records)
+        
+        # A file that is not JSON at all is still read as an empty store
+        with open(self.test_file, 'w') as f:
+            f.write('[{"name": "Keep", ')
+        for lazy in (False, True):
+            self.assertEqual(HabitTracker(self.test_file, lazy=lazy).habits, [])
+    
     def test_load_empty_file(self):
         """Test loading when file doesn't exist."""
         tracker = HabitTracker('nonexistent_file.json')
         self.assertEqual(len(tracker.habits), 0)
 
+class TestJournal(unittest.TestCase):
+    """Test the append-only journal storage mode."""
+    
+    def setUp(self):
+        """Set up test environment with temporary file."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        self.tracker = HabitTracker(self.test_file, journal=True)
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+    
+    def test_replaced_habits_survive_a_later_mutation(self):
+        """Test that replacing all habits is written in full by the next flush."""
+        self.tracker.add_habit(Habit('Old', 'daily'))
+        self.tracker.habits = [Habit('X', 'daily')]
+        self.tracker.check_off('X', '2024-01-01')
+        self.assertEqual([h.name for h in HabitTracker(self.test_file).habits], ['X'])
+        self.assertEqual(HabitTracker(self.test_file).get('X').completions, ['2024-01-01'])
+    
+    def test_mutations_append_to_journal(self):
+        """Test that mutations are appended to the journal, not the snapshot."""
+        self.tracker.add_habit(Habit('Test', 'daily'))
+        self.tracker.check_off('Test')
+        
+        self.assertFalse(os.path.exists(self.test_file))
+        with open(self.tracker.storage.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+    
+    def test_load_replays_journal(self):
+        """Test that loading replays the journal on top of the snapshot."""
+        self.tracker.add_habit(Habit('Test1', 'daily'))
+        self.tracker.compact()
+        self.tracker.add_habit(Habit('Test2', 'weekly'))
+        self.tracker.check_off('Test1')
+        self.tracker.delete_habit('Test2')
+        
+        tracker2 = HabitTracker(self.test_file)
+        self.assertEqual([h.name for h in tracker2.habits], ['Test1'])
+        self.assertEqual(tracker2.habits[0].completions, [date.today().isoformat()])
+    
+    def test_compaction_threshold(self):
+        """Test that the journal is folded into the snapshot after the threshold."""
+        tracker = HabitTracker(self.test_file, journal=True, compact_records=3)
+        for i in range(3):
+            tracker.add_habit(Habit(f'Test{i}', 'daily'))
+        
+        self.assertFalse(os.path.exists(tracker.storage.journal_path))
+        tracker2 = HabitTracker(self.test_file)
+        self.assertEqual(len(tracker2.habits), 3)
+    
+    def test_replay_after_interrupted_compaction(self):
+        """Test that replaying a stale journal over a new snapshot is harmless."""
+        self.tracker.add_habit(Habit('Test', 'daily'))
+        self.tracker.check_off('Test')
+        with open(self.tracker.storage.journal_path) as f:
+            journal = f.read()
+        self.tracker.compact()
+        with open(self.tracker.storage.journal_path, 'w') as f:
+            f.write(journal)
+        
+        tracker2 = HabitTracker(self.test_file)
+        self.assertEqual(len(tracker2.habits), 1)
+        self.assertEqual(len(tracker2.habits[0].completions), 1)
+    
+    def test_torn_journal_tail_is_ignored(self):
+        """Test that a partially written last record is dropped on load."""
+        self.tracker.add_habit(Habit('Test', 'daily'))
+        with open(self.tracker.storage.journal_path, 'a') as f:
+            f.write('{"op": "delete", "na')
+        
+        tracker2 = HabitTracker(self.test_file, journal=True)
+        self.assertEqual(len(tracker2.habits), 1)
+        tracker2.check_off('Test')
+        tracker3 = HabitTracker(self.test_file)
+        self.assertEqual(len(tracker3.habits[0].completions), 1)
+
+class TestLazyLoading(unittest.TestCase):
+    """Test the streaming, lazy JSON loader."""
+    
+    def setUp(self):
+        """Set up a store with predefined habits."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        tracker = HabitTracker(self.test_file)
+        tracker.habits = load_predefined_habits()
+        tracker.save()
+        self.expected = {h.name: h.completions for h in tracker.habits}
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+    
+    def test_headers_loaded_first(self):
+        """Test that only headers are parsed until completions are accessed."""
+        tracker = HabitTracker(self.test_file, lazy=True)
+        self.assertEqual(len(tracker.habits), 5)
+        self.assertFalse(any(h.is_loaded() for h in tracker.habits))
+        
+        habit = tracker.get('Drink Water')
+        self.assertEqual(habit.current_streak(), 28)
+        self.assertTrue(habit.is_loaded())
+        self.assertEqual(sum(h.is_loaded() for h in tracker.habits), 1)
+        self.assertEqual({h.name: h.completions for h in tracker.habits}, self.expected)
+    
+    def test_save_after_lazy_load(self):
+        """Test that mutating and saving a lazily loaded store keeps all data."""
+        tracker = HabitTracker(self.test_file, lazy=True)
+        tracker.check_off('Exercise', '2000-01-01')
+        tracker.delete_habit('Read Book')
+        
+        tracker2 = HabitTracker(self.test_file)
+        self.assertEqual(len(tracker2.habits), 4)
+        self.assertEqual(tracker2.get('Exercise').completions[0], '2000-01-01')
+        self.assertEqual(tracker2.get('Drink Water').completions, self.expected['Drink Water'])
+    
+    def test_compact_and_unusual_formatting(self):
+        """Test scanning compact JSON with extra and nested fields."""
+        with open(self.test_file, 'w') as f:
+            f.write('[{"name":"A \\"quoted\\" [x]","extra":{"a":[1,{"b":null}]},'
+                    '"completions":["2024-01-02","2024-01-01"],"periodicity":"daily"},'
+                    '{"periodicity":"weekly","name":"B","creation_date":"2024-01-01"}]')
+        habits = HabitTracker(self.test_file, lazy=True).habits
+        self.assertEqual([h.name for h in habits], ['A "quoted" [x]', 'B'])
+        self.assertEqual(habits[0].completions, ['2024-01-01', '2024-01-02'])
+        self.assertEqual(habits[1].completions, [])
+    
+    def test_null_completions(self):
+        """Test that a null completions field loads as no completions, like the eager loader."""
+        with open(self.test_file, 'w') as f:
+            f.write('[{"name": "A", "periodicity": "daily", "completions": null},'
+                    ' {"name": "B", "periodicity": "daily", "completions": ["2024-01-01"]}]')
+        for lazy in (False, True):
+            habits = HabitTracker(self.test_file, lazy=lazy).habits
+            self.assertEqual([(h.name, h.completions) for h in habits], [('A', []), ('B', ['2024-01-01'])])
+        
+        with open(self.test_file, 'w') as f:
+            f.write('[{"name": "A", "periodicity": "daily", "completions": "2024-01-01"}]')
+        with self.assertRaises(storage.StorageError):
+            HabitTracker(self.test_file, lazy=True, shared=True)
+    
+    def test_invalid_file(self):
+        """Test that malformed and empty files load as empty, like the eager loader."""
+        for content in ['', '{"name": "x"}', '[{"name": ']:
+            with open(self.test_file, 'w') as f:
+                f.write(content)
+            self.assertEqual(HabitTracker(self.test_file, lazy=True).habits, [])
+
+class TestTiering(unittest.TestCase):
+    """Test hot/cold tiering of completion history."""
+    
+    def setUp(self):
+        """Set up a store with a year and a half of history."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        self.today = date.today()
+        # A 50-day run ending today, and every other day before it
+        days = [self.today - timedelta(days=i) for i in range(50)]
+        days += [self.today - timedelta(days=i) for i in range(51, 550, 2)]
+        self.habit = Habit('Run', 'daily', '2020-01-01', [d.isoformat() for d in days])
+        self.expected = self.habit.completions
+        tracker = HabitTracker(self.test_file, tier_days=30)
+        tracker.add_habit(self.habit)
+        tracker.save()
+        self.reads = 0
+        ordinals = archive.ColdHistory.ordinals
+        
+        def counting_ordinals(cold):
+            self.reads += 1
+            return ordinals(cold)
+        archive.ColdHistory.ordinals = counting_ordinals
+        self.addCleanup(setattr, archive.ColdHistory, 'ordinals', ordinals)
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+    
+    def test_old_history_leaves_the_snapshot(self):
+        """Test that only the hot window stays in the JSON file and in memory."""
+        with open(self.test_file) as f:
+            record = json.load(f)[0]
+        self.assertEqual(len(record['completions']), 30)
+        self.assertEqual(record['archived']['count'], len(self.expected) - 30)
+        
+        habit = HabitTracker(self.test_file, tier_days=30).get('Run')
+        self.assertEqual(len(habit.recent_ordinals), 30)
+        self.assertEqual(habit.completions, self.expected)
+        self.assertEqual(habit.completion_count(), len(self.expected))
+    
+    def test_archive_read_only_when_needed(self):
+        """Test that recent queries stay in memory and older ones read the archive."""
+        habit = HabitTracker(self.test_file, tier_days=30).get('Run')
+        week_ago = self.today - timedelta(days=7)
+        self.assertEqual(habit.count_between(week_ago, self.today), 8)
+        self.assertTrue(habit.is_completed(week_ago))
+        self.assertEqual(self.reads, 0)
+        
+        self.assertEqual(habit.current_streak(), 50)  # The run crosses into the archive
+        year_ago = self.today - timedelta(days=365)
+        self.assertEqual(habit.completions_between(year_ago, self.today),
+                         self.habit.completions_between(year_ago, self.today))
+        self.assertEqual(analytics.streak_stats(habit), analytics.streak_stats(self.habit))
+        self.assertGreater(self.reads, 0)
+    
+    def test_backfill_remove_and_delete(self):
+        """Test mutations of archived history across saves."""
+        tracker = HabitTracker(self.test_file, tier_days=30)
+        old = self.today - timedelta(days=200)
+        gone = self.today - timedelta(days=201)
+        habit = tracker.get('Run')
+        self.assertFalse(habit.check_off(gone))
+        self.assertTrue(habit.check_off(old))
+        self.assertFalse(habit.check_off(old))
+        self.assertTrue(habit.remove_completion(gone))
+        self.assertEqual(habit.current_streak(), 50)
+        tracker.save()
+        
+        habit = HabitTracker(self.test_file, tier_days=30).get('Run')
+        self.assertTrue(habit.is_completed(old))
+        self.assertFalse(habit.is_completed(gone))
+        self.assertEqual(habit.completion_count(), len(self.expected))
+        
+        tracker.delete_habit('Run')
+        tracker.save()
+        self.assertEqual(os.listdir(self.test_file + '.archive'), [])
+    
+    def test_interrupted_save_and_untiered_store(self):
+        """Test that stray archive bytes are ignored, saving without tiering keeps the archive and migrating untiers."""
+        habit = HabitTracker(self.test_file, tier_days=30).get('Run')
+        with open(habit.archive.path, 'ab') as f:
+            f.write(b'torn segment')
+        tracker = HabitTracker(self.test_file, tier_days=10)
+        tracker.save()
+        self.assertEqual(HabitTracker(self.test_file).get('Run').completions, self.expected)
+        
+        tracker = HabitTracker(self.test_file)
+        tracker.check_off('Run', self.today)
+        tracker.save()
+        with open(self.test_file) as f:
+            self.assertEqual(len(json.load(f)[0]['completions']), 10)
+        self.assertEqual(HabitTracker(self.test_file).get('Run').completions, self.expected)
+        
+        untiered = os.path.join(self.test_dir, 'untiered.json')
+        storage.migrate(self.test_file, untiered)
+        with open(untiered) as f:
+            self.assertEqual(json.load(f)[0]['completions'], self.expected)
+        self.assertFalse(os.path.exists(untiered + '.archive'))
+
+def _check_off_worker(path, worker, count):
+    """Check off `count` distinct days of the shared habit from one process."""
+    tracker = HabitTracker(path, shared=True)
+    base = date(2020, 1, 1).toordinal() + worker * count
+    for i in range(count):
+        tracker.check_off('Shared', base + i)
+
+class TestSharedStorage(unittest.TestCase):
+    """Test concurrency-safe access to one store from several trackers."""
+    
+    def setUp(self):
+        """Set up a shared store with one habit."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        HabitTracker(self.test_file, shared=True).add_habit(Habit('Shared', 'daily'))
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+    
+    def test_stale_tracker_merges(self):
+        """Test that a stale tracker replays its change instead of clobbering."""
+        tracker1 = HabitTracker(self.test_file, shared=True)
+        tracker2 = HabitTracker(self.test_file, shared=True)
+        tracker1.check_off('Shared', '2024-01-01')
+        tracker1.add_habit(Habit('Other', 'weekly'))
+        tracker2.check_off('Shared', '2024-01-02')
+        
+        self.assertEqual([h.name for h in tracker2.habits], ['Shared', 'Other'])
+        self.assertEqual(tracker2.get('Shared').completions, ['2024-01-01', '2024-01-02'])
+        self.assertEqual(HabitTracker(self.test_file).get('Shared').completions, ['2024-01-01', '2024-01-02'])
+    
+    def test_stale_journal_tracker_merges(self):
+        """Test merging when the shared store is journaled."""
+        tracker1 = HabitTracker(self.test_file, shared=True, journal=True)
+        tracker2 = HabitTracker(self.test_file, shared=True, journal=True)
+        tracker1.check_off('Shared', '2024-01-01')
+        tracker2.check_off('Shared', '2024-01-02')
+        tracker1.check_off('Shared', '2024-01-03')
+        self.assertEqual(len(HabitTracker(self.test_file).get('Shared').completions), 3)
+    
+    def test_stale_compact_keeps_other_writes(self):
+        """Test that a stale tracker's compact() or save() never drops another process's writes."""
+        tracker1 = HabitTracker(self.test_file, shared=True)
+        HabitTracker(self.test_file, shared=True).check_off('Shared', '2024-01-05')
+        with self.assertRaises(storage.StorageError):
+            tracker1.save()
+        tracker1.compact()
+        
+        self.assertEqual(tracker1.get('Shared').completions, ['2024-01-05'])
+        self.assertEqual(HabitTracker(self.test_file).get('Shared').completions, ['2024-01-05'])
+    
+    def test_corrupt_file_raises(self):
+        """Test that a corrupt shared store is reported instead of read as empty."""
+        with open(self.test_file, 'w') as f:
+            f.write('[{"name": "Shared", ')
+        with self.assertRaises(storage.StorageError):
+            HabitTracker(self.test_file, shared=True)
+    
+    @unittest.skipIf(storage.fcntl is None, "Advisory file locks are not available")
+    def test_no_lost_check_offs_across_processes(self):
+        """Test that concurrent writers in separate processes lose no check-offs."""
+        workers, count = 4, 25
+        processes = [
+            multiprocessing.Process(target=_check_off_worker, args=(self.test_file, w, count))
+            for w in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        
+        habit = HabitTracker(self.test_file).get('Shared')
+        self.assertEqual(habit.completion_count(), workers * count)
+
+class TestAutosave(unittest.TestCase):
+    """Test debounced background autosave."""
+    
+    def setUp(self):
+        """Set up test environment with temporary file."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        self.writes = []
+        # Cleanups run last-in first-out, so trackers are closed before this
+        self.addCleanup(shutil.rmtree, self.test_dir)
+    
+    def _tracker(self, **options):
+        tracker = HabitTracker(self.test_file, autosave=True, **options)
+        apply = tracker.storage.apply
+        tracker.storage.apply = lambda changes, habits: self.writes.append(len(changes)) or apply(changes, habits)
+        self.addCleanup(tracker.close)
+        return tracker
+    
+    def test_burst_coalesced_into_one_write(self):
+        """Test that a burst of mutations returns immediately and is written once."""
+        tracker = self._tracker(debounce=0.1)
+        tracker.add_habit(Habit('Test', 'daily'))
+        for i in range(1, 6):
+            tracker.check_off('Test', date(2024, 1, i))
+        self.assertTrue(tracker.dirty)
+        self.assertFalse(os.path.exists(self.test_file))
+        
+        deadline = time.monotonic() + 5
+        while tracker.dirty and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.writes, [6])
+        self.assertEqual(len(HabitTracker(self.test_file).get('Test').completions), 5)
+    
+    def test_max_delay_bounds_continuous_changes(self):
+        """Test that a steady stream of changes is still written after max_delay."""
+        tracker = self._tracker(debounce=0.2, max_delay=0.3)
+        tracker.add_habit(Habit('Test', 'daily'))
+        start = time.monotonic()
+        day = 1
+        while not self.writes and time.monotonic() - start < 5:
+            tracker.check_off('Test', date(2024, 1, 1) + timedelta(days=day))
+            day += 1
+            time.sleep(0.05)
+        self.assertTrue(self.writes)
+        self.assertLess(time.monotonic() - start, 2)
+    
+    def test_explicit_flush_and_close(self):
+        """Test that flush() and close() write pending changes immediately."""
+        tracker = self._tracker(debounce=60)
+        tracker.add_habit(Habit('Test1', 'daily'))
+        tracker.flush()
+        self.assertFalse(tracker.dirty)
+        self.assertEqual(len(HabitTracker(self.test_file).habits), 1)
+        
+        tracker.add_habit(Habit('Test2', 'daily'))
+        tracker.close()
+        self.assertFalse(tracker._autosaver.is_alive())
+        self.assertEqual(len(HabitTracker(self.test_file).habits), 2)
+    
+    def test_flush_on_interpreter_exit(self):
+        """Test that pending changes are written when the interpreter exits."""
+        script = (
+            "from habit import Habit, HabitTracker\n"
+            f"tracker = HabitTracker({self.test_file!r}, autosave=True, debounce=60)\n"
+            "tracker.add_habit(Habit('Test', 'daily'))\n"
+        )
+        subprocess.run([sys.executable, '-c', script], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(len(HabitTracker(self.test_file).habits), 1)
+
+class TestRollups(unittest.TestCase):
+    """Test incrementally maintained completion rollups."""
+    
+    def setUp(self):
+        """Set up a store with predefined habits."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        self.tracker = HabitTracker(self.test_file)
+        self.tracker.habits = load_predefined_habits()
+        self.tracker.save()
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+    
+    def assertMatchesRebuild(self, result):
+        expected = rollups.Rollups.build(self.tracker.habits)
+        self.assertEqual(+result.weeks, +expected.weeks)
+        self.assertEqual(+result.months, +expected.months)
+        self.assertEqual(+result.periodicity_totals, +expected.periodicity_totals)
+        self.assertEqual({n: r.to_dict() for n, r in result.habits.items()},
+                         {n: r.to_dict() for n, r in expected.habits.items()})
+    
+    def test_keys(self):
+        """Test ISO week and month keys."""
+        self.assertEqual(rollups.week_key(date(2024, 12, 30).toordinal()), '2025-W01')
+        self.assertEqual(rollups.month_key(date(2024, 12, 30).toordinal()), '2024-12')
+    
+    def test_incremental_updates(self):
+        """Test that check-offs, adds and deletes keep rollups equal to a rebuild."""
+        result = self.tracker.rollups
+        self.tracker.check_off('Exercise', '2000-01-03')
+        self.tracker.check_off('Exercise', '2000-01-03')
+        self.tracker.add_habit(Habit('New', 'weekly', completions=['2000-01-04']))
+        self.tracker.delete_habit('Read Book')
+        self.assertIs(self.tracker.rollups, result)
+        self.assertEqual(result.weeks['2000-W01'], 2)
+        self.assertEqual(result.months['2000-01'], 2)
+        self.assertMatchesRebuild(result)
+    
+    def test_persisted_and_revalidated(self):
+        """Test that saved rollups are reused and stale habits are rebuilt."""
+        self.tracker.rollups
+        self.tracker.save()
+        self.assertTrue(os.path.exists(self.tracker.rollups_path))
+        
+        # A tracker that never touched rollups changes one habit behind their back
+        HabitTracker(self.test_file).check_off('Call Parents', '2000-01-03')
+        self.tracker = HabitTracker(self.test_file)
+        self.assertEqual(self.tracker.rollups.habits['Call Parents'].total, 5)
+        self.assertMatchesRebuild(self.tracker.rollups)
+    
+    def test_replaced_history_is_rebuilt(self):
+        """Test that a rollup with the right count but different days is not reused."""
+        self.tracker.habits = [Habit('X', 'daily', completions=['2024-01-01'])]
+        self.tracker.rollups
+        self.tracker.save()
+        
+        # Same count, different day, changed by a tracker that never touched rollups
+        tracker = HabitTracker(self.test_file)
+        tracker.delete_habit('X')
+        tracker.add_habit(Habit('X', 'daily', completions=['2024-05-27']))
+        self.assertEqual(dict(HabitTracker(self.test_file).rollups.weeks), {'2024-W22': 1})
+        
+        tracker.habits = [Habit('Y', 'daily')]
+        self.assertFalse(os.path.exists(tracker.rollups_path))
+    
+    def test_rebuilt_when_missing(self):
+        """Test that rollups are built lazily when no file exists."""
+        tracker = HabitTracker(self.test_file)
+        self.assertFalse(os.path.exists(tracker.rollups_path))
+        self.assertEqual(tracker.rollups.periodicity_totals['weekly'], 8)
+
+class TestLeaderboard(unittest.TestCase):
+    """Test the incremental top-K streak leaderboard."""
+    
+    def setUp(self):
+        """Set up a tracker with a seeded population of habits."""
+        self.test_dir = tempfile.mkdtemp()
+        self.tracker = HabitTracker(os.path.join(self.test_dir, 'test_habits.json'), journal=True)
+        self.today = date(2025, 1, 1)
+        self.tracker.habits = bench.generate_habits(60, 0.3, 0.8, seed=3, today=self.today)
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+    
+    def expected(self, k, periodicity=None, historical=False, today=None):
+        today = today or self.today
+        habits = [h for h in self.tracker.habits if periodicity in (None, h.periodicity)]
+        stats = analytics.streak_stats_per_habit(habits, today)
+        scores = [(name, s.longest if historical else s.current) for name, s in stats.items()]
+        return sorted([e for e in scores if e[1] > 0], key=lambda e: (-e[1], e[0]))[:k]
+    
+    def assertBoardMatches(self, today=None):
+        for periodicity in [None, 'daily', 'weekly']:
+            for historical in [False, True]:
+                self.assertEqual(
+                    self.tracker.top_streaks(5, periodicity, historical, today or self.today),
+                    self.expected(5, periodicity, historical, today))
+    
+    def test_matches_full_recompute(self):
+        """Test the initial ranking against analytics."""
+        self.assertBoardMatches()
+    
+    def test_incremental_updates(self):
+        """Test rankings after check-offs, backfills, adds and deletes."""
+        self.assertBoardMatches()
+        rng = random.Random(5)
+        names = [h.name for h in self.tracker.habits]
+        for _ in range(200):
+            name = rng.choice(names)
+            if self.tracker.get(name) is None:
+                continue
+            roll = rng.random()
+            if roll < 0.05:
+                self.tracker.delete_habit(name)
+            elif roll < 0.3:
+                self.tracker.check_off(name, self.today - timedelta(days=rng.randrange(100)))
+            else:
+                self.tracker.check_off(name, self.today)
+        self.tracker.add_habit(Habit('Newcomer', 'daily', completions=[
+            (self.today - timedelta(days=i)).isoformat() for i in range(90)
+        ]))
+        self.assertEqual(self.tracker.top_streaks(1, today=self.today), [('Newcomer', 90)])
+        self.assertBoardMatches()
+    
+    def test_incremental_schedule_habits(self):
+        """Test check-offs of habits on other schedules, including runs that ended in a past period."""
+        today = date(2024, 3, 1)
+        self.tracker.habits = [Habit('Monthly', 'monthly'), Habit('Mondays', 'weekdays:mon'),
+                               Habit('Other days', 'every:2')]
+        self.assertEqual(self.tracker.top_streaks(5, historical=True, today=today), [])
+        self.tracker.check_off('Monthly', '2024-02-25')
+        self.assertEqual(self.tracker.top_streaks(5, historical=True, today=today), [('Monthly', 1)])
+        
+        rng = random.Random(11)
+        for _ in range(100):
+            name = rng.choice(['Monthly', 'Mondays', 'Other days'])
+            self.tracker.check_off(name, today - timedelta(days=rng.randrange(120)))
+            for historical in (False, True):
+                self.assertEqual(self.tracker.top_streaks(5, historical=historical, today=today),
+                                 self.expected(5, historical=historical, today=today))
+    
+    def test_day_rollover(self):
+        """Test that current streaks reset on a new day until habits are checked off."""
+        self.assertBoardMatches()
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(self.tracker.top_streaks(5, today=tomorrow), [])
+        for habit in self.tracker.habits[:10]:
+            self.tracker.check_off(habit.name, tomorrow)
+        self.assertBoardMatches(tomorrow)
+
+class TestTrackerPool(unittest.TestCase):
+    """Test the multi-tenant tracker pool."""
+    
+    def setUp(self):
+        """Set up a pool over a temporary directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.pool = pool.TrackerPool(self.test_dir, capacity=2, debounce=60)
+        self.addCleanup(self.pool.close)
+    
+    def test_shards_are_separate(self):
+        """Test that each user gets their own shard file."""
+        self.pool.get('alice').add_habit(Habit('Run', 'daily'))
+        self.pool.get('bob/../x').add_habit(Habit('Read', 'daily'))
+        self.pool.flush()
+        
+        self.assertEqual(self.pool.users(), ['alice', 'bob/../x'])
+        self.assertEqual([h.name for h in HabitTracker(self.pool.shard_path('alice')).habits], ['Run'])
+        self.assertEqual(os.path.dirname(self.pool.shard_path('bob/../x')), self.test_dir)
+    
+    def test_lru_eviction_flushes_dirty_shards(self):
+        """Test that the pool stays bounded and evicted trackers are written first."""
+        alice = self.pool.get('alice')
+        alice.add_habit(Habit('Run', 'daily'))
+        self.assertTrue(alice.dirty)
+        self.pool.get('bob')
+        self.assertIs(self.pool.get('alice'), alice)  # Now most recently used
+        self.pool.get('carol')
+        
+        self.assertEqual(len(self.pool), 2)
+        self.assertNotIn('bob', self.pool)
+        self.pool.get('dave')
+        self.assertNotIn('alice', self.pool)
+        self.assertFalse(alice.dirty)
+        self.assertEqual(len(self.pool.get('alice').habits), 1)
+    
+    def test_pinned_tracker_is_not_evicted(self):
+        """Test that a tracker borrowed with use() outlives later gets, and a closed one refuses changes."""
+        alice = self.pool.get('alice')
+        with self.pool.use('bob') as bob:
+            self.pool.get('carol')
+            self.pool.get('dave')
+            self.assertIn('bob', self.pool)
+            bob.add_habit(Habit('Run', 'daily'))
+        self.assertEqual(len(self.pool), 2)
+        self.assertEqual(len(self.pool.get('bob').habits), 1)
+        
+        with self.assertRaises(ValueError):
+            alice.check_off('Run')
+        self.assertFalse(alice.dirty)
+    
+    def test_map_shards_in_parallel(self):
+        """Test cross-shard analytics in worker processes."""
+        today = date.today()
+        for user, days in [('alice', 3), ('bob', 5), ('carol', 1)]:
+            self.pool.get(user).add_habit(Habit('Run', 'daily', completions=[
+                (today - timedelta(days=i)).isoformat() for i in range(days)
+            ]))
+        result = self.pool.map_shards(analytics.longest_historical_streak, processes=2)
+        self.assertEqual(result, {'alice': 3, 'bob': 5, 'carol': 1})
+
+class TestService(unittest.TestCase):
+    """Test the local HTTP service and its check-off coalescing."""
+    
+    def setUp(self):
+        """Serve a journaled tracker on a free port."""
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.test_file = os.path.join(self.test_dir, 'habits.json')
+        tracker = HabitTracker(self.test_file, journal=True)
+        tracker.add_habit(Habit('Run', 'daily'))
+        tracker.add_habit(Habit('Read a book', 'weekly'))
+        self.service = service.HabitService(tracker)
+        self.writes = []
+        apply = tracker.storage.apply
+        tracker.storage.apply = lambda changes, habits: self.writes.append(len(changes)) or apply(changes, habits)
+    
+    def serve(self, scenario):
+        """Run scenario(port) against the service in a fresh event loop."""
+        async def main():
+            server = await self.service.start('127.0.0.1', 0)
+            async with server:
+                return await scenario(server.sockets[0].getsockname()[1])
+        try:
+            return asyncio.run(main())
+        finally:
+            self.service.close()
+    
+    def test_concurrent_check_offs_are_coalesced(self):
+        """Test that a burst of check-offs is persisted in fewer writes than requests."""
+        base = date(2024, 1, 1)
+        
+        async def scenario(port):
+            async def check(i):
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                try:
+                    return await loadtest.request(reader, writer, 'POST', '/habits/Run/check',
+                                                  {'date': (base + timedelta(days=i)).isoformat()})
+                finally:
+                    writer.close()
+            return await asyncio.gather(*(check(i) for i in range(30)))
+        
+        responses = self.serve(scenario)
+        self.assertTrue(all(status == 200 for status, _ in responses))
+        self.assertEqual(sum(self.writes), 30)
+        self.assertLess(len(self.writes), 30)
+        self.assertEqual(HabitTracker(self.test_file).get('Run').completion_count(), 30)
+    
+    def test_endpoints(self):
+        """Test the list, stats and error responses over one keep-alive connection."""
+        async def scenario(port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                return [
+                    await loadtest.request(reader, writer, 'POST', '/habits/Read%20a%20book/check'),
+                    await loadtest.request(reader, writer, 'GET', '/habits'),
+                    await loadtest.request(reader, writer, 'GET', '/stats'),
+                    await loadtest.request(reader, writer, 'POST', '/habits/Swim/check'),
+                    await loadtest.request(reader, writer, 'POST', '/habits/Run/check', {'date': 'soon'}),
+                    await loadtest.request(reader, writer, 'GET', '/nowhere'),
+                ]
+            finally:
+                writer.close()
+        
+        checked, listed, stats, missing, invalid, unknown = self.serve(scenario)
+        self.assertEqual(checked, (200, {'checked_off': 'Read a book', 'date': date.today().isoformat()}))
+        self.assertEqual([h['name'] for h in listed[1]], ['Run', 'Read a book'])
+        self.assertEqual(listed[1][1]['current_streak'], 1)
+        self.assertEqual(stats[1], analytics.summary(HabitTracker(self.test_file).habits))
+        self.assertEqual(missing[0], 404)
+        self.assertEqual(invalid[0], 400)
+        self.assertEqual(unknown[0], 404)
+    
+    def test_load_report(self):
+        """Test that the load test reports throughput and latency percentiles."""
+        report = self.serve(lambda port: loadtest.run_load('127.0.0.1', port, ['Run', 'Read a book'],
+                                                           concurrency=5, requests=10))
+        self.assertEqual(report['requests'], 50)
+        self.assertEqual(report['errors'], 0)
+        self.assertGreater(report['requests_per_sec'], 0)
+        self.assertGreaterEqual(report['p99_ms'], report['p50_ms'])
+
+class TestSqliteStorage(unittest.TestCase):
+    """Test the SQLite storage backend."""
+    
+    def setUp(self):
+        """Set up test environment with temporary database."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.db')
+        self.tracker = HabitTracker(self.test_file)
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        self.tracker.close()
+        shutil.rmtree(self.test_dir)
+    
+    def test_replaced_habits_survive_a_later_mutation(self):
+        """Test that replacing all habits is written in full by the next flush."""
+        self.tracker.add_habit(Habit('Old', 'daily'))
+        self.tracker.habits = [Habit('X', 'daily')]
+        self.tracker.check_off('X', '2024-01-01')
+        reopened = HabitTracker(self.test_file)
+        self.addCleanup(reopened.close)
+        self.assertEqual([h.name for h in reopened.habits], ['X'])
+        self.assertEqual(reopened.get('X').completions, ['2024-01-01'])
+    
+    def test_backend_selected_by_extension(self):
+        """Test that .db paths use SQLite and other paths use JSON."""
+        self.assertIsInstance(self.tracker.storage, storage.SqliteStorage)
+        self.assertIsInstance(storage.open_storage('habits.json'), storage.JsonStorage)
+    
+    def test_persistence(self):
+        """Test adding, checking off and deleting habits round-trips through SQLite."""
+        self.tracker.add_habit(Habit('Test1', 'daily'))
+        self.tracker.add_habit(Habit('Test2', 'weekly'))
+        self.tracker.check_off('Test1')
+        self.tracker.delete_habit('Test2')
+        
+        tracker2 = HabitTracker(self.test_file)
+        self.assertEqual([h.name for h in tracker2.habits], ['Test1'])
+        self.assertEqual(tracker2.habits[0].completions, [date.today().isoformat()])
+        tracker2.close()
+    
+    def test_completions_loaded_per_habit(self):
+        """Test that loading reads habit rows only and a save keeps unread completions."""
+        self.tracker.add_habit(Habit('Test1', 'daily', completions=['2024-01-01']))
+        self.tracker.add_habit(Habit('Test2', 'daily', completions=['2024-01-02']))
+        
+        tracker2 = HabitTracker(self.test_file)
+        self.assertFalse(any(h.is_loaded() for h in tracker2.habits))
+        self.assertEqual(tracker2.get('Test2').completions, ['2024-01-02'])
+        self.assertFalse(tracker2.get('Test1').is_loaded())
+        tracker2.save()
+        self.assertEqual(HabitTracker(self.test_file).get('Test1').completions, ['2024-01-01'])
+        tracker2.close()
+    
+    def test_queries_read_only_needed_rows(self):
+        """Test that range counts and current streaks are answered by the database until a habit is loaded."""
+        today = date.today()
+        days = [(today - timedelta(days=i)).isoformat() for i in (0, 1, 2, 10)]
+        self.tracker.add_habit(Habit('Run', 'daily', completions=days))
+        self.tracker.add_habit(Habit('Read', 'weekly', completions=[days[0]]))
+        
+        tracker2 = HabitTracker(self.test_file)
+        self.addCleanup(tracker2.close)
+        week_ago = today - timedelta(days=7)
+        self.assertEqual(analytics.longest_streak_per_habit(tracker2.habits), {'Run': 3, 'Read': 1})
+        self.assertEqual(analytics.completion_counts(tracker2.habits, week_ago, today), {'Run': 3, 'Read': 1})
+        self.assertEqual(tracker2.get('Run').completions_between(week_ago, today), sorted(days[:3]))
+        self.assertFalse(any(h.is_loaded() for h in tracker2.habits))
+        
+        tracker2.check_off('Run', today - timedelta(days=3))
+        self.assertTrue(tracker2.get('Run').is_loaded())
+        self.assertEqual(tracker2.get('Run').current_streak(), 4)
+        self.assertEqual(tracker2.get('Run').count_between(week_ago, today), 4)
+    
+    def test_unsupported_options(self):
+        """Test that options SQLite cannot honour are refused."""
+        with self.assertRaises(ValueError):
+            storage.open_storage(self.test_file, shared=True)
+        with self.assertRaises(ValueError):
+            HabitTracker(self.test_file, tier_days=30)
+        storage.open_storage(self.test_file, journal=True, lazy=True).close()
+    
+    def test_backfill(self):
+        """Test that a backfill change inserts its rows and skips existing ones."""
+        self.tracker.add_habit(Habit('Test', 'daily', completions=['2024-01-02']))
+        self.assertEqual(self.tracker.add_completions('Test', ['2024-01-01', '2024-01-02', '2024-01-03']), 2)
+        self.assertEqual(self.tracker.storage.completions('Test'), ['2024-01-01', '2024-01-02', '2024-01-03'])
+    
+    def test_range_and_streak_queries(self):
+        """Test that indexed queries match the in-memory habit."""
+        today = date.today()
+        habit = Habit('Test', 'daily', completions=[
+            (today - timedelta(days=i)).isoformat() for i in (0, 1, 2, 5, 6)
+        ])
+        self.tracker.add_habit(habit)
+        
+        start = (today - timedelta(days=5)).isoformat()
+        end = (today - timedelta(days=1)).isoformat()
+        self.assertEqual(len(self.tracker.storage.completions('Test', start, end)), 3)
+        self.assertEqual(self.tracker.storage.current_streak('Test'), habit.current_streak())
+        self.assertEqual(self.tracker.storage.current_streak('Missing'), 0)
+    
+    def test_migrate_json_to_sqlite_and_back(self):
+        """Test migrating between the JSON and SQLite backends."""
+        json_file = os.path.join(self.test_dir, 'habits.json')
+        json_tracker = HabitTracker(json_file)
+        json_tracker.habits = load_predefined_habits()
+        json_tracker.save()
+        
+        db_file = os.path.join(self.test_dir, 'migrated.db')
+        self.assertEqual(storage.migrate(json_file, db_file), 5)
+        back_file = os.path.join(self.test_dir, 'back.json')
+        storage.migrate(db_file, back_file)
+        
+        original = {h.name: sorted(h.completions) for h in json_tracker.habits}
+        migrated = {h.name: sorted(h.completions) for h in HabitTracker(back_file).habits}
+        self.assertEqual(migrated, original)
+
+class TestBinaryStorage(unittest.TestCase):
+    """Test the memory-mapped binary snapshot format."""
+    
+    def setUp(self):
+        """Set up a JSON store with example habits."""
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.json_file = os.path.join(self.test_dir, 'habits.json')
+        self.test_file = os.path.join(self.test_dir, 'habits.htsnap')
+        tracker = HabitTracker(self.json_file)
+        tracker.habits = load_predefined_habits() + [Habit('Empty', 'every:3', '2024-03-01'),
+                                                     Habit('Läufe ✓', 'weekdays:mon,fri', '2023-12-31')]
+        tracker.check_off('Empty', '2024-03-04')
+        tracker.save()
+        self.expected = [h.to_dict() for h in tracker.habits]
+    
+    def test_backend_selected_by_extension(self):
+        """Test that .htsnap paths use the binary backend."""
+        self.assertIsInstance(storage.open_storage(self.test_file), storage.BinaryStorage)
+    
+    def test_round_trip_with_json(self):
+        """Test migrating JSON to binary and back without losing anything."""
+        self.assertEqual(storage.migrate(self.json_file, self.test_file), 7)
+        with open(self.test_file, 'rb') as f:
+            self.assertEqual(f.read(6), b'HTSNAP')
+        self.assertEqual([h.to_dict() for h in HabitTracker(self.test_file).habits], self.expected)
+        
+        back_file = os.path.join(self.test_dir, 'back.json')
+        storage.migrate(self.test_file, back_file)
+        self.assertEqual([h.to_dict() for h in HabitTracker(back_file).habits], self.expected)
+    
+    def test_zero_copy_load_and_copy_on_write(self):
+        """Test that completions stay in the map until a habit changes."""
+        storage.migrate(self.json_file, self.test_file)
+        with open(self.test_file, 'rb') as f:
+            before = f.read()
+        tracker = HabitTracker(self.test_file, journal=True)
+        self.assertLess(tracker.storage.bytes_read, len(before))
+        exercise = tracker.get('Exercise')
+        self.assertIsInstance(exercise.recent_ordinals, memoryview)
+        
+        days = list(exercise.recent_ordinals)
+        self.assertTrue(tracker.check_off('Exercise', '2000-01-01'))
+        self.assertEqual(exercise.recent_ordinals.typecode, 'i')  # Now a private array
+        self.assertEqual(list(exercise.recent_ordinals), [date(2000, 1, 1).toordinal()] + days)
+        self.assertIsInstance(tracker.get('Read Book').recent_ordinals, memoryview)
+        with open(self.test_file, 'rb') as f:
+            self.assertEqual(f.read(), before)  # The change went to the journal
+        
+        tracker.close()
+        reopened = HabitTracker(self.test_file)
+        self.assertTrue(reopened.get('Exercise').is_completed('2000-01-01'))
+        reopened.save()
+        self.assertEqual(len(HabitTracker(self.test_file).get('Exercise').completions), len(days) + 1)
+    
+    def test_tiering(self):
+        """Test that archived history is kept across binary snapshots."""
+        today = date.today()
+        days = [(today - timedelta(days=i)).isoformat() for i in range(0, 100, 2)]
+        tracker = HabitTracker(self.test_file, tier_days=30)
+        tracker.add_habit(Habit('Run', 'daily', '2020-01-01', days))
+        tracker.save()
+        
+        habit = HabitTracker(self.test_file, tier_days=30).get('Run')
+        self.assertEqual(len(habit.recent_ordinals), 15)
+        self.assertEqual(habit.archive.count, 35)
+        self.assertEqual(habit.completions, sorted(days))
+    
+    def test_rejects_corrupt_files(self):
+        """Test that a damaged snapshot is reported in shared mode, and a foreign one always."""
+        storage.migrate(self.json_file, self.test_file)
+        with open(self.test_file, 'rb') as f:
+            data = f.read()
+        for damaged in (data[:-4], b'NOTSNAP' + data[7:], data[:6] + b'\x09' + data[7:]):
+            with open(self.test_file, 'wb') as f:
+                f.write(damaged)
+            with self.assertRaises(storage.StorageError):
+                HabitTracker(self.test_file, shared=True)
+        
+        # A foreign file or a newer format is refused even when not shared
+        for damaged in (b'NOTSNAP' + data[7:], data[:6] + b'\x02' + data[7:]):
+            with open(self.test_file, 'wb') as f:
+                f.write(damaged)
+            with self.assertRaises(storage.StorageError):
+                HabitTracker(self.test_file)
+
+class TestCommandLine(unittest.TestCase):
+    """Test the non-interactive command-line mode."""
+    
+    def setUp(self):
+        """Set up test environment with temporary file."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir)
+    
+    def cli(self, *args, python_options=()):
+        return subprocess.run(
+            [sys.executable, *python_options, 'cli.py', '--store', self.test_file, *args],
+            capture_output=True, text=True, cwd=self.cwd)
+    
+    def test_commands_print_json(self):
+        """Test add, check, list, stats and delete with JSON output."""
+        self.assertEqual(json.loads(self.cli('add', 'Run', 'daily').stdout),
+                         {'added': 'Run', 'periodicity': 'daily'})
+        self.assertEqual(json.loads(self.cli('check', 'Run', '--date', '2024-01-01').stdout),
+                         {'checked_off': 'Run', 'date': '2024-01-01'})
+        self.cli('check', 'Run')
+        
+        habits = json.loads(self.cli('list').stdout)
+        self.assertEqual(habits[0]['name'], 'Run')
+        self.assertEqual(habits[0]['current_streak'], 1)
+        self.assertEqual(habits[0]['completions'], 2)
+        stats = json.loads(self.cli('stats').stdout)
+        self.assertEqual(stats['total_habits'], 1)
+        self.assertEqual(stats['streaks']['Run'], {'current': 1, 'longest': 1})
+        
+        self.assertEqual(json.loads(self.cli('delete', 'Run').stdout), {'deleted': 'Run'})
+        self.assertEqual(json.loads(self.cli('list').stdout), [])
+    
+    def test_errors_exit_non_zero(self):
+        """Test that failures are reported as JSON with a non-zero exit code."""
+        self.cli('add', 'Run', 'daily')
+        for args in [('add', 'Run', 'weekly'), ('check', 'Missing'),
+                     ('check', 'Run', '--date', 'yesterday'), ('delete', 'Missing')]:
+            result = self.cli(*args)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn('error', json.loads(result.stdout))
+    
+    def test_check_startup_imports(self):
+        """Test with -X importtime that `check` loads only what it needs."""
+        self.cli('add', 'Run', 'daily')
+        result = self.cli('check', 'Run', python_options=('-X', 'importtime'))
+        self.assertEqual(result.returncode, 0)
+        
+        imports = {}
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and not line.endswith('package'):
+                _, cumulative, name = line[len('import time:'):].split('|')
+                imports[name.strip()] = int(cumulative)
+        for heavy in ['sqlite3', 'analytics', 'rollups', 'leaderboard', 'columnar', 'numpy', 'bench', 'metrics']:
+            self.assertNotIn(heavy, imports)
+        self.assertIn('habit', imports)
+        self.assertLess(imports['habit'], 1_000_000)  # microseconds
+    
+    def test_metrics_and_profile(self):
+        """Test that --metrics and --profile report on stderr without changing stdout."""
+        self.cli('add', 'Run', 'daily')
+        result = self.cli('--metrics', 'check', 'Run')
+        self.assertEqual(json.loads(result.stdout)['checked_off'], 'Run')
+        report = json.loads(result.stderr)
+        self.assertEqual(report['habit.check_off']['calls'], 1)
+        self.assertGreater(report['tracker.flush']['bytes_written'], 0)
+        
+        result = self.cli('--profile', 'stats')
+        self.assertEqual(json.loads(result.stdout)['total_habits'], 1)
+        self.assertIn('function calls', result.stderr)
+
 class TestAnalytics(unittest.TestCase):
     """Test the analytics module functionality."""
     
@@ -209,6 +1393,533 @@ class TestAnalytics(unittest.TestCase):
         self.assertEqual(result['Daily1'], 5)
         self.assertEqual(result['Weekly2'], 4)
 
+    def test_streak_stats(self):
+        """Test historical and current runs with their boundaries."""
+        habit = Habit('Test', 'daily', completions=[
+            '2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04',
+            '2024-01-10', '2024-01-11'
+        ])
+        stats = analytics.streak_stats(habit, today=date(2024, 1, 11))
+        self.assertEqual(stats, analytics.StreakStats(
+            4, date(2024, 1, 1), date(2024, 1, 4),
+            2, date(2024, 1, 10), date(2024, 1, 11)
+        ))
+        
+        stats = analytics.streak_stats(habit, today=date(2024, 1, 12))
+        self.assertEqual(stats.longest, 4)
+        self.assertEqual(stats.current, 0)
+        self.assertIsNone(stats.current_start)
+    
+    def test_streak_stats_weekly(self):
+        """Test that weekly runs require completions exactly a week apart."""
+        habit = Habit('Test', 'weekly', completions=['2024-01-01', '2024-01-08', '2024-01-15', '2024-01-20'])
+        stats = analytics.streak_stats(habit, today=date(2024, 1, 20))
+        self.assertEqual((stats.longest, stats.longest_end), (3, date(2024, 1, 15)))
+        self.assertEqual(stats.current, 1)
+    
+    def test_streak_stats_matches_current_streak(self):
+        """Test that the engine agrees with Habit.current_streak."""
+        stats = analytics.streak_stats_per_habit(self.habits)
+        for habit in self.habits:
+            self.assertEqual(stats[habit.name].current, habit.current_streak())
+        self.assertEqual(analytics.streak_stats(Habit('Empty', 'daily')).longest, 0)
+    
+    def test_longest_historical_streak(self):
+        """Test that a broken run still counts as the longest ever."""
+        today = date.today()
+        self.habits[1].completions = [(today - timedelta(days=i)).isoformat() for i in range(10, 20)]
+        self.assertEqual(analytics.longest_historical_streak(self.habits), 10)
+        self.assertEqual(analytics.longest_historical_streak_per_habit(self.habits)['Daily2'], 10)
+        self.assertEqual(analytics.longest_streak_per_habit(self.habits)['Daily2'], 0)
+
+class TestRangeAnalytics(unittest.TestCase):
+    """Test range-scoped analytics."""
+    
+    def setUp(self):
+        """Set up habits with gaps in their history."""
+        self.daily = Habit('Daily', 'daily', completions=[
+            '2024-01-01', '2024-01-02', '2024-01-03', '2024-01-05', '2024-01-06'
+        ])
+        self.weekly = Habit('Weekly', 'weekly', completions=['2024-01-01', '2024-01-08', '2024-01-15'])
+    
+    def test_completion_counts_and_rates(self):
+        """Test counts and rates over a window."""
+        start, end = date(2024, 1, 1), date(2024, 1, 10)
+        self.assertEqual(analytics.completion_counts([self.daily, self.weekly], start, end),
+                         {'Daily': 5, 'Weekly': 2})
+        rates = analytics.completion_rates([self.daily, self.weekly], start, end)
+        self.assertAlmostEqual(rates['Daily'], 0.5)
+        self.assertAlmostEqual(rates['Weekly'], 1.0)
+    
+    def test_streak_as_of(self):
+        """Test streaks as of a past day."""
+        self.assertEqual(analytics.streak_as_of(self.daily, date(2024, 1, 3)), 3)
+        self.assertEqual(analytics.streak_as_of(self.daily, date(2024, 1, 4)), 0)
+        self.assertEqual(analytics.streak_as_of(self.daily, date(2024, 1, 6)), 2)
+        self.assertEqual(analytics.streak_as_of(self.weekly, date(2024, 1, 8)), 2)
+        self.assertEqual(analytics.longest_streak_as_of([self.daily, self.weekly], date(2024, 1, 3)), 3)
+
+@unittest.skipIf(columnar.np is None, "NumPy is not installed")
+class TestColumnar(unittest.TestCase):
+    """Test that the columnar engine matches the pure-Python analytics."""
+    
+    def setUp(self):
+        """Set up a seeded population of habits with gappy histories."""
+        rng = random.Random(42)
+        self.today = date(2024, 6, 30)
+        self.habits = []
+        for i in range(200):
+            periodicity = rng.choice(['daily', 'weekly'])
+            step = 1 if periodicity == 'daily' else 7
+            completions = [
+                (self.today - timedelta(days=d)).isoformat()
+                for d in range(0, 365, step) if rng.random() < 0.8
+            ]
+            self.habits.append(Habit(f'Habit{i}', periodicity, '2023-07-01', completions))
+        self.habits.append(Habit('Empty', 'daily', '2024-01-01'))
+        self.engine = columnar.ColumnarHabits(self.habits)
+    
+    def test_filter_by_periodicity(self):
+        """Test vectorized periodicity filtering."""
+        for periodicity in ['daily', 'weekly', 'monthly']:
+            self.assertEqual(self.engine.filter_by_periodicity(periodicity),
+                             analytics.filter_by_periodicity(self.habits, periodicity))
+    
+    def test_current_streaks(self):
+        """Test vectorized current streaks."""
+        expected = {h.name: h.current_streak(self.today) for h in self.habits}
+        self.assertEqual(self.engine.longest_streak_per_habit(self.today), expected)
+        self.assertEqual(self.engine.longest_streak(self.today), max(expected.values()))
+    
+    def test_historical_streaks(self):
+        """Test vectorized historical streaks."""
+        self.assertEqual(self.engine.longest_historical_streak_per_habit(),
+                         analytics.longest_historical_streak_per_habit(self.habits))
+        self.assertEqual(self.engine.longest_historical_streak(),
+                         analytics.longest_historical_streak(self.habits))
+    
+    def test_completion_rates(self):
+        """Test vectorized completion rates over a window."""
+        start, end = date(2024, 6, 1), date(2024, 6, 30)
+        rates = self.engine.completion_rates(start, end)
+        for habit, rate in zip(self.habits, rates):
+            self.assertAlmostEqual(rate, analytics.completion_rate(habit, start, end))
+        
+        for start, end in ((date(2024, 6, 30), date(2024, 6, 29)), (date(2024, 6, 30), date(2024, 6, 1))):
+            self.assertEqual(self.engine.completion_rates(start, end).tolist(), [0.0] * len(self.habits))
+            self.assertEqual({analytics.completion_rate(h, start, end) for h in self.habits}, {0.0})
+    
+    def test_empty_population(self):
+        """Test the engine on a tracker without completions."""
+        engine = columnar.ColumnarHabits([Habit('Empty', 'daily')])
+        self.assertEqual(engine.longest_streak(), 0)
+        self.assertEqual(engine.longest_historical_streak(), 0)
+    
+    def test_many_periodicities(self):
+        """Test more distinct periodicity strings than a byte can number."""
+        habits = [Habit(f'Every {n}', f'every:{n}') for n in range(1, 131)]
+        engine = columnar.ColumnarHabits(habits)
+        self.assertEqual([h.name for h in engine.filter_by_periodicity('every:130')], ['Every 130'])
+
+class TestSchedule(unittest.TestCase):
+    """Test schedules and the bitset streak/adherence engine."""
+    
+    def streak(self, spec, days, today):
+        """Current streak of a habit with the given schedule and completions."""
+        return Habit('Test', spec, completions=days).current_streak(today)
+    
+    def test_parse(self):
+        """Test parsing periodicity strings."""
+        self.assertEqual(schedule.parse('daily'), schedule.Daily())
+        self.assertEqual(schedule.parse('weekly'), schedule.EveryNDays(7))
+        self.assertEqual(schedule.parse('every:3:2024-06-01'),
+                         schedule.EveryNDays(3, date(2024, 6, 1).toordinal()))
+        self.assertEqual(schedule.parse('weekdays:Mon,wednesday,fri'), schedule.Weekdays(frozenset({0, 2, 4})))
+        self.assertEqual(schedule.parse('calendar-weekly'), schedule.CalendarWeekly())
+        self.assertEqual(schedule.parse('monthly'), schedule.Monthly())
+        for spec in ('hourly', 'every:0', 'every:x', 'weekdays:', 'weekdays:funday', 'daily:2'):
+            with self.assertRaises(ValueError):
+                schedule.parse(spec)
+    
+    def test_legacy_streaks_unchanged(self):
+        """Test that the bitset engine agrees with run streaks for daily habits."""
+        for habit in load_predefined_habits():
+            if habit.periodicity == 'daily':
+                self.assertEqual(habit.schedule.streak(*habit.bitset(), date.today()), habit.current_streak())
+    
+    def test_weekdays(self):
+        """Test a Monday/Wednesday/Friday schedule."""
+        days = ['2024-06-03', '2024-06-07', '2024-06-10', '2024-06-12', '2024-06-14']  # Missed Wed 5th
+        self.assertEqual(self.streak('weekdays:mon,wed,fri', days, date(2024, 6, 14)), 4)
+        self.assertEqual(self.streak('weekdays:mon,wed,fri', days, date(2024, 6, 16)), 4)  # Weekend
+        self.assertEqual(self.streak('weekdays:mon,wed,fri', days, date(2024, 6, 17)), 0)
+        habit = Habit('Test', 'weekdays:mon,wed,fri', completions=days)
+        self.assertEqual(habit.adherence(date(2024, 6, 3), date(2024, 6, 14)), (5, 6))
+    
+    def test_every_n_days(self):
+        """Test anchored and unanchored every-N-days schedules."""
+        days = ['2024-06-04', '2024-06-07', '2024-06-10']
+        self.assertEqual(self.streak('every:3:2024-06-01', days, date(2024, 6, 12)), 3)
+        self.assertEqual(self.streak('every:3:2024-06-02', days, date(2024, 6, 12)), 0)
+        self.assertEqual(self.streak('every:3', days, date(2024, 6, 10)), 3)
+    
+    def test_calendar_periods(self):
+        """Test week- and month-bucketed schedules."""
+        weeks = ['2024-06-03', '2024-06-15', '2024-06-17']
+        self.assertEqual(self.streak('calendar-weekly', weeks, date(2024, 6, 19)), 3)
+        self.assertEqual(self.streak('calendar-weekly', weeks, date(2024, 6, 24)), 0)
+        months = ['2024-01-31', '2024-02-01', '2024-03-15']
+        self.assertEqual(self.streak('monthly', months, date(2024, 3, 20)), 3)
+        self.assertEqual(self.streak('monthly', months, date(2024, 4, 1)), 0)
+        habit = Habit('Test', 'monthly', completions=months)
+        self.assertEqual(habit.adherence(date(2024, 1, 15), date(2024, 6, 30)), (3, 6))
+        self.assertAlmostEqual(analytics.adherence_rate(habit, date(2024, 1, 1), date(2024, 6, 30)), 0.5)
+    
+    def test_matches_day_by_day_count(self):
+        """Test day schedules against a straightforward day-by-day count."""
+        rng = random.Random(7)
+        today = date(2024, 6, 30)
+        for spec in ('daily', 'every:4:2024-01-02', 'weekdays:tue,sat'):
+            sched = schedule.parse(spec)
+            due = [d for d in (today - timedelta(days=i) for i in range(400))
+                   if sched.occurrences(d.toordinal(), 1)]
+            for _ in range(20):
+                done = {d for d in due if rng.random() < 0.9}
+                habit = Habit('Test', spec, completions=list(done))
+                expected = 0
+                while expected < len(due) and due[expected] in done:
+                    expected += 1
+                self.assertEqual(habit.schedule.streak(*habit.bitset(), today), expected)
+                self.assertEqual(habit.adherence(due[-1], today), (len(done), len(due)))
+    
+    def test_bitset_follows_check_offs(self):
+        """Test that the cached bitset is refreshed after mutations."""
+        habit = Habit('Test', 'weekdays:mon', completions=['2024-06-03'])
+        self.assertEqual(habit.current_streak(date(2024, 6, 10)), 0)
+        habit.check_off('2024-06-10')
+        self.assertEqual(habit.current_streak(date(2024, 6, 10)), 2)
+        habit.remove_completion('2024-06-03')
+        self.assertEqual(habit.current_streak(date(2024, 6, 10)), 1)
+        habit.check_off('2024-06-17')
+        habit.add_completions(['2024-06-24', '2024-07-01'])
+        self.assertEqual(habit.bitset(), schedule.to_bitset(habit.ordinals))
+    
+    def test_every_view_follows_the_schedule(self):
+        """Test that analytics, the leaderboard, columnar and SQLite streaks agree on schedules."""
+        today = date(2024, 3, 20)
+        habits = [Habit('Monthly', 'monthly', completions=['2024-01-31', '2024-02-01', '2024-03-15']),
+                  Habit('Other days', 'every:2', completions=[(today - timedelta(days=2 * i)).isoformat()
+                                                              for i in range(5)])]
+        expected = {'Monthly': 3, 'Other days': 5}
+        self.assertEqual({h.name: h.current_streak(today) for h in habits}, expected)
+        self.assertEqual({h.name: analytics.streak_as_of(h, today) for h in habits}, expected)
+        self.assertEqual({name: s['current'] for name, s in analytics.summary(habits, today)['streaks'].items()},
+                         expected)
+        stats = analytics.streak_stats(habits[0], today)
+        self.assertEqual((stats.longest_start, stats.current_end), (date(2024, 1, 1), date(2024, 3, 1)))
+        board = leaderboard.StreakLeaderboard.build(habits, today)
+        self.assertEqual(dict(board.top(5, today=today)), expected)
+        self.assertEqual(dict(board.top(5, today=date(2024, 4, 1))), {})
+        engine = columnar.ColumnarHabits(habits)
+        self.assertEqual(engine.longest_streak_per_habit(today), expected)
+        self.assertAlmostEqual(analytics.completion_rate(habits[0], date(2024, 1, 1), date(2024, 6, 30)), 0.5)
+        self.assertEqual(engine.completion_rates(date(2024, 1, 1), date(2024, 6, 30)).tolist(),
+                         [analytics.completion_rate(h, date(2024, 1, 1), date(2024, 6, 30)) for h in habits])
+        
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        db = storage.SqliteStorage(os.path.join(test_dir, 'habits.db'))
+        self.addCleanup(db.close)
+        db.save(habits)
+        self.assertEqual({h.name: db.current_streak(h.name, today) for h in habits}, expected)
+    
+    def test_filter_by_schedule(self):
+        """Test that periodicity filters compare parsed schedules."""
+        habits = [Habit('A', 'weekly'), Habit('B', 'every:7'), Habit('C', 'Daily'), Habit('D', 'monthly')]
+        self.assertEqual([h.name for h in analytics.filter_by_periodicity(habits, 'weekly')], ['A', 'B'])
+        self.assertEqual([h.name for h in analytics.filter_by_periodicity(habits, 'daily')], ['C'])
+        self.assertEqual([h.name for h in columnar.ColumnarHabits(habits).filter_by_periodicity('every:7')],
+                         ['A', 'B'])
+        habits.append(Habit('E', 'yearly'))
+        self.assertEqual([h.name for h in analytics.filter_by_periodicity(habits, 'yearly')], ['E'])
+        self.assertEqual([h.name for h in columnar.ColumnarHabits(habits).filter_by_periodicity('yearly')], ['E'])
+        self.assertEqual(analytics.filter_by_periodicity(habits, 'hourly'), [])
+
+class TestMetrics(unittest.TestCase):
+    """Test the opt-in instrumentation."""
+    
+    def setUp(self):
+        """Set up a temporary store and clean metrics."""
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.addCleanup(metrics.disable)
+    
+    def test_disabled_leaves_functions_untouched(self):
+        """Test that nothing is wrapped while instrumentation is off."""
+        originals = (Habit.check_off, HabitTracker.save, analytics.summary)
+        metrics.enable()
+        self.assertTrue(metrics.is_enabled())
+        self.assertIsNot(Habit.check_off, originals[0])
+        metrics.disable()
+        self.assertEqual((Habit.check_off, HabitTracker.save, analytics.summary), originals)
+        
+        Habit('Run', 'daily').check_off()
+        self.assertEqual(HabitTracker(self.test_file).metrics(), {})
+    
+    def test_records_calls_latencies_and_bytes(self):
+        """Test counts, percentiles and I/O per operation."""
+        metrics.enable()
+        tracker = HabitTracker(self.test_file)
+        tracker.habits = load_predefined_habits()
+        tracker.save()
+        size = os.path.getsize(self.test_file)
+        tracker = HabitTracker(self.test_file)
+        for habit in tracker.habits:
+            habit.check_off()
+            habit.current_streak()
+        analytics.summary(tracker.habits)
+        
+        snapshot = tracker.metrics()
+        self.assertEqual(snapshot['habit.check_off']['calls'], 5)
+        self.assertEqual(snapshot['tracker.save']['bytes_written'], size)
+        self.assertEqual(snapshot['tracker.load']['bytes_read'], size)
+        self.assertEqual(snapshot['analytics.summary']['calls'], 1)
+        self.assertEqual(snapshot['analytics.streak_stats']['calls'], 5)  # Nested calls are counted too
+        streak = snapshot['habit.current_streak']
+        self.assertLessEqual(streak['p50_ms'], streak['p99_ms'])
+        self.assertLessEqual(streak['p99_ms'], streak['max_ms'])
+    
+    def test_profile(self):
+        """Test capturing a cProfile report around a named operation."""
+        habits = load_predefined_habits()
+        with metrics.profile('stats'):
+            analytics.summary(habits)
+        self.assertIn('streak_stats', metrics.profiles['stats'])
+        self.assertEqual(metrics.snapshot()['profile.stats']['calls'], 1)
+
+class TestChangeFeed(unittest.TestCase):
+    """Test the versioned change feed and incremental export."""
+    
+    def setUp(self):
+        """Set up a temporary store with a change feed."""
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.test_file = os.path.join(self.test_dir, 'test_habits.json')
+        self.tracker = HabitTracker(self.test_file, changefeed=True)
+    
+    def test_replacing_habits_records_a_reset(self):
+        """Test that a mutation after replacing all habits is preceded by a reset in the feed."""
+        self.tracker.add_habit(Habit('A', 'daily'))
+        self.tracker.habits = [Habit('X', 'daily')]
+        self.tracker.check_off('X', '2024-01-01')
+        self.assertEqual([c['op'] for c in self.tracker.changes_since(0)], ['add', 'reset'])
+        self.tracker.check_off('X', '2024-01-02')
+        self.assertEqual([c['op'] for c in self.tracker.changes_since(2)], ['check_off'])
+        self.assertEqual(HabitTracker(self.test_file).get('X').completions, ['2024-01-01', '2024-01-02'])
+    
+    def test_versions_and_changes_since(self):
+        """Test that every mutation gets the next version."""
+        self.tracker.add_habit(Habit('Run', 'daily'))
+        self.tracker.check_off('Run', date(2024, 1, 1))
+        self.tracker.delete_habit('Run')
+        self.assertEqual(self.tracker.version, 3)
+        
+        changes = list(self.tracker.changes_since(0))
+        self.assertEqual([c['v'] for c in changes], [1, 2, 3])
+        self.assertEqual([c['op'] for c in changes], ['add', 'check_off', 'delete'])
+        self.assertEqual(list(self.tracker.changes_since(2)), changes[2:])
+        self.assertEqual(list(self.tracker.changes_since(3)), [])
+        
+        # The feed outlives the tracker and later trackers keep appending to it
+        self.tracker.close()
+        reopened = HabitTracker(self.test_file)
+        self.assertEqual(reopened.version, 3)
+        reopened.add_habit(Habit('Read', 'weekly'))
+        self.assertEqual(reopened.version, 4)
+        self.assertIsNone(HabitTracker(self.test_file, changefeed=False).changefeed)
+    
+    def test_batch_and_rollback(self):
+        """Test that a batch gets consecutive versions and a rollback gets none."""
+        self.tracker.add_habit(Habit('Run', 'daily'))
+        with self.tracker.batch():
+            for day in range(1, 4):
+                self.tracker.check_off('Run', date(2024, 1, day))
+        self.assertEqual(self.tracker.version, 4)
+        
+        with self.assertRaises(RuntimeError):
+            with self.tracker.batch():
+                self.tracker.check_off('Run', date(2024, 1, 9))
+                raise RuntimeError
+        self.assertEqual(self.tracker.version, 4)
+    
+    def test_feed_written_under_the_store_lock(self):
+        """Test that shared writers append to the feed while still holding the store's lock."""
+        tracker = HabitTracker(os.path.join(self.test_dir, 'shared.json'), shared=True, changefeed=True)
+        held = []
+        append = tracker.changefeed.append
+        
+        def checking_append(changes):
+            held.append(tracker.storage._lock_file is not None)
+            return append(changes)
+        tracker.changefeed.append = checking_append
+        tracker.add_habit(Habit('Run', 'daily'))
+        tracker.save()
+        self.assertEqual(held, [True, True])
+    
+    def test_bisect_finds_every_version(self):
+        """Test changes_since from every point of a longer feed."""
+        feed = changefeed.ChangeFeed(os.path.join(self.test_dir, 'feed'))
+        for size in (1, 5, 30, 2):
+            feed.append([{'op': 'check_off', 'name': 'Run' * size, 'day': '2024-01-01'}] * size)
+        self.assertEqual(feed.last_version(), 38)
+        for version in range(40):
+            self.assertEqual([c['v'] for c in feed.since(version)], list(range(version + 1, 39)))
+    
+    def test_torn_tail_is_dropped(self):
+        """Test that a record cut short by a crash is ignored, then overwritten."""
+        feed = changefeed.ChangeFeed(os.path.join(self.test_dir, 'feed'))
+        feed.append([{'op': 'delete', 'name': 'Run'}] * 2)
+        with open(feed.path, 'ab') as f:
+            f.write(b'{"v":3,"op":"del')
+        self.assertEqual([c['v'] for c in feed.since(0)], [1, 2])
+        self.assertEqual(feed.append([{'op': 'delete', 'name': 'Read'}]), 3)
+        self.assertEqual([c['name'] for c in feed.since(2)], ['Read'])
+    
+    def test_incremental_export(self):
+        """Test a snapshot first, then delta files, then a snapshot after a reset."""
+        mirror = os.path.join(self.test_dir, 'mirror')
+        exporter = changefeed.IncrementalExporter(self.tracker, mirror)
+        self.tracker.add_habit(Habit('Run', 'daily'))
+        
+        first = exporter.export()
+        self.assertEqual(os.path.basename(first), 'snapshot-000000000001.json')
+        with open(first) as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot['version'], 1)
+        self.assertEqual(exporter.cursor, 1)
+        self.assertIsNone(exporter.export())
+        
+        self.tracker.check_off('Run', date(2024, 1, 1))
+        self.tracker.check_off('Run', date(2024, 1, 2))
+        delta = exporter.export()
+        self.assertEqual(os.path.basename(delta), 'changes-000000000002-000000000003.jsonl')
+        with open(delta) as f:
+            changes = [json.loads(line) for line in f]
+        habits = storage.replay([Habit.from_dict(h) for h in snapshot['habits']], changes)
+        self.assertEqual(habits[0].completions, self.tracker.get('Run').completions)
+        
+        self.tracker.habits = [Habit('Read', 'weekly')]
+        self.tracker.save()
+        self.assertTrue(os.path.basename(exporter.export()).startswith('snapshot-'))
+        self.assertEqual(exporter.cursor, 4)
+    
+    def test_exporter_needs_a_feed(self):
+        """Test that exporting a tracker without a feed is refused."""
+        other = HabitTracker(os.path.join(self.test_dir, 'other.json'))
+        with self.assertRaises(ValueError):
+            changefeed.IncrementalExporter(other, self.test_dir)
+
+class TestBulkIO(unittest.TestCase):
+    """Test streaming CSV and JSON Lines import and export."""
+    
+    def setUp(self):
+        """Set up a temporary store."""
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.tracker = HabitTracker(os.path.join(self.test_dir, 'test_habits.json'), journal=True)
+    
+    def write(self, name, text):
+        path = os.path.join(self.test_dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+    
+    def test_import_csv(self):
+        """Test creating habits, deduplicating and skipping invalid rows across chunks."""
+        self.tracker.add_habit(Habit('Run', 'daily', completions=['2024-01-01']))
+        path = self.write('in.csv', 'date,name,periodicity\n'
+                                    '2024-01-01,Run,\n'
+                                    '2024-01-02,Run,\n'
+                                    '2024-01-02,Run,\n'
+                                    '2024-02-30,Run,\n'
+                                    '2024-01-07,Read,weekly\n'
+                                    '2024-01-14,Read,weekly\n'
+                                    ',Stretch,\n'
+                                    '2024-01-01,Swim,yearly\n'
+                                    '2024-1-1,Run,\n'
+                                    'short\n')
+        report = bulkio.import_file(self.tracker, path, chunk_rows=3)
+        self.assertEqual(report, {'rows': 10, 'added': 3, 'duplicates': 2, 'invalid': 4, 'created': 2})
+        
+        tracker = HabitTracker(self.tracker.storage_path)
+        self.assertEqual(tracker.get('Run').completions, ['2024-01-01', '2024-01-02'])
+        read = tracker.get('Read')
+        self.assertEqual((read.periodicity, read.creation_date), ('weekly', '2024-01-07'))
+        self.assertEqual(read.completions, ['2024-01-07', '2024-01-14'])
+        self.assertEqual(tracker.get('Stretch').completions, [])
+        self.assertIsNone(tracker.get('Swim'))
+    
+    def test_strict_and_no_create(self):
+        """Test stopping at the first invalid row and refusing unknown habits."""
+        path = self.write('in.jsonl', '{"name": "Run", "date": "2024-01-01"}\n'
+                                      '\n'
+                                      '{"name": "Run", "date": 20240102}\n')
+        with self.assertRaisesRegex(ValueError, 'Row 2'):
+            bulkio.import_file(self.tracker, path, strict=True)
+        
+        report = bulkio.import_file(self.tracker, path, create=False)
+        self.assertEqual((report['added'], report['invalid']), (0, 2))
+        with self.assertRaises(ValueError):
+            bulkio.import_file(self.tracker, self.write('in.txt', ''))
+        with self.assertRaises(ValueError):
+            bulkio.import_file(self.tracker, self.write('bad.csv', 'habit,day\n'))
+    
+    def test_round_trip(self):
+        """Test that both formats export every habit and import back to the same store."""
+        habits = load_predefined_habits() + [Habit('Empty', 'monthly', '2024-03-01')]
+        self.tracker.habits = habits
+        self.tracker.save()
+        rows = sum(max(1, h.completion_count()) for h in habits)
+        for name in ('out.csv', 'out.jsonl'):
+            path = os.path.join(self.test_dir, name)
+            self.assertEqual(bulkio.export_file(self.tracker, path), rows)
+            
+            copy = HabitTracker(os.path.join(self.test_dir, name + '.json'))
+            report = bulkio.import_file(copy, path)
+            self.assertEqual((report['rows'], report['invalid']), (rows, 0))
+            self.assertEqual([h.to_dict() for h in copy.habits], [h.to_dict() for h in habits])
+
+class TestBench(unittest.TestCase):
+    """Test the benchmark suite and synthetic data generator."""
+    
+    def test_generator_is_reproducible(self):
+        """Test that the same seed generates the same habits."""
+        first = [h.to_dict() for h in bench.generate_habits(20, 1, 0.5, seed=7)]
+        second = [h.to_dict() for h in bench.generate_habits(20, 1, 0.5, seed=7)]
+        other = [h.to_dict() for h in bench.generate_habits(20, 1, 0.5, seed=8)]
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+    
+    def test_generator_density(self):
+        """Test that density controls how many periods are completed."""
+        habits = bench.generate_habits(10, 1, 1.0, weekly_share=0)
+        self.assertTrue(all(h.completion_count() == 366 for h in habits))
+        self.assertTrue(all(h.completion_count() == 0 for h in bench.generate_habits(10, 1, 0.0)))
+    
+    def test_report(self):
+        """Test that a small run reports every hot path as JSON."""
+        report = bench.run_benchmarks(n_habits=20, years=0.5, repeat=2, sample=5)
+        json.dumps(report)
+        for name in ['tracker.load', 'tracker.save', 'habit.check_off',
+                     'habit.current_streak', 'analytics.longest_streak']:
+            self.assertIn(name, report['results'])
+            self.assertIn('p99_ms', report['results'][name])
+            self.assertGreater(report['results'][name]['peak_memory_bytes'], 0)
+        self.assertEqual(bench.compare(report, report), [])
+
 class TestPredefinedHabits(unittest.TestCase):
     """Test the predefined habits functionality."""
     